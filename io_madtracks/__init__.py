@@ -28,64 +28,72 @@ Purpose: Init file for the Blender Add-On
 
 """
 
-import bpy
-import imp
-
-from . import (
-    common,
-    operators,
-    madini
-)
-
-from .props import (
-    props_obj,
-    props_scene,
-    props_mat
-)
-
-from .ui import (
-    headers,
-    trackparts,
-    object,
-    material
-)
-
-# Reloads potentially changed modules on reload (F8 in Blender)
-imp.reload(common)
-imp.reload(operators)
-imp.reload(props_obj)
-imp.reload(props_scene)
-imp.reload(props_mat)
-imp.reload(headers)
-imp.reload(trackparts)
-imp.reload(object)
-imp.reload(material)
-imp.reload(madini)
-
-# Reloaded here because it's used in a class which is instanced here
-if "img_in" in locals():
-    imp.reload(img_in)
-if "ldo_in" in locals():
-    imp.reload(ldo_in)
-if "ldo_out" in locals():
-    imp.reload(ldo_out)
-if "descriptor_in" in locals():
-    imp.reload(descriptor_in)
-if "level_in" in locals():
-    imp.reload(level_in)
-if "level_out" in locals():
-    imp.reload(level_out)
-if "madini" in locals():
+try:
+    import bpy
+except ImportError:
+    # outside of Blender, only the format library is available (core, madstructs, madini...)
+    bpy = None
+
+if bpy is not None:
+    import imp
+
+    from . import (
+        core,
+        common,
+        operators,
+        madini
+    )
+
+    from .props import (
+        props_obj,
+        props_scene,
+        props_mat
+    )
+
+    from .ui import (
+        headers,
+        trackparts,
+        object,
+        material
+    )
+
+    # Reloads potentially changed modules on reload (F8 in Blender)
+    imp.reload(core)
+    imp.reload(common)
+    imp.reload(operators)
+    imp.reload(props_obj)
+    imp.reload(props_scene)
+    imp.reload(props_mat)
+    imp.reload(headers)
+    imp.reload(trackparts)
+    imp.reload(object)
+    imp.reload(material)
     imp.reload(madini)
-if "trackpart" in locals():
-    imp.reload(trackpart)
 
+    # Reloaded here because it's used in a class which is instanced here
+    if "img_in" in locals():
+        imp.reload(img_in)
+    if "ldo_in" in locals():
+        imp.reload(ldo_in)
+    if "ldo_out" in locals():
+        imp.reload(ldo_out)
+    if "descriptor_in" in locals():
+        imp.reload(descriptor_in)
+    if "level_in" in locals():
+        imp.reload(level_in)
+    if "level_out" in locals():
+        imp.reload(level_out)
+    if "madini" in locals():
+        imp.reload(madini)
+    if "trackpart" in locals():
+        imp.reload(trackpart)
+
+    # Makes common variables and classes directly accessible
+    from .common import *
+    from .props.props_obj import *
+    from .props.props_scene import *
+    from .props.props_mat import *
 
-# Makes common variables and classes directly accessible
-from .common import *
-from .props.props_obj import *
-from .props.props_scene import *
-from .props.props_mat import *
 
 bl_info = {
 "name": "Mad Tracks",
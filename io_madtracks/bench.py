@@ -0,0 +1,429 @@
+# Copyright (C) 2024-2026  Lucas Pottier
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#-----------------------------------------------------------------------------
+# Mad Tracks Blender Add-on, based on Re-Volt Blender Add-on.
+#-----------------------------------------------------------------------------
+
+"""
+Name:    bench
+Purpose: Benchmarks the Mad Tracks file parsers
+
+Description:
+Compares the stream LDO parser (LDO.read) with the buffer LDO parser
+(LDO.read_buffer) on a set of .ldo files, checks that both parsers
+build identical structures and that writing them back gives the same bytes.
+The memory mode reports the memory held by parsed .ldo files, per vertex,
+and by parsed level .ini files.
+The suite mode times the LDO, LDL and .ini readers and writers and the
+coordinate conversions on synthetic data directories of several sizes,
+and on a real data directory if one is given. Results are saved as JSON
+and can be compared to a saved baseline to catch regressions.
+
+Usage:
+    python -m io_madtracks.bench [--repeat N] file.ldo [file.ldo ...]
+    python -m io_madtracks.bench --memory file.ldo|level.ini [...]
+    python -m io_madtracks.bench --suite [--sizes 100,1000,10000] [--data-dir DIR]
+                                 [--json out.json] [--compare baseline.json] [--threshold 0.1]
+
+"""
+
+import argparse
+import glob
+import io
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from . import madstructs
+from . import madini
+from . import synth
+
+from .core import *
+
+
+def time_call(func, repeat):
+    """
+    Returns the best time in seconds out of *repeat* calls to func.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def parse_stream(filepath):
+    with open(filepath, 'rb') as file:
+        ldo = madstructs.LDO()
+        ldo.read(file)
+    return ldo
+
+
+def parse_buffer(filepath):
+    with open(filepath, 'rb') as file:
+        buf = file.read()
+    ldo = madstructs.LDO()
+    ldo.read_buffer(buf)
+    return ldo
+
+
+def roundtrip(filepath):
+    """
+    Returns True if writing back the parsed LDO gives the exact same bytes as the file.
+    """
+    with open(filepath, 'rb') as file:
+        buf = file.read()
+    ldo = madstructs.LDO()
+    ldo.read_buffer(buf)
+    # encode every atomic rather than copying its bytes back
+    for atomic in ldo.atomics:
+        atomic.mark_modified()
+    out = io.BytesIO()
+    ldo.write(out)
+    return out.getvalue() == buf
+
+
+def structures_equal(a, b):
+    """
+    Recursively compares two madstructs structures through their as_dict.
+    """
+    if hasattr(a, "as_dict"):
+        return type(a) is type(b) and structures_equal(a.as_dict(), b.as_dict())
+    if isinstance(a, np.ndarray):
+        return isinstance(b, np.ndarray) and a.dtype == b.dtype and np.array_equal(a, b)
+    if isinstance(a, dict):
+        return (isinstance(b, dict) and a.keys() == b.keys()
+                and all(structures_equal(a[key], b[key]) for key in a))
+    if isinstance(a, (list, tuple)):
+        return (isinstance(b, (list, tuple)) and len(a) == len(b)
+                and all(structures_equal(x, y) for x, y in zip(a, b)))
+    return a == b
+
+
+def measure_memory(func):
+    """
+    Calls func while tracing allocations.
+    Returns its result, the bytes still allocated when it returns and the peak.
+    """
+    tracemalloc.start()
+    try:
+        result = func()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, current, peak
+
+
+def ldo_memory(filepath):
+    """
+    Measures the memory held by a parsed LDO, with vertex arrays only
+    and with the Vertex objects view built on top of them.
+    """
+    ldo, array_bytes, peak = measure_memory(lambda: parse_buffer(filepath))
+    meshes = [mesh for atomic in ldo.atomics for mesh in atomic.meshes]
+    vertex_cnt = sum(mesh.vertex_cnt for mesh in meshes)
+    _, object_bytes, _ = measure_memory(lambda: [mesh.vertices for mesh in meshes])
+    per_vertex = max(vertex_cnt, 1)
+    return {
+        "file": filepath,
+        "vertices": vertex_cnt,
+        "bytes": array_bytes,
+        "peak": peak,
+        "bytes_per_vertex": array_bytes / per_vertex,
+        "object_bytes_per_vertex": object_bytes / per_vertex,
+    }
+
+
+def level_memory(filepath):
+    """
+    Measures the memory held by a parsed level .ini file.
+    """
+    def read_level():
+        with open(filepath, 'r', encoding="ISO-8859-1") as file:
+            return madini.INI(file)
+    ini, current, peak = measure_memory(read_level)
+    return {
+        "file": filepath,
+        "sections": len(ini.sections),
+        "bytes": current,
+        "peak": peak,
+        "bytes_per_section": current / max(len(ini.sections), 1),
+    }
+
+
+def compare_parsers(filepaths, repeat=5):
+    """
+    Times both LDO parsers on each file. Returns one result dictionary per file.
+    """
+    results = []
+    for filepath in filepaths:
+        stream_time = time_call(lambda: parse_stream(filepath), repeat)
+        buffer_time = time_call(lambda: parse_buffer(filepath), repeat)
+        results.append({
+            "file": filepath,
+            "size": os.path.getsize(filepath),
+            "stream": stream_time,
+            "buffer": buffer_time,
+            "identical": structures_equal(parse_stream(filepath), parse_buffer(filepath)),
+            "roundtrip": roundtrip(filepath),
+        })
+    return results
+
+
+class Corpus:
+    """
+    Files of a data directory loaded in memory, so that benchmarks don't time disk accesses.
+    """
+    def __init__(self, name, data_dir, size=None):
+        self.name = name
+        self.size = size
+        self.ldos = [read_bytes(filepath) for filepath in find_files(data_dir, LDO_PATH, "ldo")]
+        self.ldls = [read_bytes(filepath) for filepath in find_files(data_dir, LDL_PATH, "ldl")]
+        self.levels = []
+        for filepath in find_files(data_dir, LEVEL_PATH, "ini"):
+            with open(filepath, 'r', encoding="ISO-8859-1") as file:
+                self.levels.append(file.read())
+
+        # parsed structures, used by the writers and the conversions
+        self.parsed_ldos = []
+        for data in self.ldos:
+            ldo = madstructs.LDO()
+            ldo.read(io.BytesIO(data))
+            self.parsed_ldos.append(ldo)
+        meshes = [mesh for ldo in self.parsed_ldos for atomic in ldo.atomics for mesh in atomic.meshes]
+        self.vertex_cnt = sum(mesh.vertex_cnt for mesh in meshes)
+        self.positions = np.concatenate([mesh.positions for mesh in meshes] or [np.zeros((0, 3), np.float32)])
+        self.sections = [section for text in self.levels for section in madini.INI(io.StringIO(text)).sections]
+
+
+def find_files(data_dir, path, ext):
+    try:
+        directory = filepath_insensitive(os.path.join(data_dir, path))
+    except OSError:
+        return []
+    return sorted(glob.glob(os.path.join(directory, "*." + ext)) + glob.glob(os.path.join(directory, "*." + ext.upper())))
+
+
+def read_bytes(filepath):
+    with open(filepath, 'rb') as file:
+        return file.read()
+
+
+def read_ldos_stream(corpus):
+    for data in corpus.ldos:
+        madstructs.LDO().read(io.BytesIO(data))
+
+
+def read_ldos_buffer(corpus):
+    for data in corpus.ldos:
+        madstructs.LDO().read_buffer(data)
+
+
+def write_ldos(corpus):
+    for ldo in corpus.parsed_ldos:
+        ldo.write(io.BytesIO())
+
+
+def read_ldls(corpus):
+    for data in corpus.ldls:
+        lightmap = madstructs.LDL(io.BytesIO(data))
+        lightmap.read_header()
+        for _ in range(lightmap.instance_cnt):
+            lightmap.read_instance()
+
+
+def read_levels(corpus):
+    for text in corpus.levels:
+        madini.INI(io.StringIO(text))
+
+
+def convert_coords(corpus):
+    to_madtracks_coord_array(to_blender_coord_array(corpus.positions))
+
+
+def write_level_ini(corpus):
+    level = madini.INI()
+    level.sections = [madini.level_section(section.name, [1., 2., 3.], [1., 0., 0.], [0., 1., 0.])
+                      for section in corpus.sections]
+    level.write(io.StringIO())
+
+
+def suite_benchmarks(corpus):
+    """
+    Returns the benchmarks of the suite as (name, function, bytes, items, item unit).
+    """
+    ldo_bytes = sum(len(data) for data in corpus.ldos)
+    ldl_bytes = sum(len(data) for data in corpus.ldls)
+    level_bytes = sum(len(text) for text in corpus.levels)
+    ldl_vertices = 0
+    for data in corpus.ldls:
+        lightmap = madstructs.LDL(io.BytesIO(data))
+        if lightmap.read_header():
+            lightmap.read_index()
+            ldl_vertices += sum(sum(vertex_cnts) for vertex_cnts in lightmap.vertex_cnts)
+    return [
+        ("ldo_read", read_ldos_stream, ldo_bytes, corpus.vertex_cnt, "vertices"),
+        ("ldo_read_buffer", read_ldos_buffer, ldo_bytes, corpus.vertex_cnt, "vertices"),
+        ("ldo_write", write_ldos, ldo_bytes, corpus.vertex_cnt, "vertices"),
+        ("ldl_read_instance", read_ldls, ldl_bytes, ldl_vertices, "vertices"),
+        ("ini_read", read_levels, level_bytes, len(corpus.sections), "sections"),
+        ("coord_conversion", convert_coords, corpus.positions.nbytes, len(corpus.positions), "vertices"),
+        ("level_ini_write", write_level_ini, level_bytes, len(corpus.sections), "sections"),
+    ]
+
+
+def run_suite(corpora, repeat=5):
+    """
+    Runs every benchmark on every corpus. Returns one result dictionary per run.
+    """
+    results = []
+    for corpus in corpora:
+        # time the encoders rather than the copy of unmodified atomics
+        for ldo in corpus.parsed_ldos:
+            for atomic in ldo.atomics:
+                atomic.mark_modified()
+        for name, func, nbytes, items, unit in suite_benchmarks(corpus):
+            seconds = time_call(lambda: func(corpus), repeat)
+            _, _, peak = measure_memory(lambda: func(corpus))
+            results.append({
+                "name": name,
+                "corpus": corpus.name,
+                "size": corpus.size,
+                "seconds": seconds,
+                "bytes": nbytes,
+                "items": items,
+                "unit": unit,
+                "mb_per_s": nbytes / seconds / 1e6 if seconds else 0.,
+                "items_per_s": items / seconds if seconds else 0.,
+                "peak_bytes": peak,
+            })
+    return results
+
+
+def result_key(result):
+    return (result["name"], result["corpus"], result["size"])
+
+
+def compare_results(results, baseline, threshold=0.1):
+    """
+    Flags the results slower than their baseline by more than *threshold* (a fraction).
+    Returns (result, baseline seconds, ratio, regressed) for each result found in the baseline.
+    """
+    baseline_results = {result_key(result): result for result in baseline["results"]}
+    comparisons = []
+    for result in results:
+        base = baseline_results.get(result_key(result))
+        if base is None or not base["seconds"]:
+            continue
+        ratio = result["seconds"] / base["seconds"]
+        comparisons.append((result, base["seconds"], ratio, ratio > 1 + threshold))
+    return comparisons
+
+
+def suite_main(args):
+    corpora = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in args.sizes:
+            data_dir = os.path.join(tmp_dir, str(size))
+            synth.generate(data_dir, seed=args.seed, vertex_cnt=size, instance_cnt=max(10, size // 10))
+            corpora.append(Corpus("synth", data_dir, size))
+    if args.data_dir:
+        corpora.append(Corpus("data", args.data_dir))
+
+    results = run_suite(corpora, args.repeat)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+    print("{:<20} {:<6} {:>7} {:>10} {:>10} {:>14} {:>12}".format("benchmark", "corpus", "size", "ms", "MB/s", "items/s", "peak (KB)"))
+    for result in results:
+        print("{:<20} {:<6} {:>7} {:>10.3f} {:>10.1f} {:>14.0f} {:>12.1f}".format(
+            result["name"], result["corpus"], result["size"] or "-", result["seconds"] * 1000,
+            result["mb_per_s"], result["items_per_s"], result["peak_bytes"] / 1024))
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if not args.compare:
+        return 0
+    with open(args.compare, 'r') as file:
+        baseline = json.load(file)
+    comparisons = compare_results(results, baseline, args.threshold)
+    print()
+    print("{:<20} {:<6} {:>7} {:>12} {:>10} {:>8}".format("benchmark", "corpus", "size", "baseline ms", "ms", "ratio"))
+    for result, base_seconds, ratio, regressed in comparisons:
+        print("{:<20} {:<6} {:>7} {:>12.3f} {:>10.3f} {:>7.2f}x{}".format(
+            result["name"], result["corpus"], result["size"] or "-", base_seconds * 1000,
+            result["seconds"] * 1000, ratio, "  REGRESSION" if regressed else ""))
+    return 1 if any(regressed for _, _, _, regressed in comparisons) else 0
+
+
+def parse_sizes(text):
+    return [int(size) for size in text.split(",")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="io_madtracks.bench", description="Compare the LDO parsers")
+    parser.add_argument("files", nargs="*", help=".ldo files to parse, or level .ini files in memory mode")
+    parser.add_argument("--repeat", type=int, default=5, help="number of runs per file, the best one is kept")
+    parser.add_argument("--memory", action="store_true", help="report memory usage instead of parse times")
+    parser.add_argument("--suite", action="store_true", help="run the benchmark suite")
+    parser.add_argument("--sizes", type=parse_sizes, default=[100, 1000, 10000],
+                        help="maximum vertices per mesh of the synthetic data directories")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic data directories")
+    parser.add_argument("--data-dir", help="real data directory to run the suite on as well")
+    parser.add_argument("--json", help="file to save the suite results to")
+    parser.add_argument("--compare", help="suite results file to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1, help="slowdown ratio over the baseline flagged as a regression")
+    args = parser.parse_args(argv)
+
+    if args.suite:
+        return suite_main(args)
+    if not args.files:
+        parser.error("no files given")
+
+    if args.memory:
+        print("{:<40} {:>10} {:>12} {:>12} {:>14} {:>14}".format("file", "items", "bytes", "peak", "bytes/item", "objects/item"))
+        for filepath in args.files:
+            if filepath.lower().endswith(".ldo"):
+                result = ldo_memory(filepath)
+                print("{:<40} {:>10} {:>12} {:>12} {:>14.1f} {:>14.1f}".format(
+                    os.path.basename(filepath), result["vertices"], result["bytes"], result["peak"],
+                    result["bytes_per_vertex"], result["object_bytes_per_vertex"]))
+            else:
+                result = level_memory(filepath)
+                print("{:<40} {:>10} {:>12} {:>12} {:>14.1f} {:>14}".format(
+                    os.path.basename(filepath), result["sections"], result["bytes"], result["peak"],
+                    result["bytes_per_section"], "-"))
+        return 0
+
+    results = compare_parsers(args.files, args.repeat)
+    print("{:<40} {:>10} {:>12} {:>12} {:>8}  {:<9}  {}".format("file", "bytes", "stream (ms)", "buffer (ms)", "speedup", "identical", "roundtrip"))
+    for result in results:
+        print("{:<40} {:>10} {:>12.3f} {:>12.3f} {:>7.1f}x  {!s:<9}  {}".format(
+            os.path.basename(result["file"]), result["size"],
+            result["stream"] * 1000, result["buffer"] * 1000,
+            result["stream"] / result["buffer"], result["identical"], result["roundtrip"]))
+    return 0 if all(result["identical"] and result["roundtrip"] for result in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -14,120 +14,27 @@ Purpose: Providing variables and functions available for all modules
 Description:
 Contains values that are specific to Mad Tracks, functions for converting units
 and helper functions for Blender. 
+Everything that doesn't depend on Blender lives in core and is re-exported here.
 
 """
 
 import bpy
-import os
-import platform
 
 import mathutils
 
-# Relative paths from the user's Mad Tracks data folder
-LDO_PATH =        os.path.join("Gfx", "models", "Geometry") + os.path.sep
-TEXTURE_PATH =    os.path.join("Graph", "maps", "High") + os.path.sep
-HUD_PATH =        os.path.join("Graph", "hud", "in") + os.path.sep
-DESCRIPTOR_PATH = os.path.join("Bin", "Descriptors") + os.path.sep
-LEVEL_PATH =      os.path.join("Bin", "Levels") + os.path.sep
-WORLD_PATH =      os.path.join("Bin", "universes") + os.path.sep
-LDL_PATH =        os.path.join("Gfx", "Lightmaps") + os.path.sep
-
-# Global dictionaries
-global ERRORS
-ERRORS = {}  # Dictionary that holds error messages
-
-# If True, more debug messages will be printed
-DEBUG = True
-
-SCALE = 1
-
-
-def dprint(*str):
-    """ Debug print: only prints if debug is enabled """
-    if DEBUG:
-        print(*str)
-
-
-"""
-Supported File Formats
-"""
-FORMAT_UNK = -1
-FORMAT_LDO = 0
-FORMAT_INI = 2
-FORMAT_DESCRIPTOR = 3
-FORMAT_LEVEL_INI = 4
-
-FORMATS = {
-    FORMAT_LDO: "LDO (.ldo)",
-    FORMAT_INI: "Unsupported (.ini)",
-    FORMAT_DESCRIPTOR: "Descriptor (.ini)",
-    FORMAT_LEVEL_INI: "Level (.ini)",
-}
-
-
-"""
-Constants used by multiple modules
-"""
-DUMMY_FLAG_POS    =  64
-DUMMY_FLAG_POSROT = 128
-DUMMY_MASK_TYPE = 15
-
-DUMMY_TYPE_WORLD =  5
-DUMMY_TYPE_NUM =    6
-DUMMY_TYPE_OUT =    9
-DUMMY_TYPE_ROOF =  10
-DUMMY_TYPE_BONUS = 11
-
-trackpart_types = {"trackpart", "start", "startfinish", "checkpoint", "looping", "finish"}
-collectible_types = {"pickupbonus", "achievement1", "achievement2"}
-
-
-"""
-Conversion functions for Mad Tracks structures.
-Axes are saved differently and many indices are saved in a different order.
-"""
-
-def to_blender_axis(vec):
-    return [-vec[0], vec[2], vec[1]]
-
-
-def to_blender_coord(vec):
-    return [-vec[0] * SCALE, vec[2] * SCALE, vec[1] * SCALE]
-
-
-def to_blender_scale(num):
-    return num * SCALE
+from .core import *
 
 
 def to_blender_matrix(matrix):
+    rotation = to_blender_rotation(matrix)
     return mathutils.Matrix((
-        (matrix[2][0], -matrix[0][0], -matrix[1][0], 0),
-        (-matrix[2][2], matrix[0][2], matrix[1][2], 0),
-        (-matrix[2][1], matrix[0][1], matrix[1][1], 0),
+        rotation[0] + (0,),
+        rotation[1] + (0,),
+        rotation[2] + (0,),
         (0, 0, 0, 1)
         ))
 
 
-def to_madtracks_axis(vec):
-    return [-vec[0], vec[2], vec[1]]
-
-
-def to_madtracks_coord(vec):
-    return [-vec[0] / SCALE, vec[2] / SCALE, vec[1] / SCALE]
-
-
-def to_madtracks_scale(num):
-    return num / SCALE
-
-
-def to_madtracks_matrix(matrix):
-    return [
-        (-matrix[0][1], matrix[2][1], matrix[1][1]),
-        (-matrix[0][2], matrix[2][2], matrix[1][2]),
-        (matrix[0][0], -matrix[2][0], -matrix[1][0])
-    ]
-
-
 class DialogOperator(bpy.types.Operator):
     bl_idname = "madtracks.dialog"
     bl_label = "Mad Tracks Add-On Notification"
@@ -158,30 +65,6 @@ def msg_box(message, icon="INFO"):
     bpy.ops.madtracks.dialog("INVOKE_DEFAULT")
 
 
-def get_errors():
-    global ERRORS
-    if ERRORS:
-        errors = "The following errors have been encountered:\n\n"
-        for error in ERRORS:
-            errors += "~ ERROR while {}:\n     {}\n\n".format(error, ERRORS[error])
-        errors += "Check the console if available for more information."
-    else:
-        errors = "Successfully completed."
-
-    # Clears the error messages
-    ERRORS = {}
-
-    return errors
-
-
-def set_error(step, msg):
-    global ERRORS
-    if step in ERRORS.keys():
-        # don't overwrite previous error
-        return
-    ERRORS[step] = msg
-
-
 def redraw_3d():
     for window in bpy.context.window_manager.windows:
         screen = window.screen
@@ -209,56 +92,3 @@ def enable_texture_mode():
                 if space.type == "VIEW_3D":
                     space.viewport_shade = "TEXTURED"
     return
-
-
-"""
-Non-Blender helper functions
-"""
-def filepath_insensitive(filepath):
-    """
-    Mad Tracks heavily relies on insensitive casing for files.
-    Doesn't guarantee that the filepath returned exists.
-    """
-    if platform.system() == "Linux":
-        path, filename = os.path.split(filepath)
-        for filename_real in os.listdir(path):
-            if filename_real.lower() == filename.lower():
-                return os.path.join(path, filename_real)
-    return filepath
-
-
-def open_insensitive(filepath, mode):
-    """
-    Opens a file in a case sensitive filesystem.
-    Additionally use valid codec for caractères spéciaux français.
-    """
-    filepath_real = filepath_insensitive(filepath)
-
-    if mode in ['r', 'w']:
-        return open(filepath_real, mode, encoding="ISO-8859-1")
-    else:
-        return open(filepath_real, mode)
-
-
-def get_format(fstr):
-    """
-    Gets the format by the ending and returns an int
-    """
-    fstr = fstr.lower()  # support uppercase letters
-    if os.sep in fstr:
-        fstr = fstr.split(os.sep)[-1]
-    try:
-        fname, ext = fstr.split(".", 1)
-    except:
-        fname, ext = ("", "")
-
-    if ext == "ldo":
-        return FORMAT_LDO
-    elif ext == "ini":
-        return FORMAT_INI
-    else:
-        return FORMAT_UNK
-
-
-def float_format(value):
-    return '{:f}'.format(value)
@@ -0,0 +1,519 @@
+# Copyright (C) 2024-2026  Lucas Pottier
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#-----------------------------------------------------------------------------
+# Mad Tracks Blender Add-on, based on Re-Volt Blender Add-on.
+#-----------------------------------------------------------------------------
+
+"""
+Name:    convert
+Purpose: Converts LDO and level files to glTF or OBJ without Blender
+
+Description:
+Flattens a .ldo file, or a level .ini file with its world mesh, LDO and
+descriptor instances, into a single binary glTF (.glb) or Wavefront OBJ file.
+Instances are placed like the level importer places them.
+In glTF, all the instances of a LDO share its vertex and index buffers,
+and lightmapped instances get their LDL UVs as a second texture coordinate set.
+Geometry is streamed to the output one LDO at a time, so memory stays bounded
+on the largest levels.
+Mad Tracks axes (+X left, +Y up, +Z back) are turned half a turn around Up
+to the glTF axes (+Y up, +Z front), OBJ files use the same axes.
+
+Usage:
+    python -m io_madtracks.convert [--format glb|obj] [--out-dir DIR] [--data-dir DIR]
+                                   [--no-lightmap] [--no-raceline] files...
+
+"""
+
+import argparse
+import json
+import os
+import shutil
+import struct
+import tempfile
+
+from collections import OrderedDict
+
+import numpy as np
+
+from . import madstructs
+from . import madini
+
+from .core import *
+from .madstructs import MAT_FLAG_RGBA, MAT_FLAG_DIFFUSE, MAT_FLAG_ENVMAP
+
+GLTF_FLOAT = 5126
+GLTF_UNSIGNED_SHORT = 5123
+GLTF_ARRAY_BUFFER = 34962
+GLTF_ELEMENT_ARRAY_BUFFER = 34963
+
+GLB_MAGIC = 0x46546C67  # "glTF"
+GLB_CHUNK_JSON = 0x4E4F534A
+GLB_CHUNK_BIN = 0x004E4942
+
+# Mad Tracks axes to glTF axes, a half turn around Up
+TO_GLTF_AXES = np.array((-1, 1, -1), dtype=np.float32)
+# Blender axes to glTF axes, used to convert the rotations computed for the level importer
+BLENDER_TO_GLTF = np.array(((1, 0, 0), (0, 0, 1), (0, -1, 0)), dtype=np.float64)
+
+# number of parsed LDOs kept around when converting to OBJ
+LDO_CACHE_SIZE = 8
+
+
+def to_gltf_array(arr):
+    """ Converts an (N, 3) array of Mad Tracks vectors to glTF axes """
+    return np.ascontiguousarray(arr * TO_GLTF_AXES, dtype=np.float32)
+
+
+def instance_transform(section):
+    """
+    Returns the 4x4 glTF transform of a level instance,
+    None if its section doesn't place it.
+    """
+    if len(section.params) != 4:
+        return None
+    params = section.as_dict()
+    rotation = np.array(to_blender_rotation(instance_matrix(params['directionat'], params['directionup'])))
+    transform = np.identity(4)
+    transform[:3, :3] = BLENDER_TO_GLTF.dot(rotation).dot(BLENDER_TO_GLTF.T)
+    transform[:3, 3] = np.array(params['position'][:3]) * TO_GLTF_AXES
+    return transform
+
+
+def read_ldo(filepath):
+    """
+    Reads and validates a whole LDO file.
+    """
+    with open_insensitive(filepath, 'rb') as file:
+        buf = file.read()
+    ldo = madstructs.LDO()
+    ldo.read_buffer(buf, validate=True)
+    return ldo
+
+
+def ldo_filepath(data_dir, filename):
+    """
+    Returns the path of a LDO from its level or descriptor filename ("geometry/name.ldo").
+    """
+    ldoname = filename.split("/", 1)[-1]
+    ldoname = ldo_aliases.get(ldoname.lower(), ldoname)
+    return os.path.join(data_dir, LDO_PATH + ldoname)
+
+
+def read_ini(file):
+    return madini.INI(file).as_dict()
+
+
+def read_descriptor(data_dir, filename):
+    """
+    Reads the LDO filename of a descriptor and whether it belongs to the raceline.
+    """
+    info = {'ldo_filename': None, 'is_raceline': False}
+    with open_insensitive(os.path.join(data_dir, DESCRIPTOR_PATH + filename), 'r') as file:
+        descriptor = read_ini(file)
+    obj = descriptor.get('object', {})
+    if ".ldo" in str(obj.get('filename', "")):
+        info['ldo_filename'] = obj['filename']
+    if obj.get('objecttype') in trackpart_types or obj.get('objecttype') in collectible_types:
+        info['is_raceline'] = True
+    return info
+
+
+def level_instances(filepath, data_dir, lightmap=None, raceline=True):
+    """
+    Lists the LDO instances of a level in import order, as (name, ldo_filepath, transform, lightmap_ordinal).
+    Returns them with the number of LDL instances that were matched.
+    """
+    with open_insensitive(filepath.rsplit(".", 1)[0] + ".dam", 'r') as file:
+        world = int(read_ini(file)['base']['world'])
+    with open_insensitive(os.path.join(data_dir, WORLD_PATH + world_filenames[world]), 'r') as file:
+        world_ini = read_ini(file)
+    with open_insensitive(filepath, 'r') as file:
+        ini = madini.INI(file)
+
+    # (name, ldo_filename, transform, included) of the world mesh and each level instance
+    entries = []
+    world_mesh = world_ini['base'].get('mesh')
+    entries.append(("world", world_mesh, None, True))
+    descriptors = {}
+    for section in ini.sections:
+        filename = section.as_dict()['filename']
+        name, ext = filename.rsplit("/", 1)[-1].split(".", 1)
+        if ext == "ldo":
+            entries.append((name, filename, instance_transform(section), True))
+        elif ext == "ini":
+            if filename not in descriptors:
+                descriptors[filename] = read_descriptor(data_dir, filename)
+            descriptor = descriptors[filename]
+            included = raceline or not descriptor['is_raceline']
+            entries.append((name, descriptor['ldo_filename'], instance_transform(section), included))
+        else:
+            entries.append((name, None, None, False))
+
+    ordinals, consumed = madstructs.assign_lightmap_instances(lightmap, [entry[1] for entry in entries])
+    instances = []
+    for (name, filename, transform, included), ordinal in zip(entries, ordinals):
+        if filename and included:
+            instances.append((name, ldo_filepath(data_dir, filename), transform, ordinal))
+    return instances, consumed
+
+
+def mesh_primitives(mesh):
+    """
+    Returns the (material_id, indices) of each tri sequence of a mesh,
+    leaving out the tris referencing vertices the mesh doesn't have.
+    """
+    primitives = []
+    tri_start = 0
+    tri_indices = mesh.tri_indices
+    for material_id, sequence_len in zip(mesh.tri_seq_mat.tolist(), mesh.tri_seq_len.tolist()):
+        indices = tri_indices[tri_start:tri_start + sequence_len]
+        tri_start += sequence_len
+        valid = ((indices >= 0) & (indices < mesh.vertex_cnt)).all(axis=1)
+        if valid.any():
+            primitives.append((material_id, indices[valid]))
+    return primitives
+
+
+def ldo_meshes(ldo):
+    """
+    Iterates over the meshes of a LDO with geometry as (atomic_index, atomic, lightmap_index, mesh).
+    *lightmap_index* is the index of the mesh UVs in a LDL instance, see madstructs.lightmap_mesh_indices.
+    """
+    for ai, (atomic, indices) in enumerate(zip(ldo.atomics, madstructs.lightmap_mesh_indices(ldo))):
+        if atomic.is_empty:
+            continue
+        for mesh, lightmap_index in zip(atomic.meshes, indices):
+            if mesh.vertex_cnt > 0:
+                yield ai, atomic, lightmap_index, mesh
+
+
+def instance_light_uvs(light_uvs, index, vertex_cnt):
+    """
+    Returns the lightmap UVs of a mesh from its LDL instance UVs, None if they don't match its vertices.
+    """
+    if light_uvs is None or not 0 <= index < len(light_uvs) or len(light_uvs[index]) != vertex_cnt:
+        return None
+    return light_uvs[index]
+
+
+class GLB:
+    """
+    Writes a binary glTF file.
+    The JSON part is built in memory while the binary data is streamed to a temporary
+    file, both are assembled once all the instances have been added.
+    """
+    def __init__(self, file):
+        self.file = file
+        self.gltf = OrderedDict((
+            ("asset", {"version": "2.0", "generator": "io_madtracks.convert"}),
+            ("scene", 0),
+            ("scenes", [{"nodes": []}]),
+            ("nodes", []),
+            ("meshes", []),
+            ("materials", []),
+            ("accessors", []),
+            ("bufferViews", []),
+            ("buffers", []),
+        ))
+        self.bin = tempfile.TemporaryFile()
+        self.bin_size = 0
+
+        # shared data of each LDO already written, by file path
+        self.ldos = {}
+
+    def __repr__(self):
+        return "GLB"
+
+    def add_accessor(self, array, component_type, accessor_type, target, bounds=False):
+        """
+        Streams an array to the binary chunk in its own buffer view, returns its accessor index.
+        """
+        data = np.ascontiguousarray(array).tobytes()
+        view = {"buffer": 0, "byteOffset": self.bin_size, "byteLength": len(data), "target": target}
+        self.bin.write(data)
+        padding = -len(data) % 4
+        self.bin.write(bytes(padding))
+        self.bin_size += len(data) + padding
+        self.gltf["bufferViews"].append(view)
+
+        accessor = {
+            "bufferView": len(self.gltf["bufferViews"]) - 1,
+            "componentType": component_type,
+            "count": len(array),
+            "type": accessor_type,
+        }
+        if bounds:
+            accessor["min"] = array.min(axis=0).tolist()
+            accessor["max"] = array.max(axis=0).tolist()
+        self.gltf["accessors"].append(accessor)
+        return len(self.gltf["accessors"]) - 1
+
+    def add_material(self, material):
+        gltf_material = {"name": material.name, "pbrMetallicRoughness": {"metallicFactor": 0.0}}
+        if material.flags & MAT_FLAG_RGBA:
+            gltf_material["pbrMetallicRoughness"]["baseColorFactor"] = [c / 255 for c in material.RGBA]
+        # textures are .dds files, which glTF doesn't support, so they are only named
+        extras = {}
+        if material.flags & MAT_FLAG_DIFFUSE:
+            extras["diffuse"] = material.diffuse_name
+        if material.flags & MAT_FLAG_ENVMAP:
+            extras["envmap"] = material.envmap_name
+        if extras:
+            gltf_material["extras"] = extras
+        self.gltf["materials"].append(gltf_material)
+        return len(self.gltf["materials"]) - 1
+
+    def add_ldo(self, filepath):
+        """
+        Writes the geometry and materials of a LDO, returns the parts its instances share.
+        """
+        ldo = read_ldo(filepath)
+        parts = []
+        materials = {}
+        for ai, atomic, lightmap_index, mesh in ldo_meshes(ldo):
+            attributes = {
+                "POSITION": self.add_accessor(to_gltf_array(mesh.positions), GLTF_FLOAT, "VEC3",
+                                              GLTF_ARRAY_BUFFER, True),
+                "NORMAL": self.add_accessor(to_gltf_array(mesh.normals), GLTF_FLOAT, "VEC3", GLTF_ARRAY_BUFFER),
+                "TEXCOORD_0": self.add_accessor(mesh.uvs, GLTF_FLOAT, "VEC2", GLTF_ARRAY_BUFFER),
+            }
+            primitives = []
+            for material_id, indices in mesh_primitives(mesh):
+                primitive = {"attributes": attributes,
+                             "indices": self.add_accessor(indices.astype("<u2").ravel(), GLTF_UNSIGNED_SHORT,
+                                                          "SCALAR", GLTF_ELEMENT_ARRAY_BUFFER)}
+                if 0 <= material_id < len(atomic.materials):
+                    if (ai, material_id) not in materials:
+                        materials[ai, material_id] = self.add_material(atomic.materials[material_id])
+                    primitive["material"] = materials[ai, material_id]
+                primitives.append(primitive)
+            if primitives:
+                parts.append((lightmap_index, mesh.vertex_cnt, primitives))
+        return {"parts": parts, "mesh": None}
+
+    def add_mesh(self, name, parts, light_uvs=None):
+        primitives = []
+        for lightmap_index, vertex_cnt, part_primitives in parts:
+            uvs = instance_light_uvs(light_uvs, lightmap_index, vertex_cnt)
+            if uvs is not None:
+                texcoord = self.add_accessor(uvs.astype(np.float32), GLTF_FLOAT, "VEC2", GLTF_ARRAY_BUFFER)
+            for primitive in part_primitives:
+                primitive = dict(primitive)
+                if uvs is not None:
+                    primitive["attributes"] = dict(primitive["attributes"], TEXCOORD_1=texcoord)
+                primitives.append(primitive)
+        self.gltf["meshes"].append({"name": name, "primitives": primitives})
+        return len(self.gltf["meshes"]) - 1
+
+    def add_instance(self, name, filepath, transform=None, light_uvs=None):
+        """
+        Adds a LDO instance as a node. Its geometry is only written for the first instance
+        of the LDO, the instances without lightmap also share their mesh.
+        """
+        key = os.path.normcase(os.path.abspath(filepath))
+        if key not in self.ldos:
+            self.ldos[key] = self.add_ldo(filepath)
+        ldo = self.ldos[key]
+        if not ldo["parts"]:
+            return
+        if light_uvs is not None:
+            mesh = self.add_mesh(name, ldo["parts"], light_uvs)
+        else:
+            if ldo["mesh"] is None:
+                ldo["mesh"] = self.add_mesh(os.path.basename(filepath).rsplit(".", 1)[0], ldo["parts"])
+            mesh = ldo["mesh"]
+
+        node = {"name": name, "mesh": mesh}
+        if transform is not None:
+            # column-major
+            node["matrix"] = transform.T.ravel().tolist()
+        self.gltf["nodes"].append(node)
+        self.gltf["scenes"][0]["nodes"].append(len(self.gltf["nodes"]) - 1)
+
+    def close(self):
+        """
+        Writes the whole binary glTF file.
+        """
+        for key in ("meshes", "materials", "accessors", "bufferViews"):
+            if not self.gltf[key]:
+                del self.gltf[key]
+        if self.bin_size:
+            self.gltf["buffers"] = [{"byteLength": self.bin_size}]
+        else:
+            del self.gltf["buffers"]
+        data = json.dumps(self.gltf, separators=(",", ":")).encode("utf-8")
+        data += b" " * (-len(data) % 4)
+
+        length = 12 + 8 + len(data) + (8 + self.bin_size if self.bin_size else 0)
+        self.file.write(struct.pack("<3I", GLB_MAGIC, 2, length))
+        self.file.write(struct.pack("<2I", len(data), GLB_CHUNK_JSON))
+        self.file.write(data)
+        if self.bin_size:
+            self.file.write(struct.pack("<2I", self.bin_size, GLB_CHUNK_BIN))
+            self.bin.seek(0)
+            shutil.copyfileobj(self.bin, self.file)
+        self.bin.close()
+
+
+class OBJ:
+    """
+    Writes a Wavefront OBJ file and its materials. OBJ has no instancing,
+    so the transformed geometry of every instance is written out.
+    Lightmaps are left out, OBJ only has one texture coordinate set.
+    """
+    def __init__(self, file, mtl_file):
+        self.file = file
+        self.mtl_file = mtl_file
+        self.file.write("mtllib {}\n".format(os.path.basename(mtl_file.name)))
+        self.vertex_cnt = 0
+        self.materials = set()
+        self.ldos = OrderedDict()
+
+    def __repr__(self):
+        return "OBJ"
+
+    def get_ldo(self, filepath):
+        key = os.path.normcase(os.path.abspath(filepath))
+        if key in self.ldos:
+            self.ldos.move_to_end(key)
+        else:
+            self.ldos[key] = read_ldo(filepath)
+            if len(self.ldos) > LDO_CACHE_SIZE:
+                self.ldos.popitem(last=False)
+        return self.ldos[key]
+
+    def add_material(self, material):
+        if material.name in self.materials:
+            return
+        self.materials.add(material.name)
+        lines = ["newmtl {}".format(material.name)]
+        if material.flags & MAT_FLAG_RGBA:
+            lines.append("Kd {:f} {:f} {:f}".format(*[c / 255 for c in material.RGBA[:3]]))
+            lines.append("d {:f}".format(material.RGBA[3] / 255))
+        if material.flags & MAT_FLAG_DIFFUSE:
+            lines.append("map_Kd {}.dds".format(material.diffuse_name))
+        self.mtl_file.write("\n".join(lines) + "\n\n")
+
+    def add_instance(self, name, filepath, transform=None, light_uvs=None):
+        ldo = self.get_ldo(filepath)
+        self.file.write("o {}\n".format(name))
+        for ai, atomic, lightmap_index, mesh in ldo_meshes(ldo):
+            positions = to_gltf_array(mesh.positions)
+            normals = to_gltf_array(mesh.normals)
+            if transform is not None:
+                positions = positions.dot(transform[:3, :3].T) + transform[:3, 3]
+                normals = normals.dot(transform[:3, :3].T)
+            uvs = np.column_stack((mesh.uvs[:, 0], 1 - mesh.uvs[:, 1]))
+            np.savetxt(self.file, positions, fmt="v %.6f %.6f %.6f")
+            np.savetxt(self.file, normals, fmt="vn %.6f %.6f %.6f")
+            np.savetxt(self.file, uvs, fmt="vt %.6f %.6f")
+            for material_id, indices in mesh_primitives(mesh):
+                if 0 <= material_id < len(atomic.materials):
+                    self.add_material(atomic.materials[material_id])
+                    self.file.write("usemtl {}\n".format(atomic.materials[material_id].name))
+                indices = indices.astype(np.int64) + self.vertex_cnt + 1
+                np.savetxt(self.file, np.repeat(indices, 3, axis=1), fmt="f %d/%d/%d %d/%d/%d %d/%d/%d")
+            self.vertex_cnt += mesh.vertex_cnt
+
+    def close(self):
+        self.ldos.clear()
+
+
+def open_lightmap(filepath, data_dir):
+    """
+    Opens the LDL file of a level and locates its instances, returns None if there is none.
+    """
+    filename = os.path.basename(filepath).rsplit(".", 1)[0] + ".ldl"
+    try:
+        file = open_insensitive(os.path.join(data_dir, LDL_PATH + filename), 'rb')
+    except OSError:
+        return None
+    lightmap = madstructs.LDL(file)
+    if not lightmap.read_header():
+        file.close()
+        return None
+    lightmap.read_index()
+    return lightmap
+
+
+def convert_file(filepath, out_filepath, data_dir=None, lightmap=True, raceline=True):
+    """
+    Converts a .ldo or level .ini file to a .glb or .obj file, according to the extension of *out_filepath*.
+    *data_dir* defaults to the data directory the input file is in.
+    Returns False if the conversion failed.
+    """
+    if data_dir is None:
+        data_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(filepath))))
+
+    ldl = None
+    try:
+        if filepath.lower().endswith(".ldo"):
+            instances = [(os.path.basename(filepath).rsplit(".", 1)[0], filepath, None, None)]
+        else:
+            if lightmap:
+                ldl = open_lightmap(filepath, data_dir)
+            instances, consumed = level_instances(filepath, data_dir, ldl, raceline)
+            if ldl and consumed < ldl.instance_cnt:
+                set_error('converting {}'.format(filepath),
+                          "Missed {} lightmap instances".format(ldl.instance_cnt - consumed))
+
+        if out_filepath.lower().endswith(".obj"):
+            with open(out_filepath, 'w') as file, open(out_filepath.rsplit(".", 1)[0] + ".mtl", 'w') as mtl_file:
+                write_instances(OBJ(file, mtl_file), instances, None)
+        else:
+            with open(out_filepath, 'wb') as file:
+                write_instances(GLB(file), instances, ldl)
+    except (OSError, KeyError, ValueError, madstructs.LDOFormatError) as e:
+        set_error('converting {}'.format(filepath), str(e))
+        return False
+    finally:
+        if ldl:
+            ldl.file.close()
+    return True
+
+
+def write_instances(writer, instances, lightmap):
+    try:
+        for name, ldo_filepath, transform, ordinal in instances:
+            light_uvs = None
+            if lightmap and ordinal is not None:
+                lightmap.fetch(ordinal)
+                light_uvs = lightmap.current_uvs
+            try:
+                writer.add_instance(name, ldo_filepath, transform, light_uvs)
+            except (OSError, madstructs.LDOFormatError) as e:
+                # leave the instance out, keep converting the level
+                set_error('converting {}'.format(name), str(e))
+    finally:
+        writer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="io_madtracks.convert", description="Convert LDO and level files to glTF or OBJ")
+    parser.add_argument("files", nargs="+", help=".ldo or level .ini files")
+    parser.add_argument("--format", choices=("glb", "obj"), default="glb", help="output format, glb by default")
+    parser.add_argument("--out-dir", default=None, help="output directory, next to each input file by default")
+    parser.add_argument("--data-dir", default=None, help="extracted data.zip directory, found from each input file by default")
+    parser.add_argument("--no-lightmap", action="store_true", help="don't convert the level lightmaps")
+    parser.add_argument("--no-raceline", action="store_true", help="leave out trackparts and collectibles")
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for filepath in args.files:
+        out_dir = args.out_dir or os.path.dirname(os.path.abspath(filepath))
+        out_filepath = os.path.join(out_dir, os.path.basename(filepath).rsplit(".", 1)[0] + "." + args.format)
+        if convert_file(filepath, out_filepath, args.data_dir, not args.no_lightmap, not args.no_raceline):
+            print("Converted {} to {}".format(filepath, out_filepath))
+        else:
+            failed += 1
+    errors = get_errors()
+    if errors != "Successfully completed.":
+        print(errors)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
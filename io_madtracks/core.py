@@ -0,0 +1,277 @@
+# Copyright (C) 2024-2026  Lucas Pottier
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#-----------------------------------------------------------------------------
+# Mad Tracks Blender Add-on, based on Re-Volt Blender Add-on.
+# Original author: Marvin Thiel
+#-----------------------------------------------------------------------------
+
+"""
+Name:    core
+Purpose: Providing variables and functions available for all modules, without Blender
+
+Description:
+Contains values that are specific to Mad Tracks, functions for converting units,
+error reporting and file helpers. This module and the format modules built
+on it (madstructs, madini) don't depend on bpy, so they can be used outside of Blender.
+
+"""
+
+import os
+import platform
+
+import numpy as np
+
+# Relative paths from the user's Mad Tracks data folder
+LDO_PATH =        os.path.join("Gfx", "models", "Geometry") + os.path.sep
+TEXTURE_PATH =    os.path.join("Graph", "maps", "High") + os.path.sep
+HUD_PATH =        os.path.join("Graph", "hud", "in") + os.path.sep
+DESCRIPTOR_PATH = os.path.join("Bin", "Descriptors") + os.path.sep
+LEVEL_PATH =      os.path.join("Bin", "Levels") + os.path.sep
+WORLD_PATH =      os.path.join("Bin", "universes") + os.path.sep
+LDL_PATH =        os.path.join("Gfx", "Lightmaps") + os.path.sep
+
+# Global dictionaries
+global ERRORS
+ERRORS = {}  # Dictionary that holds error messages
+
+# If True, more debug messages will be printed
+DEBUG = True
+
+SCALE = 1
+
+
+def dprint(*str):
+    """ Debug print: only prints if debug is enabled """
+    if DEBUG:
+        print(*str)
+
+
+"""
+Supported File Formats
+"""
+FORMAT_UNK = -1
+FORMAT_LDO = 0
+FORMAT_INI = 2
+FORMAT_DESCRIPTOR = 3
+FORMAT_LEVEL_INI = 4
+
+FORMATS = {
+    FORMAT_LDO: "LDO (.ldo)",
+    FORMAT_INI: "Unsupported (.ini)",
+    FORMAT_DESCRIPTOR: "Descriptor (.ini)",
+    FORMAT_LEVEL_INI: "Level (.ini)",
+}
+
+
+"""
+Constants used by multiple modules
+"""
+DUMMY_FLAG_POS    =  64
+DUMMY_FLAG_POSROT = 128
+DUMMY_MASK_TYPE = 15
+
+DUMMY_TYPE_WORLD =  5
+DUMMY_TYPE_NUM =    6
+DUMMY_TYPE_OUT =    9
+DUMMY_TYPE_ROOF =  10
+DUMMY_TYPE_BONUS = 11
+
+trackpart_types = {"trackpart", "start", "startfinish", "checkpoint", "looping", "finish"}
+collectible_types = {"pickupbonus", "achievement1", "achievement2"}
+
+WORLD_FRA_BISTRO    = 0
+WORLD_DEV_ONE       = 1  # dev test world
+WORLD_DEV_TWO       = 2  # dev test world
+WORLD_UK_MINIGOLF   = 3
+WORLD_GER_BAL       = 4
+WORLD_UK_STAIRS     = 5
+WORLD_USA_ROOF      = 6
+WORLD_GER_REMP      = 7
+WORLD_USA_TOY       = 8
+WORLD_FRA_MUSEE     = 9
+WORLD_ANT           = 10
+WORLD_DEV_LABO      = 11  # dev test world
+
+world_filenames = [
+    "FrBistrot.ini",
+    "WorldTest.ini",
+    "WorldTest.ini",
+    "UkMiniGolf.ini",
+    "GerBal.ini",
+    "UkStairs.ini",
+    "UsRoofs.ini",
+    "GerRamparts.ini",
+    "US_ToyStore.ini",
+    "FR_Musee.ini",
+    "Antartique.ini",
+    "Labo.ini"
+]
+
+# .ldo filenames that differ between the descriptor parameter and the actual filename
+# TODO the "_High" suffix needs to be automatically searched by the .ldo importer
+ldo_aliases = {
+    "ant_out_sea.ldo": "ant_out_sea_high.ldo",
+    "ger_eau.ldo": "ger_eau_high.ldo",
+    "ger_eau_puit.ldo": "ger_eau_puit_high.ldo",
+    "ant_eau.ldo": "ant_eau_high.ldo",
+}
+
+
+"""
+Conversion functions for Mad Tracks structures.
+Axes are saved differently and many indices are saved in a different order.
+"""
+
+def to_blender_axis(vec):
+    return [-vec[0], vec[2], vec[1]]
+
+
+def to_blender_coord(vec):
+    return [-vec[0] * SCALE, vec[2] * SCALE, vec[1] * SCALE]
+
+
+def to_blender_scale(num):
+    return num * SCALE
+
+
+def to_blender_axis_array(arr):
+    """ to_blender_axis for an (N, 3) array of vectors """
+    return np.stack((-arr[:, 0], arr[:, 2], arr[:, 1]), axis=1)
+
+
+def to_blender_coord_array(arr):
+    """ to_blender_coord for an (N, 3) array of vectors """
+    return np.stack((-arr[:, 0] * SCALE, arr[:, 2] * SCALE, arr[:, 1] * SCALE), axis=1)
+
+
+def to_madtracks_axis(vec):
+    return [-vec[0], vec[2], vec[1]]
+
+
+def to_madtracks_coord(vec):
+    return [-vec[0] / SCALE, vec[2] / SCALE, vec[1] / SCALE]
+
+
+def to_madtracks_scale(num):
+    return num / SCALE
+
+
+def to_madtracks_axis_array(arr):
+    """ to_madtracks_axis for an (N, 3) array of vectors """
+    return np.stack((-arr[:, 0], arr[:, 2], arr[:, 1]), axis=1)
+
+
+def to_madtracks_coord_array(arr):
+    """ to_madtracks_coord for an (N, 3) array of vectors """
+    return np.stack((-arr[:, 0] / SCALE, arr[:, 2] / SCALE, arr[:, 1] / SCALE), axis=1)
+
+
+def to_blender_rotation(matrix):
+    """ Rows of the Blender rotation matrix of a Mad Tracks (AT, Up, Left) matrix """
+    return [
+        (matrix[2][0], -matrix[0][0], -matrix[1][0]),
+        (-matrix[2][2], matrix[0][2], matrix[1][2]),
+        (-matrix[2][1], matrix[0][1], matrix[1][1])
+    ]
+
+
+def instance_matrix(direction_at, direction_up):
+    """
+    Returns the (AT, Up, Left) rotation matrix of a level instance
+    from its DirectionAT and DirectionUp parameters.
+    """
+    direction_left = -np.cross(direction_at, direction_up)
+    return [
+        (direction_at[0], direction_at[1], direction_at[2]),
+        (direction_up[0], direction_up[1], direction_up[2]),
+        (direction_left[0], direction_left[1], direction_left[2]),
+    ]
+
+
+def to_madtracks_matrix(matrix):
+    return [
+        (-matrix[0][1], matrix[2][1], matrix[1][1]),
+        (-matrix[0][2], matrix[2][2], matrix[1][2]),
+        (matrix[0][0], -matrix[2][0], -matrix[1][0])
+    ]
+
+
+def get_errors():
+    global ERRORS
+    if ERRORS:
+        errors = "The following errors have been encountered:\n\n"
+        for error in ERRORS:
+            errors += "~ ERROR while {}:\n     {}\n\n".format(error, ERRORS[error])
+        errors += "Check the console if available for more information."
+    else:
+        errors = "Successfully completed."
+
+    # Clears the error messages
+    ERRORS = {}
+
+    return errors
+
+
+def set_error(step, msg):
+    global ERRORS
+    if step in ERRORS.keys():
+        # don't overwrite previous error
+        return
+    ERRORS[step] = msg
+
+
+"""
+Non-Blender helper functions
+"""
+def filepath_insensitive(filepath):
+    """
+    Mad Tracks heavily relies on insensitive casing for files.
+    Doesn't guarantee that the filepath returned exists.
+    """
+    if platform.system() == "Linux":
+        path, filename = os.path.split(filepath)
+        if not os.path.isdir(path):
+            return filepath
+        for filename_real in os.listdir(path):
+            if filename_real.lower() == filename.lower():
+                return os.path.join(path, filename_real)
+    return filepath
+
+
+def open_insensitive(filepath, mode):
+    """
+    Opens a file in a case sensitive filesystem.
+    Additionally use valid codec for caractères spéciaux français.
+    """
+    filepath_real = filepath_insensitive(filepath)
+
+    if mode in ['r', 'w']:
+        return open(filepath_real, mode, encoding="ISO-8859-1")
+    else:
+        return open(filepath_real, mode)
+
+
+def get_format(fstr):
+    """
+    Gets the format by the ending and returns an int
+    """
+    fstr = fstr.lower()  # support uppercase letters
+    if os.sep in fstr:
+        fstr = fstr.split(os.sep)[-1]
+    try:
+        fname, ext = fstr.split(".", 1)
+    except:
+        fname, ext = ("", "")
+
+    if ext == "ldo":
+        return FORMAT_LDO
+    elif ext == "ini":
+        return FORMAT_INI
+    else:
+        return FORMAT_UNK
+
+
+def float_format(value):
+    return '{:f}'.format(value)
@@ -46,19 +46,11 @@ def import_file(filepath, scene, lightmap=None):
             filename = ini['object']['filename']
             if ".ldo" in filename:
                 ldoname = filename.split("/", 1)[1] # strip "geometry/"
-                # Handle .ldo filenames that differ between the descriptor parameter and the actual filename
-                # TODO the "_High" suffix needs to be automatically searched by the .ldo importer
-                if ldoname == "ant_out_sea.ldo":
-                    ldoname = "ant_out_sea_high.ldo"
-                elif ldoname == "ger_eau.ldo":
-                    ldoname = "ger_eau_high.ldo"
-                elif ldoname == "ger_eau_puit.ldo":
-                    ldoname = "ger_eau_puit_high.ldo"
-                elif ldoname == "ant_eau.ldo":
-                    ldoname = "ant_eau_high.ldo"
+                ldoname = ldo_aliases.get(ldoname, ldoname)
 
                 # import LDO
-                ldo_in.import_file(props.settings_madtracks_dir + LDO_PATH + ldoname, scene, lightmap)
+                if not ldo_in.import_file(props.settings_madtracks_dir + LDO_PATH + ldoname, scene, lightmap):
+                    return False
                 obj = bpy.context.active_object
                 if "objecttype" in ini['object'].keys() and ini['object']['objecttype'] in trackpart_types:
                     # assign trackpart properties
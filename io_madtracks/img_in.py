@@ -11,6 +11,10 @@
 Name:    img_in
 Purpose: Imports image files.
 
+Description:
+Images are registered by path for the duration of an import session,
+so each texture is looked up and loaded only once.
+
 """
 
 import bpy
@@ -18,6 +22,39 @@ import os
 
 from .common import *
 
+# images of the current import session by registry_key, None for the missing ones
+registry = {}
+
+
+def registry_key(filepath):
+    return os.path.normcase(os.path.normpath(filepath)).casefold()
+
+
+def clear_registry():
+    """
+    Starts a new import session, called before each import.
+    """
+    registry.clear()
+
+
+def get_image(filepath):
+    """
+    Returns the image of a file, loading it only if it isn't in the current session or blend file.
+    Returns None if it couldn't be found, which is only reported once per session.
+    """
+    key = registry_key(filepath)
+    if key not in registry:
+        image = None
+        for existing in bpy.data.images:
+            if registry_key(existing.filepath) == key:
+                image = existing
+                break
+        if image is None:
+            image = import_file(filepath)
+        registry[key] = image
+    return registry[key]
+
+
 def import_file(filepath):
     filepath_real = filepath_insensitive(filepath)
     if os.path.exists(filepath_real):
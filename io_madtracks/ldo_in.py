@@ -24,7 +24,8 @@ if "bpy" in locals():
 
 import os
 import bpy
-import bmesh
+
+import numpy as np
 
 from . import common
 from . import madstructs
@@ -33,20 +34,42 @@ from . import img_in
 from .madstructs import *
 from .common import *
 
+# materials and textures of the current import session by material_signature and image registry_key
+materials = {}
+textures = {}
+
+
+def clear_registry():
+    """
+    Starts a new import session, called before each import.
+    """
+    materials.clear()
+    textures.clear()
+
 
 def import_file(filepath, scene, lightmap=None):
+    """
+    Imports a LDO file as Blender objects, the last one created being the active object.
+    Returns False if the file couldn't be read.
+    """
     props = scene.madtracks
     filename = os.path.basename(filepath)
     ldoname = filename.rsplit(".", 1)[0]
 
     with open_insensitive(filepath, 'rb') as file:
-        # read the file
+        # read the whole file at once and parse it from memory
         dprint("Reading LDO file %s..." % filename)
-        ldo = LDO()
-        ldo.read(file, props.ldo_debug_info)
-        # check for EOF
-        if len(file.read(1)) != 0:
-            dprint("End of file %s wasn't reached." % filename)
+        buf = file.read()
+    ldo = LDO()
+    try:
+        offset = ldo.read_buffer(buf, debug=props.ldo_debug_info, validate=True)
+    except madstructs.LDOFormatError as e:
+        # qualified as the reloads of the other modules replace the star-imported class
+        set_error('reading LDO file {}'.format(filename), str(e))
+        return False
+    # check for EOF
+    if offset != len(buf):
+        dprint("End of file %s wasn't reached." % filename)
 
     # create Blender meshes from LDO atomics
     meshes = ldo_to_meshes(ldo, ldoname, scene, props, lightmap)
@@ -90,6 +113,8 @@ def import_file(filepath, scene, lightmap=None):
 
     dprint("Imported {} ({} atomics)".format(filename, ldo.atomic_cnt))
 
+    return True
+
 
 def ldo_to_meshes(ldo, ldoname, scene, props, lightmap=None):
     """
@@ -111,214 +136,268 @@ def ldo_to_meshes(ldo, ldoname, scene, props, lightmap=None):
                 meshname = ldoname
             mesh = bpy.data.meshes.new(meshname)
 
-            bm = bmesh.new()
-            bm.loops.layers.uv.new("UVMap")
-            bm.faces.layers.tex.new("UVMap")
+            # fill Blender mesh with atomic meshes
+            parts = [(atomic, atomic_mesh, None) for atomic_mesh in atomic.meshes]
+            kept_tris = mesh_add_atomic_meshes(mesh, parts, props)
             
-            # fill bmesh with atomic meshes
-            vertex_offset = 0
-            for atomic_mesh in atomic.meshes:
-                bmesh_add_atomic_mesh(bm, atomic, atomic_mesh, scene, vertex_offset)
-                vertex_offset += atomic_mesh.vertex_cnt
-
-            # fill Blender mesh with bmesh
-            bm.to_mesh(mesh)
-            bm.free()
-            
-            mesh_assign_materials(ldo.atomic_cnt, atomic, mesh, props)
+            mesh_assign_materials([atomic], mesh, props, kept_tris=kept_tris)
 
             meshes.append(mesh)
     else:
         # merge all atomics into a single mesh
         mesh = bpy.data.meshes.new(ldoname)
 
-        bm = bmesh.new()
-        bm.loops.layers.uv.new("UVMap")
-        if lightmap:
-            bm.loops.layers.uv.new("LightMap")
-        bm.faces.layers.tex.new("UVMap")
-
-        # fill bmesh with all atomics meshes
-        vertex_offset = 0
-        for atomic in ldo.atomics:
+        # fill Blender mesh with all atomics meshes
+        atomics = [atomic for atomic in ldo.atomics if not atomic.is_empty]
+        parts = []
+        for atomic, indices in zip(ldo.atomics, lightmap_mesh_indices(ldo)):
             if atomic.is_empty:
                 continue
-            i = atomic.mesh_cnt - 1 # meshes are stored in reverse order in the LDO, thanks for the rage Load xoxo
-            for atomic_mesh in atomic.meshes:
+            # meshes are stored in reverse order in the LDL, thanks for the rage Load xoxo
+            for atomic_mesh, i in zip(atomic.meshes, indices):
+                light_uvs = None
                 if lightmap:
-                    bmesh_add_atomic_mesh(bm, atomic, atomic_mesh, scene, vertex_offset, lightmap.current_uvs[i])
-                else:
-                    bmesh_add_atomic_mesh(bm, atomic, atomic_mesh, scene, vertex_offset)
-                vertex_offset += atomic_mesh.vertex_cnt
-                i -= 1
-
-        # fill Blender mesh with bmesh
-        bm.to_mesh(mesh)
-        bm.free()
+                    if i < len(lightmap.current_uvs) and len(lightmap.current_uvs[i]) == atomic_mesh.vertex_cnt:
+                        light_uvs = lightmap.current_uvs[i]
+                    else:
+                        msg = "lightmap mesh {} doesn't match the LDO, its lightmap UVs are zeroed".format(i)
+                        dprint("{}: {}".format(ldoname, msg))
+                        set_error('reading the lightmap of {}'.format(ldoname), msg)
+                parts.append((atomic, atomic_mesh, light_uvs))
+        kept_tris = mesh_add_atomic_meshes(mesh, parts, props, lightmap is not None)
 
-        # FIXME currently only assigns the last atomic materials
-        mesh_assign_materials(ldo.atomic_cnt, atomic, mesh, props, lightmap)
+        mesh_assign_materials(atomics, mesh, props, lightmap, kept_tris)
 
         meshes.append(mesh)
 
     return meshes
 
 
-def bmesh_add_atomic_mesh(bm, atomic, atomic_mesh, scene, vertex_offset=0, light_uvs=None):
+def valid_tris(tris, vertex_cnt):
     """
-    Adds an atomic mesh to an existing bmesh. Returns the resulting bmesh.
+    Returns the mask of the tris Blender accepts as faces: the ones using existing,
+    distinct vertices, and only the first of the tris using the same vertices.
     """
-    props = scene.madtracks
-    uv_layer = bm.loops.layers.uv["UVMap"]
-    if light_uvs:
-        light_layer = bm.loops.layers.uv["LightMap"]
-    tex_layer = bm.faces.layers.tex["UVMap"]
-
-    for vert in atomic_mesh.vertices:
-        position = to_blender_coord(vert.position.data)
-        normal = to_blender_axis(vert.normal.data)
-
-        # create vertices
-        vert = bm.verts.new(Vector(data=(position[0], position[1], position[2])))
-        vert.normal = Vector(data=(normal[0], normal[1], normal[2]))
-
-        # ensure lookup table (potentially puts out an error otherwise)
-        bm.verts.ensure_lookup_table()
-
-    for poly in atomic_mesh.tris:
-        num_loops = 3 # Mad Tracks only uses tris
-        indices = poly.vertices_id
-
-        verts = (bm.verts[indices[0] + vertex_offset], bm.verts[indices[1] + vertex_offset],
-                 bm.verts[indices[2] + vertex_offset])
-
-        # Tries to create a face and yells at you when the face already exists
-        try:
-            face = bm.faces.new(verts)
-        except Exception as e:
-            print(e)
-            continue  # skip this face
-
-        # Assigns the diffuse image to the face
-        material = atomic.materials[poly.material_id]
-        if (bool(material.flags & MAT_FLAG_DIFFUSE)):
-           texture = None
-           texture_path = props.settings_madtracks_dir + TEXTURE_PATH + material.diffuse_name + ".dds"
-           for image in bpy.data.images:
-               if image.filepath == texture_path:
-                   texture = image
-           if not texture:
-               texture = img_in.import_file(texture_path)
-           face[tex_layer].image = texture
-
-        # Assigns the UV mapping, prevent UVs from leaving boundaries? (see Bistrot.ldo door)
-        uvs = []
-        for i in indices:
-            uvs.append(atomic_mesh.vertices[i].uv)
-
-        for l in range(num_loops):
-            face.loops[l][uv_layer].uv = (uvs[l].u, 1 - uvs[l].v)
-        
-        if light_uvs:
-            uvs = []
-            for i in indices:
-                uvs.append(light_uvs[i])
-
-            # Assigns the lightmap UV mapping
-            for l in range(num_loops):
-                face.loops[l][light_layer].uv = (uvs[l].u, 1 - uvs[l].v)
-
-        # Enables smooth shading for that face
-        #face.smooth = True
-
-
-def mesh_assign_materials(atomic_cnt, atomic, mesh, props, lightmap=None):
-    # assign atomic materials to mesh
-    for atomic_mat in atomic.materials:
-        # reuse already imported lightmapped materials
-        mat_index = bpy.data.materials.find(atomic_mat.name + "_lgt")
-        if mat_index >= 0 and lightmap:
-            material = bpy.data.materials[mat_index]
-        else:
-            # new Blender material
-            material = bpy.data.materials.new(atomic_mat.name)
-
-            if (bool(atomic_mat.flags & MAT_FLAG_RGBA)):
-                material.madtracks.has_rgba = True
-                material.diffuse_color = [float(atomic_mat.RGBA[0] / 255),
-                                        float(atomic_mat.RGBA[1] / 255),
-                                        float(atomic_mat.RGBA[2] / 255)]
-                material.use_transparency = True
-                material.alpha = float(atomic_mat.RGBA[3] / 255)
-            if (bool(atomic_mat.flags & MAT_FLAG_BRIGHTNESS)):
-                material.madtracks.has_brightness = True
-                # Blender's default diffuse_intensity is 0.8
-                material.diffuse_intensity = float((atomic_mat.brightness + 1) / 2)
-
-            if atomic_mat.diffuse_name_len:
-                texslot = material.texture_slots.add()
-
-                # new Blender texture for diffuse
-                texture = bpy.data.textures.new(atomic_mat.diffuse_name, "IMAGE")
-                image = None
-                filename = atomic_mat.diffuse_name + ".dds"
-                # reuse shared images between atomics
-                # FIXME this doesn't reload the image if another import loaded it before
-                if atomic_cnt > 1 and bpy.data.images.find(filename) >= 0:
-                    image = bpy.data.images[bpy.data.images.find(filename)]
-                else:
-                    image = img_in.import_file(props.settings_madtracks_dir + TEXTURE_PATH + filename)
-                texture.image = image
-                texslot.texture = texture
-
-            if atomic_mat.envmap_name_len:
-                texslot = material.texture_slots.add()
-
-                # new Blender texture for envmap
-                texture = bpy.data.textures.new(atomic_mat.envmap_name, "IMAGE")
-                image = None
-                filename = atomic_mat.envmap_name + ".dds"
-                # reuse shared images between atomics
-                if atomic_cnt > 1 and bpy.data.images.find(filename) >= 0:
-                    image = bpy.data.images[bpy.data.images.find(filename)]
-                else:
-                    image = img_in.import_file(props.settings_madtracks_dir + TEXTURE_PATH + filename)
-                texture.image = image
-                texslot.texture = texture
-                texslot.blend_type = "SOFT_LIGHT"
-                texslot.diffuse_color_factor = 0.5
-            
-            if lightmap:
-                # add a lightmap suffix to be reused later
-                material.name = material.name + "_lgt"
-                texslot = material.texture_slots.add()
-                texture = None
-                # reuse lightmap texture
-                image_name = os.path.basename(lightmap.file.name)
-                image_name = image_name.rsplit(".", 1)[0] + "_lgt0000"
-                tex_index = bpy.data.textures.find(image_name)
-                if tex_index >= 0:
-                    texture = bpy.data.textures[tex_index]
-                if not texture:
-                    # new Blender texture for lightmap
-                    texture = bpy.data.textures.new(image_name, "IMAGE")
-                    filename = image_name + ".dds"
-                    image = img_in.import_file(props.settings_madtracks_dir + LDL_PATH + filename)
-                    texture.image = image
-                texslot.texture = texture
-                texslot.blend_type = "MULTIPLY"
-                texslot.uv_layer = "LightMap"
-
-            # other convenient material properties
-            material.specular_intensity = 0
-
-        mesh.materials.append(material)
-    
-    # assign material to mesh faces
+    sorted_tris = np.sort(tris, axis=1)
+    valid = ((tris >= 0) & (tris < vertex_cnt)).all(axis=1)
+    valid &= (sorted_tris[:, 0] != sorted_tris[:, 1]) & (sorted_tris[:, 1] != sorted_tris[:, 2])
+    candidates = np.flatnonzero(valid)
+    if len(candidates):
+        _, first = np.unique(sorted_tris[candidates], axis=0, return_index=True)
+        valid[:] = False
+        valid[candidates[first]] = True
+    return valid
+
+
+def material_image(material, props):
+    """
+    Returns the diffuse image of a LDO material, None if it doesn't have any.
+    """
+    if not (bool(material.flags & MAT_FLAG_DIFFUSE)):
+        return None
+    return img_in.get_image(props.settings_madtracks_dir + TEXTURE_PATH + material.diffuse_name + ".dds")
+
+
+def mesh_add_atomic_meshes(mesh, parts, props, lightmapped=False):
+    """
+    Fills an empty Blender mesh with atomic meshes at once.
+    *parts* is a list of (atomic, atomic_mesh, light_uvs), light_uvs being
+    None for the atomic meshes without lightmap.
+    Returns the mask of the tris that became faces, in the atomic meshes order.
+    """
+    positions = []
+    normals = []
+    uvs = []
+    light_uvs = []
+    tris = []
+    sequences = []  # (image, first tri, tri count) of each tri sequence
     tri_offset = 0
-    for atomic_mesh in atomic.meshes:
-        # rely on the fact the mesh vertices and materials are created in the LDO order
-        for material_id, sequence_len in zip(atomic_mesh.tri_seq_mat, atomic_mesh.tri_seq_len):
-            for ti in range(sequence_len):
-                mesh.polygons[ti + tri_offset].material_index = material_id
+    vertex_offset = 0
+    for atomic, atomic_mesh, mesh_light_uvs in parts:
+        positions.append(to_blender_coord_array(atomic_mesh.positions))
+        normals.append(to_blender_axis_array(atomic_mesh.normals))
+        uvs.append(atomic_mesh.uvs)
+        if lightmapped:
+            if mesh_light_uvs is None:
+                mesh_light_uvs = np.zeros((atomic_mesh.vertex_cnt, 2), dtype=np.float32)
+            light_uvs.append(mesh_light_uvs)
+        tris.append(atomic_mesh.tri_indices.astype(np.int32) + vertex_offset)
+
+        # diffuse image of each tri sequence, resolved once per material
+        images = [material_image(material, props) for material in atomic.materials]
+        for material_id, sequence_len in zip(atomic_mesh.tri_seq_mat.tolist(), atomic_mesh.tri_seq_len.tolist()):
+            image = images[material_id] if 0 <= material_id < len(images) else None
+            sequences.append((image, tri_offset, sequence_len))
             tri_offset += sequence_len
+
+        vertex_offset += atomic_mesh.vertex_cnt
+
+    positions = np.concatenate(positions) if positions else np.zeros((0, 3))
+    tris = np.concatenate(tris) if tris else np.zeros((0, 3), dtype=np.int32)
+    kept_tris = valid_tris(tris, vertex_offset)
+    if not kept_tris.all():
+        dprint("Skipped {} invalid or duplicate faces".format(len(tris) - np.count_nonzero(kept_tris)))
+    tris = tris[kept_tris]
+    loop_vertices = tris.ravel()
+    tri_cnt = len(tris)
+
+    # geometry
+    mesh.vertices.add(vertex_offset)
+    mesh.vertices.foreach_set("co", positions.astype(np.float32).ravel())
+    mesh.loops.add(tri_cnt * 3)
+    mesh.loops.foreach_set("vertex_index", loop_vertices)
+    mesh.polygons.add(tri_cnt)
+    mesh.polygons.foreach_set("loop_start", np.arange(0, tri_cnt * 3, 3, dtype=np.int32))
+    mesh.polygons.foreach_set("loop_total", np.full(tri_cnt, 3, dtype=np.int32))
+    mesh.update(calc_edges=True)
+    if tri_cnt:
+        # LDO normals as custom split normals, only used by smooth faces
+        mesh.polygons.foreach_set("use_smooth", np.ones(tri_cnt, dtype=bool))
+        mesh.use_auto_smooth = True
+        mesh.normals_split_custom_set_from_vertices(np.concatenate(normals).astype(np.float32))
+
+    # UVs are stored per loop in Blender, with v flipped
+    mesh.uv_textures.new("UVMap")
+    if tri_cnt:
+        loop_uvs = np.concatenate(uvs)[loop_vertices]
+        loop_uvs[:, 1] = 1 - loop_uvs[:, 1]
+        mesh.uv_layers["UVMap"].data.foreach_set("uv", loop_uvs.astype(np.float32).ravel())
+    if lightmapped:
+        mesh.uv_textures.new("LightMap")
+        if tri_cnt:
+            loop_uvs = np.concatenate(light_uvs)[loop_vertices]
+            loop_uvs[:, 1] = 1 - loop_uvs[:, 1]
+            mesh.uv_layers["LightMap"].data.foreach_set("uv", loop_uvs.astype(np.float32).ravel())
+
+    # Assigns the diffuse images to the faces, one tri sequence at a time
+    tex_data = mesh.uv_textures["UVMap"].data
+    polygon_offsets = np.concatenate(([0], np.cumsum(kept_tris))).tolist()
+    for image, tri_start, sequence_len in sequences:
+        if image is None:
+            continue
+        tri_end = min(tri_start + sequence_len, len(kept_tris))
+        for polygon_index in range(polygon_offsets[tri_start], polygon_offsets[tri_end]):
+            tex_data[polygon_index].image = image
+
+    return kept_tris
+
+
+def material_signature(atomic_mat, lightmap=None):
+    """
+    Returns the key of an atomic material in the session registry, equal for identical materials.
+    """
+    return (atomic_mat.name, atomic_mat.flags, tuple(atomic_mat.RGBA), atomic_mat.brightness,
+            atomic_mat.diffuse_name, atomic_mat.envmap_name,
+            img_in.registry_key(lightmap.file.name) if lightmap else None)
+
+
+def get_texture(name, filepath):
+    """
+    Returns the image texture of a file, creating it only if it isn't in the current session or blend file.
+    """
+    key = img_in.registry_key(filepath)
+    if key not in textures:
+        texture = None
+        for existing in bpy.data.textures:
+            image = getattr(existing, "image", None)
+            if image and img_in.registry_key(image.filepath) == key:
+                texture = existing
+                break
+        if texture is None:
+            texture = bpy.data.textures.new(name, "IMAGE")
+            texture.image = img_in.get_image(filepath)
+        textures[key] = texture
+    return textures[key]
+
+
+def get_material(atomic_mat, props, lightmap=None):
+    """
+    Returns the Blender material of an atomic material, shared by the identical ones of the import session.
+    """
+    key = material_signature(atomic_mat, lightmap)
+    if key not in materials:
+        materials[key] = new_material(atomic_mat, props, lightmap)
+    return materials[key]
+
+
+def new_material(atomic_mat, props, lightmap=None):
+    """
+    Returns the Blender material of an atomic material.
+    """
+    # reuse lightmapped materials of previous imports
+    mat_index = bpy.data.materials.find(atomic_mat.name + "_lgt")
+    if mat_index >= 0 and lightmap:
+        return bpy.data.materials[mat_index]
+
+    # new Blender material
+    material = bpy.data.materials.new(atomic_mat.name)
+
+    if (bool(atomic_mat.flags & MAT_FLAG_RGBA)):
+        material.madtracks.has_rgba = True
+        material.diffuse_color = [float(atomic_mat.RGBA[0] / 255),
+                                float(atomic_mat.RGBA[1] / 255),
+                                float(atomic_mat.RGBA[2] / 255)]
+        material.use_transparency = True
+        material.alpha = float(atomic_mat.RGBA[3] / 255)
+    if (bool(atomic_mat.flags & MAT_FLAG_BRIGHTNESS)):
+        material.madtracks.has_brightness = True
+        # Blender's default diffuse_intensity is 0.8
+        material.diffuse_intensity = float((atomic_mat.brightness + 1) / 2)
+
+    if atomic_mat.diffuse_name_len:
+        # diffuse texture, shared with the other materials using it
+        texslot = material.texture_slots.add()
+        texslot.texture = get_texture(atomic_mat.diffuse_name,
+            props.settings_madtracks_dir + TEXTURE_PATH + atomic_mat.diffuse_name + ".dds")
+
+    if atomic_mat.envmap_name_len:
+        # envmap texture, shared with the other materials using it
+        texslot = material.texture_slots.add()
+        texslot.texture = get_texture(atomic_mat.envmap_name,
+            props.settings_madtracks_dir + TEXTURE_PATH + atomic_mat.envmap_name + ".dds")
+        texslot.blend_type = "SOFT_LIGHT"
+        texslot.diffuse_color_factor = 0.5
+
+    if lightmap:
+        # add a lightmap suffix to be reused later
+        material.name = material.name + "_lgt"
+        texslot = material.texture_slots.add()
+        image_name = os.path.basename(lightmap.file.name)
+        image_name = image_name.rsplit(".", 1)[0] + "_lgt0000"
+        texslot.texture = get_texture(image_name, props.settings_madtracks_dir + LDL_PATH + image_name + ".dds")
+        texslot.blend_type = "MULTIPLY"
+        texslot.uv_layer = "LightMap"
+
+    # other convenient material properties
+    material.specular_intensity = 0
+
+    return material
+
+
+def mesh_assign_materials(atomics, mesh, props, lightmap=None, kept_tris=None):
+    """
+    Assigns the materials of atomics to a mesh and its faces, the mesh being made of their meshes in order.
+    The atomic material tables are appended one after the other to the mesh materials.
+    *kept_tris* is the mask of the atomic tris that became faces, all of them if None.
+    """
+    material_ids = []
+    material_offset = 0
+    for atomic in atomics:
+        # assign atomic materials to mesh
+        for atomic_mat in atomic.materials:
+            mesh.materials.append(get_material(atomic_mat, props, lightmap))
+
+        # material of each tri, moved to the atomic slots of the merged table
+        for atomic_mesh in atomic.meshes:
+            tri_material_ids = np.repeat(atomic_mesh.tri_seq_mat, atomic_mesh.tri_seq_len)
+            invalid = (tri_material_ids < 0) | (tri_material_ids >= len(atomic.materials))
+            tri_material_ids[invalid] = 0
+            material_ids.append(tri_material_ids + material_offset)
+        material_offset += len(atomic.materials)
+
+    # assign material to mesh faces
+    if material_ids:
+        material_ids = np.concatenate(material_ids)
+        if kept_tris is not None:
+            material_ids = material_ids[kept_tris]
+        mesh.polygons.foreach_set("material_index", material_ids.astype(np.int32))
@@ -23,6 +23,8 @@ if "bpy" in locals():
 import os
 import bpy
 
+import numpy as np
+
 from . import common
 from . import madstructs
 
@@ -41,6 +43,8 @@ def export_file(filepath, scene):
     ldo = LDO()
     
     for obj in bpy.data.objects:
+        if obj.type != 'MESH':
+            continue
         object_to_atomic(obj, ldo)
         ldo.atomic_cnt += 1
 
@@ -60,13 +64,18 @@ def object_to_atomic(obj, ldo):
     """
     mesh = obj.data
     atomic = Atomic()
-    atomic.mesh_cnt = 1
     if not(mesh.vertices):
         atomic.is_empty = True
         ldo.atomics.append(atomic)
         return
+    atomic.name = obj.name.split(".", 1)[0]
     
     for material in mesh.materials:
+        if not material:
+            # empty slot, its faces still need a material to reference
+            atomic.materials.append(default_material(atomic.name))
+            atomic.material_cnt += 1
+            continue
         madmat = Material()
         madmat.name_len = len(material.name.split(".", 1)[0])
         madmat.name = material.name.split(".", 1)[0]
@@ -100,10 +109,125 @@ def object_to_atomic(obj, ldo):
         
         atomic.materials.append(madmat)
         atomic.material_cnt += 1
+
+    if not atomic.materials:
+        # the tri sequences reference material 0
+        dprint("No material on {}, exporting a default one".format(obj.name))
+        atomic.materials.append(default_material(atomic.name))
+        atomic.material_cnt += 1
         
-    # mesh. ...
-    # len(mesh.materials)
-    # loop mesh.polygons
-        # add poly to tri sequence corresponding to material assigned
+    atomic.meshes = mesh_to_atomic_meshes(mesh)
+    atomic.mesh_cnt = len(atomic.meshes)
     
     ldo.atomics.append(atomic)
+
+
+def default_material(name):
+    """
+    Returns a plain material without color or texture.
+    """
+    madmat = Material()
+    madmat.name_len = len(name.encode("utf-8"))
+    madmat.name = name
+    return madmat
+
+
+def mesh_to_atomic_meshes(mesh):
+    """
+    Converts a Blender mesh's geometry into atomic meshes.
+    Polygons are triangulated, loops are split into unique vertices
+    (position, normal, uv) and tris are grouped into one tri sequence per material.
+    Tris are split into several atomic meshes if there are too many vertices for one.
+    """
+    vertex_cnt = len(mesh.vertices)
+    loop_cnt = len(mesh.loops)
+    poly_cnt = len(mesh.polygons)
+
+    # read all the geometry at once
+    co = np.empty(vertex_cnt * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    loop_vertex = np.empty(loop_cnt, dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loop_vertex)
+    loop_uvs = np.zeros(loop_cnt * 2, dtype=np.float32)
+    uv_layer = mesh.uv_layers.get("UVMap") or mesh.uv_layers.active
+    if uv_layer:
+        uv_layer.data.foreach_get("uv", loop_uvs)
+    if mesh.has_custom_normals:
+        # custom split normals of imported LDOs, so that they round-trip
+        mesh.calc_normals_split()
+        loop_normals = np.empty(loop_cnt * 3, dtype=np.float32)
+        mesh.loops.foreach_get("normal", loop_normals)
+        mesh.free_normals_split()
+        loop_normals = loop_normals.reshape(-1, 3)
+    else:
+        normals = np.empty(vertex_cnt * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("normal", normals)
+        loop_normals = normals.reshape(-1, 3)[loop_vertex]
+    loop_start = np.empty(poly_cnt, dtype=np.int32)
+    mesh.polygons.foreach_get("loop_start", loop_start)
+    loop_total = np.empty(poly_cnt, dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_total)
+    poly_material = np.empty(poly_cnt, dtype=np.int32)
+    mesh.polygons.foreach_get("material_index", poly_material)
+    # Blender uses the last material for indices past the slots
+    np.clip(poly_material, 0, max(len(mesh.materials) - 1, 0), out=poly_material)
+
+    # per-loop vertex data in Mad Tracks coordinates, packed as 8 floats
+    loop_data = np.empty((loop_cnt, 8), dtype=np.float32)
+    loop_data[:, 0:3] = to_madtracks_coord_array(co.reshape(-1, 3)[loop_vertex])
+    loop_data[:, 3:6] = to_madtracks_axis_array(loop_normals)
+    loop_data[:, 6] = loop_uvs[0::2]
+    loop_data[:, 7] = 1 - loop_uvs[1::2]
+
+    # fan triangulation of the polygons
+    poly_tri_cnt = np.maximum(loop_total - 2, 0)
+    tri_poly = np.repeat(np.arange(poly_cnt), poly_tri_cnt)
+    tri_in_poly = np.arange(len(tri_poly)) - np.repeat(np.cumsum(poly_tri_cnt) - poly_tri_cnt, poly_tri_cnt)
+    tri_start = loop_start[tri_poly]
+    tri_loops = np.stack((tri_start, tri_start + tri_in_poly + 1, tri_start + tri_in_poly + 2), axis=1)
+    tri_material = poly_material[tri_poly]
+
+    # group tris by material, keeping their order inside a material
+    order = np.argsort(tri_material, kind="mergesort")
+    tri_loops = tri_loops[order]
+    tri_material = tri_material[order]
+
+    atomic_mesh = tris_to_atomic_mesh(loop_data, tri_loops, tri_material)
+    if atomic_mesh.vertex_cnt <= MESH_MAX_VERTICES:
+        return [atomic_mesh]
+
+    # split the tris so that a chunk can't have more vertices than allowed
+    meshes = []
+    chunk_len = MESH_MAX_VERTICES // 3
+    for start in range(0, len(tri_loops), chunk_len):
+        meshes.append(tris_to_atomic_mesh(loop_data, tri_loops[start:start + chunk_len],
+                                          tri_material[start:start + chunk_len]))
+    return meshes
+
+
+def tris_to_atomic_mesh(loop_data, tri_loops, tri_material):
+    """
+    Builds an atomic mesh from tris sorted by material, given as loop indices into loop_data.
+    """
+    # unique vertices among the loops used, in order of first use
+    used_loops = tri_loops.ravel()
+    keys = np.ascontiguousarray(loop_data[used_loops]).view(np.dtype((np.void, loop_data.itemsize * 8))).ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    rank = np.empty(len(first), dtype=np.int64)
+    rank[np.argsort(first, kind="mergesort")] = np.arange(len(first))
+    vertices = loop_data[used_loops[np.sort(first)]]
+
+    atomic_mesh = Mesh()
+    atomic_mesh.vertex_cnt = len(vertices)
+    atomic_mesh.tri_cnt = len(tri_loops)
+    atomic_mesh.positions = np.ascontiguousarray(vertices[:, 0:3])
+    atomic_mesh.normals = np.ascontiguousarray(vertices[:, 3:6])
+    atomic_mesh.uvs = np.ascontiguousarray(vertices[:, 6:8])
+    atomic_mesh.tri_indices = rank[inverse.ravel()].reshape(-1, 3).astype(np.int16)
+
+    # one tri sequence per material
+    seq_mat, seq_len = np.unique(tri_material, return_counts=True)
+    atomic_mesh.tri_seq_cnt = len(seq_mat)
+    atomic_mesh.tri_seq_mat = seq_mat.astype(np.int32)
+    atomic_mesh.tri_seq_len = seq_len.astype(np.int32)
+    return atomic_mesh
@@ -28,8 +28,6 @@ if "bpy" in locals():
 import os
 import bpy
 
-import numpy as np
-
 from . import common
 from . import ldo_in
 from . import descriptor_in
@@ -44,34 +42,6 @@ from .madstructs import *
 from .madini import *
 from .trackpart import *
 
-WORLD_FRA_BISTRO    = 0
-WORLD_DEV_ONE       = 1  # dev test world
-WORLD_DEV_TWO       = 2  # dev test world
-WORLD_UK_MINIGOLF   = 3
-WORLD_GER_BAL       = 4
-WORLD_UK_STAIRS     = 5
-WORLD_USA_ROOF      = 6
-WORLD_GER_REMP      = 7
-WORLD_USA_TOY       = 8
-WORLD_FRA_MUSEE     = 9
-WORLD_ANT           = 10
-WORLD_DEV_LABO      = 11  # dev test world
-
-world_filenames = [
-    "FrBistrot.ini",
-    "WorldTest.ini",
-    "WorldTest.ini",
-    "UkMiniGolf.ini",
-    "GerBal.ini",
-    "UkStairs.ini",
-    "UsRoofs.ini",
-    "GerRamparts.ini",
-    "US_ToyStore.ini",
-    "FR_Musee.ini",
-    "Antartique.ini",
-    "Labo.ini"
-]
-
 
 def import_file(filepath, scene):
     """
@@ -85,50 +55,70 @@ def import_file(filepath, scene):
 
     lightmap = None
     if props.level_import_lightmap:
-        # open lightmap file and read first instance
+        # open lightmap file and locate all its instances
         filename = os.path.basename(filepath)
         filename = filename[:-3] + "ldl"
         lightmap_file = open(props.settings_madtracks_dir + LDL_PATH + filename, 'rb')
         lightmap = LDL(lightmap_file)
         success = lightmap.read_header()
         if success:
-            lightmap.read_instance(props.lightmap_debug_info)
+            lightmap.read_index()
         else:
             # give up on the lightmap
+            lightmap_file.close()
             lightmap = None
 
-    # import world
+    # read world
     dam_filepath = filepath.split(".", 1)[0] + ".dam"
     with open_insensitive(dam_filepath, 'r') as settings_file:
         ini = INI(settings_file)
         world = int(ini.as_dict()['base']['world'])
-        import_world(world, lightmap, scene)
+    world_ini = read_world(world, props)
 
     with open_insensitive(filepath, 'r') as instance_file:
         filename = os.path.basename(filepath)
         # read and store level .ini file
         ini = INI(instance_file)
 
-        si = 0
-        while si < len(ini.sections):
-            # get current section and its type
-            section = ini.sections[si]
-            ext = section.as_dict()['filename'].split(".", 1)[1]
-            # import section
-            if ext == "ldo":
-                success = import_LDO_instance(section, lightmap, scene)
-            elif ext == "ini":
-                success = import_descriptor_instance(section, lightmap, scene)
-            # go to next section or stop there
-            if not success:
-                set_error('importing a level', "Import of level instance failed")
-                return
-            si += 1
+    # list the LDOs of the level in import order to assign them lightmap instances
+    descriptors = {}
+    ldo_filenames = [world_ini.as_dict()['base'].get('mesh')]
+    for section in ini.sections:
+        section_filename = section.as_dict()['filename']
+        ext = section_filename.split(".", 1)[1]
+        if ext == "ldo":
+            ldo_filenames.append(section_filename)
+        elif ext == "ini":
+            if section_filename not in descriptors:
+                descriptors[section_filename] = read_descriptor(section_filename, props)
+            ldo_filenames.append(descriptors[section_filename]['ldo_filename'])
+        else:
+            ldo_filenames.append(None)
+    lightmap_ids, consumed = assign_lightmap_instances(lightmap, ldo_filenames)
+
+    # import world
+    import_world(world_ini, lightmap, scene, lightmap_ids[0])
+
+    for si, section in enumerate(ini.sections):
+        # get current section and its type
+        section_filename = section.as_dict()['filename']
+        ext = section_filename.split(".", 1)[1]
+        lightmap_id = lightmap_ids[si + 1]
+        # import section
+        success = True
+        if ext == "ldo":
+            success = import_LDO_instance(section, lightmap, scene, lightmap_id)
+        elif ext == "ini":
+            success = import_descriptor_instance(section, lightmap, scene, descriptors[section_filename], lightmap_id)
+        # go to next section or stop there
+        if not success:
+            set_error('importing a level', "Import of level instance failed")
+            return
     
     if lightmap:
         lightmap_file.close()
-        if lightmap.instance_cnt > 0:
-            set_error('importing a level', "Missed %d lightmap instances" % lightmap.instance_cnt)
+        if consumed < lightmap.instance_cnt:
+            set_error('importing a level', "Missed %d lightmap instances" % (lightmap.instance_cnt - consumed))
 
     # reinstate old instance mode
     props.instance_mode = instance_mode_save
@@ -136,14 +126,15 @@ def import_file(filepath, scene):
     print("Imported {}".format(filename))
 
 
-def import_LDO_instance(section, lightmap, scene, ldo_filename=None):
+def import_LDO_instance(section, lightmap, scene, lightmap_id=None):
     """
     Imports a LDO level instance from a .ini section.
+    *lightmap_id* is the ordinal of its LDL instance, None if it isn't lightmapped.
     """
     props = scene.madtracks
 
     filename = section.as_dict()['filename']
-    lightmapped = is_lightmapped(lightmap, filename)
+    lightmapped = lightmap_id is not None
     ldoname = filename.split("/", 1)[1].split(".", 1)[0]
     
     if not lightmapped:
@@ -158,13 +149,15 @@ def import_LDO_instance(section, lightmap, scene, ldo_filename=None):
             obj.select = False
         else:
             # import LDO without lightmap to be reused
-            ldo_in.import_file(props.settings_madtracks_dir + LDO_PATH + ldoname + ".ldo", scene)
+            if not ldo_in.import_file(props.settings_madtracks_dir + LDO_PATH + ldoname + ".ldo", scene):
+                return False
             obj = bpy.context.active_object
     else:
-        # import LDO and consume lightmap data
-        ldo_in.import_file(props.settings_madtracks_dir + LDO_PATH + ldoname + ".ldo", scene, lightmap)
+        # import LDO with its lightmap data
+        lightmap.fetch(lightmap_id, props.lightmap_debug_info)
+        if not ldo_in.import_file(props.settings_madtracks_dir + LDO_PATH + ldoname + ".ldo", scene, lightmap):
+            return False
         obj = bpy.context.active_object
-        lightmap.read_instance(props.lightmap_debug_info)
 
     # edit location and rotation of Blender object
     place_instance_object(section, obj)
@@ -172,36 +165,44 @@ def import_LDO_instance(section, lightmap, scene, ldo_filename=None):
     return True
 
 
-def import_descriptor_instance(section, lightmap, scene):
+def read_descriptor(filename, props):
     """
-    Imports a Descriptor level instance from a .ini section.
+    Reads what a level needs to know about a descriptor before importing it.
     """
-    props = scene.madtracks
-
-    filename = section.as_dict()['filename']
-    descname = filename.split(".", 1)[0]
-
-    ldo_filename = False
-    is_trackpart = False
-    is_collectible = False
+    info = {'ldo_filename': None, 'is_trackpart': False, 'is_collectible': False}
     with open_insensitive(props.settings_madtracks_dir + DESCRIPTOR_PATH + filename, 'r') as file:
         descriptor = INI(file).as_dict()
         if "filename" in descriptor['object'].keys() and ".ldo" in descriptor['object']['filename']:
-            ldo_filename = descriptor['object']['filename']
+            info['ldo_filename'] = descriptor['object']['filename']
         if "objecttype" in descriptor['object'].keys():
             if descriptor['object']['objecttype'] in trackpart_types:
-                is_trackpart = True
+                info['is_trackpart'] = True
             if descriptor['object']['objecttype'] in collectible_types:
-                is_collectible = True
+                info['is_collectible'] = True
+    return info
+
+
+def import_descriptor_instance(section, lightmap, scene, descriptor, lightmap_id=None):
+    """
+    Imports a Descriptor level instance from a .ini section.
+    *descriptor* comes from read_descriptor, *lightmap_id* is the ordinal
+    of its LDL instance, None if it isn't lightmapped.
+    """
+    props = scene.madtracks
+
+    filename = section.as_dict()['filename']
+    descname = filename.split(".", 1)[0]
+
+    ldo_filename = descriptor['ldo_filename']
+    is_trackpart = descriptor['is_trackpart']
+    is_collectible = descriptor['is_collectible']
     
     if not props.level_import_raceline and (is_trackpart or is_collectible):
-        # don't import descriptor
-        if is_lightmapped(lightmap, ldo_filename):
-            lightmap.read_instance()
+        # don't import descriptor, its lightmap instance is simply left unused
         return True
     
     if ldo_filename:
-        if not is_lightmapped(lightmap, ldo_filename):
+        if lightmap_id is None:
             # reuse already imported instances that are not lightmapped
             obj_index = bpy.data.objects.find(descname)
             if obj_index >= 0:
@@ -217,11 +218,11 @@ def import_descriptor_instance(section, lightmap, scene):
                     return False
                 obj = bpy.context.active_object
         else:
-            # import descriptor and consume lightmap data
+            # import descriptor with its lightmap data
+            lightmap.fetch(lightmap_id, props.lightmap_debug_info)
             if not descriptor_in.import_file(props.settings_madtracks_dir + DESCRIPTOR_PATH + filename, scene, lightmap):
                 return False
             obj = bpy.context.active_object
-            lightmap.read_instance(props.lightmap_debug_info)
     else:
         # import descriptor which doesn't have a LDO
         if not descriptor_in.import_file(props.settings_madtracks_dir + DESCRIPTOR_PATH + filename, scene):
@@ -247,71 +248,80 @@ def import_descriptor_instance(section, lightmap, scene):
     return True
 
 
-def import_world(world, lightmap, scene):
-    props = scene.madtracks
+def read_world(world, props):
+    """
+    Reads a world .ini file.
+    """
     filepath = props.settings_madtracks_dir + WORLD_PATH + world_filenames[world]
-
     with open_insensitive(filepath, 'r') as file:
         dprint("Reading world file %s..." % filepath)
-        ini = INI(file)
-
-        # import the sky color
-        sky_color = ini.as_dict()['base']['skycolor']
-        bpy.data.worlds[0].horizon_color = [float(sky_color[0] / 255),
-                                            float(sky_color[1] / 255),
-                                            float(sky_color[2] / 255)]
-
-        # import the optional skybox
-        if 'skybox' in ini.as_dict().keys():
-            skybox_pos = to_blender_coord(ini.as_dict()['skybox']['position'])
-            skybox_scale = to_blender_scale(ini.as_dict()['skybox']['scale'])
-            bpy.ops.mesh.primitive_cube_add(location=(skybox_pos[0], skybox_pos[1], skybox_pos[2]),
-
-                                            radius=skybox_scale,
-                                            enter_editmode=True)
-            bpy.ops.mesh.flip_normals()
-            bpy.ops.mesh.uv_texture_add()
-            obj = bpy.context.edit_object
-            bpy.ops.object.editmode_toggle()
-            obj.name = "Skybox"
-            obj.data.name = "Skybox"
-            # rotate the skybox to the right orientation
-            bpy.context.object.rotation_euler[2] = 7.85398
-            bpy.ops.object.transform_apply(location=False, rotation=True, scale=False)
-
-            # assign skybox textures
-            skybox_textures = [ini.as_dict()['skybox']['back'],
-                               ini.as_dict()['skybox']['right'],
-                               ini.as_dict()['skybox']['front'],
-                               ini.as_dict()['skybox']['left'],
-                               ini.as_dict()['skybox']['down'],
-                               ini.as_dict()['skybox']['up']
-                            ]
-            for side in range(6):
-                texture_name = skybox_textures[side]
-                material = bpy.data.materials.new(texture_name)
-                texslot = material.texture_slots.add()
-                texture = bpy.data.textures.new(texture_name, "IMAGE")
-                image = img_in.import_file(props.settings_madtracks_dir + TEXTURE_PATH + texture_name + ".dds")
-                texture.image = image
-                texslot.texture = texture
-                # other convenient material properties
-                material.specular_intensity = 0
-                obj.data.materials.append(material)
-                # assign to faces
-                obj.data.polygons[side].material_index = side
-            # fix skybox texture rotation
-            mat_up = bpy.data.materials[skybox_textures[5]]
-            mat_up.texture_slots[0].scale = [-1, -1, 1]
-
-        # import the optional world mesh
-        if 'mesh' in ini.as_dict()['base'].keys():
-            filename = ini.as_dict()['base']['mesh']
-            if is_lightmapped(lightmap, filename):
-                obj = ldo_in.import_file(props.settings_madtracks_dir + LDO_PATH + filename.split("/", 1)[1], scene, lightmap)
-                lightmap.read_instance(props.lightmap_debug_info)
-            else:
-                obj = ldo_in.import_file(props.settings_madtracks_dir + LDO_PATH + filename.split("/", 1)[1], scene)
+        return INI(file)
+
+
+def import_world(ini, lightmap, scene, lightmap_id=None):
+    """
+    Imports a world from its .ini file.
+    *lightmap_id* is the ordinal of the world mesh LDL instance, None if it isn't lightmapped.
+    """
+    props = scene.madtracks
+
+    # import the sky color
+    sky_color = ini.as_dict()['base']['skycolor']
+    bpy.data.worlds[0].horizon_color = [float(sky_color[0] / 255),
+                                        float(sky_color[1] / 255),
+                                        float(sky_color[2] / 255)]
+
+    # import the optional skybox
+    if 'skybox' in ini.as_dict().keys():
+        skybox_pos = to_blender_coord(ini.as_dict()['skybox']['position'])
+        skybox_scale = to_blender_scale(ini.as_dict()['skybox']['scale'])
+        bpy.ops.mesh.primitive_cube_add(location=(skybox_pos[0], skybox_pos[1], skybox_pos[2]),
+
+                                        radius=skybox_scale,
+                                        enter_editmode=True)
+        bpy.ops.mesh.flip_normals()
+        bpy.ops.mesh.uv_texture_add()
+        obj = bpy.context.edit_object
+        bpy.ops.object.editmode_toggle()
+        obj.name = "Skybox"
+        obj.data.name = "Skybox"
+        # rotate the skybox to the right orientation
+        bpy.context.object.rotation_euler[2] = 7.85398
+        bpy.ops.object.transform_apply(location=False, rotation=True, scale=False)
+
+        # assign skybox textures
+        skybox_textures = [ini.as_dict()['skybox']['back'],
+                           ini.as_dict()['skybox']['right'],
+                           ini.as_dict()['skybox']['front'],
+                           ini.as_dict()['skybox']['left'],
+                           ini.as_dict()['skybox']['down'],
+                           ini.as_dict()['skybox']['up']
+                        ]
+        for side in range(6):
+            texture_name = skybox_textures[side]
+            material = bpy.data.materials.new(texture_name)
+            texslot = material.texture_slots.add()
+            texture = bpy.data.textures.new(texture_name, "IMAGE")
+            image = img_in.import_file(props.settings_madtracks_dir + TEXTURE_PATH + texture_name + ".dds")
+            texture.image = image
+            texslot.texture = texture
+            # other convenient material properties
+            material.specular_intensity = 0
+            obj.data.materials.append(material)
+            # assign to faces
+            obj.data.polygons[side].material_index = side
+        # fix skybox texture rotation
+        mat_up = bpy.data.materials[skybox_textures[5]]
+        mat_up.texture_slots[0].scale = [-1, -1, 1]
+
+    # import the optional world mesh
+    if 'mesh' in ini.as_dict()['base'].keys():
+        filename = ini.as_dict()['base']['mesh']
+        if lightmap_id is not None:
+            lightmap.fetch(lightmap_id, props.lightmap_debug_info)
+            ldo_in.import_file(props.settings_madtracks_dir + LDO_PATH + filename.split("/", 1)[1], scene, lightmap)
+        else:
+            ldo_in.import_file(props.settings_madtracks_dir + LDO_PATH + filename.split("/", 1)[1], scene)
 
 
 def place_instance_object(section, obj):
@@ -319,35 +329,8 @@ def place_instance_object(section, obj):
     Edit an instance object's location and rotation by reading a level .ini section's parameters.
     """
     if len(section.params) == 4:
-        directionAT = section.as_dict()['directionat']
-        directionUp = section.as_dict()['directionup']
-        directionRight = np.cross(directionAT, directionUp)
-        directionLeft = -directionRight
-
-        mat = [
-            (directionAT[0], directionAT[1], directionAT[2]),
-            (directionUp[0], directionUp[1], directionUp[2]),
-            (directionLeft[0], directionLeft[1], directionLeft[2]),
-        ]
-
+        mat = instance_matrix(section.as_dict()['directionat'], section.as_dict()['directionup'])
         bmat = to_blender_matrix(mat)
         obj.rotation_euler = bmat.to_euler()
         obj.location = to_blender_coord(section.as_dict()['position'])
 
-
-def is_lightmapped(lightmap, filename):
-    """
-    Return True if the LDO to import is present in the LDL file and has lightmap data to import.
-    Skip the LDL instance if it has no data to import.
-    """
-    if not lightmap:
-        return False
-
-    if lightmap.current_name.lower() == filename.lower() or lightmap.current_name.lower() == "geometry/rampe_30.ldo":
-        if lightmap.mesh_cnt == 0 or lightmap.vertex_cnt[0] == 0:
-            # skip the instance with no data to import
-            lightmap.read_instance()
-        else:
-            return True
-
-    return False
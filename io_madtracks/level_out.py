@@ -14,20 +14,28 @@ Description:
 Level files contain LDO level instances from Gfx\models\Geometry and
 Object level instances from Bin\Descriptors.
 This module reads all Blender objects in a scene to export them as instances in a level file.
+The "LightMap" UV layers of the instances can be exported alongside in the level .ldl file.
 
 """
 
 if "bpy" in locals():
     import imp
     imp.reload(common)
+    imp.reload(madstructs)
+    imp.reload(madini)
     imp.reload(trackpart)
 
 import bpy
 
+import numpy as np
+
 from . import common
+from . import madstructs
+from . import madini
 from . import trackpart
 
 from .common import *
+from .madini import *
 from .trackpart import *
 
 
@@ -41,22 +49,40 @@ def export_file(filepath, scene):
     instance_mode_save = props.instance_mode
     props.instance_mode = True
 
+    # list the instances in level order
+    instances = []
+    # objects that are not trackparts
+    for obj in bpy.data.objects:
+        if not obj.madtracks.is_trackpart:
+            instances.append((obj, obj.location, obj.matrix_world))
+    # trackpart sequences
+    for group in bpy.data.groups:
+        for obj in group.objects:
+            if obj.madtracks.is_trackpart:
+                if obj.parent == None:
+                    instances.append((obj, obj.location, obj.matrix_world))
+                else:
+                    instances.append((obj, None, None))
+
+    lightmap_instances = []
     with open_insensitive(filepath, 'w') as fini:
         filename = os.path.basename(filepath)
 
-        # export objects that are not trackparts
-        for obj in bpy.data.objects:
-            if not obj.madtracks.is_trackpart:
-                export_instance(fini, obj, obj.location, obj.matrix_world)
-        
-        # export trackpart sequences
-        for group in bpy.data.groups:
-            for obj in group.objects:
-                if obj.madtracks.is_trackpart:
-                    if obj.parent == None:
-                        export_instance(fini, obj, obj.location, obj.matrix_world)
-                    else:
-                        export_instance(fini, obj)
+        for obj, location, matrix_world in instances:
+            export_instance(fini, obj, location, matrix_world)
+            if props.level_export_lightmap:
+                lightmap_instance = object_lightmap(obj, props)
+                if lightmap_instance:
+                    lightmap_instances.append(lightmap_instance)
+
+    if props.level_export_lightmap:
+        # written next to the level .ini, never over the lightmaps of the game data
+        ldl_filepath = filepath.rsplit(".", 1)[0] + ".ldl"
+        with open(ldl_filepath, 'wb') as file:
+            lightmap = madstructs.LDL(file)
+            lightmap.bit_depth = int(props.lightmap_bit_depth)
+            lightmap.write(lightmap_instances)
+        dprint("Exported lightmap {} ({} instances)".format(ldl_filepath, len(lightmap_instances)))
     
     # reinstate old instance mode
     props.instance_mode = instance_mode_save
@@ -70,22 +96,95 @@ def export_instance(fini, obj, location=None, matrix_world=None):
     Handles trackpart sequences, which are Object instances without position/rotation parameters,
     since they are automatically computed by Mad Tracks' engine.
     """
-    if obj.madtracks.descriptor != '':
-        name = obj.madtracks.descriptor
-    else:
-        if "_lgt" in obj.name:
-            name = "geometry/" + obj.name.split("_lgt")[0] + ".ldo"
-        else:
-            name = "geometry/" + obj.name.split(".")[0] + ".ldo"
-
-    fini.write("[" + name + "]\n")
+    name = instance_name(obj)
+
+    position = None
+    direction_at = None
+    direction_up = None
     if location:
-        pos = to_madtracks_axis(location)
-        fini.write("Position = " + float_format(pos[0]) + "," + float_format(pos[1]) + "," + float_format(pos[2]) + "\n")
+        position = to_madtracks_axis(location)
     if matrix_world:
         rot = to_madtracks_matrix(matrix_world)
-        fini.write("DirectionAT = " + float_format(rot[0][0]) + "," + float_format(rot[0][1]) + "," + float_format(rot[0][2]) + "\n")
-        fini.write("DirectionUp = " + float_format(rot[1][0]) + "," + float_format(rot[1][1]) + "," + float_format(rot[1][2]) + "\n")
-    fini.write("Filename = \"" + name + "\"\n\n")
+        direction_at = rot[0]
+        direction_up = rot[1]
+    level_section(name, position, direction_at, direction_up).write(fini)
 
     print("Exported {}".format(obj.name))
+
+
+def instance_name(obj):
+    """
+    Returns the filename of the LDO or descriptor a Blender object is an instance of.
+    """
+    if obj.madtracks.descriptor != '':
+        return obj.madtracks.descriptor
+    if "_lgt" in obj.name:
+        return "geometry/" + obj.name.split("_lgt")[0] + ".ldo"
+    return "geometry/" + obj.name.split(".")[0] + ".ldo"
+
+
+def instance_ldo_filenames(obj, props):
+    """
+    Returns the LDO filename of an instance as named in the lightmap,
+    and the path of the actual LDO file. Returns None, None if it has no LDO.
+    """
+    name = instance_name(obj)
+    if not name.endswith(".ini"):
+        return name, props.settings_madtracks_dir + LDO_PATH + name.split("/", 1)[1]
+    try:
+        with open_insensitive(props.settings_madtracks_dir + DESCRIPTOR_PATH + name, 'r') as file:
+            descriptor = INI(file).as_dict()
+    except OSError:
+        return None, None
+    filename = descriptor['object'].get('filename')
+    if not filename or ".ldo" not in filename:
+        return None, None
+    ldoname = filename.split("/", 1)[1]
+    ldoname = ldo_aliases.get(ldoname, ldoname)
+    return filename, props.settings_madtracks_dir + LDO_PATH + ldoname
+
+
+def read_ldo_header(filepath):
+    """
+    Returns a LDO with its geometry left undecoded, None if it can't be read.
+    """
+    ldo = madstructs.LDO()
+    try:
+        with open_insensitive(filepath, 'rb') as file:
+            ldo.read_buffer(file.read(), lazy=True, validate=True)
+    except (OSError, madstructs.LDOFormatError) as e:
+        dprint("Couldn't read {}: {}".format(filepath, e))
+        return None
+    return ldo
+
+
+def object_lightmap(obj, props):
+    """
+    Returns the (ldo_name, uvs) lightmap instance of a Blender object, None if it has no lightmap
+    or if its UVs can't be split like the meshes of its LDO.
+    """
+    if obj.type != 'MESH' or "LightMap" not in obj.data.uv_layers:
+        return None
+    ldo_filename, ldo_filepath = instance_ldo_filenames(obj, props)
+    if not ldo_filename:
+        return None
+    mesh = obj.data
+
+    # lightmap UVs are stored per vertex, Blender stores them per loop
+    loop_cnt = len(mesh.loops)
+    loop_uvs = np.empty(loop_cnt * 2, dtype=np.float32)
+    mesh.uv_layers["LightMap"].data.foreach_get("uv", loop_uvs)
+    loop_vertices = np.empty(loop_cnt, dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loop_vertices)
+    uvs = np.zeros((len(mesh.vertices), 2), dtype=np.float32)
+    uvs[loop_vertices] = loop_uvs.reshape(-1, 2)
+    uvs[:, 1] = 1 - uvs[:, 1]
+
+    # split the vertices like the LDO meshes, then put them in the LDL mesh order
+    ldo = read_ldo_header(ldo_filepath)
+    vertex_cnts = [mesh.vertex_cnt for atomic in ldo.atomics for mesh in atomic.meshes] if ldo else None
+    if vertex_cnts is None or sum(vertex_cnts) != len(uvs):
+        set_error('exporting a lightmap', "{} doesn't match the vertices of {}, its lightmap is skipped".format(obj.name, ldo_filename))
+        return None
+    mesh_uvs = np.split(uvs, np.cumsum(vertex_cnts)[:-1])
+    return ldo_filename, madstructs.to_lightmap_order(ldo, mesh_uvs)
@@ -90,6 +90,10 @@ class INI:
                 # add parameter to the last section added
                 self.sections[-1].params.append(parameter)
                 
+    def write(self, file):
+        for section in self.sections:
+            section.write(file)
+
     def as_dict(self):
         dic = {}
         for s in self.sections:
@@ -100,9 +104,27 @@ class INI:
 
 
 class Section:
+    __slots__ = ("name", "params")
+
     def __init__(self):
         self.name = ""      # section name without brackets
         self.params = []    # sequence of Parameters objects
+
+    def add(self, name, value):
+        parameter = Parameter()
+        parameter.name = name
+        parameter.value = value
+        self.params.append(parameter)
+
+    def write(self, file):
+        """
+        Writes the section and its parameters followed by a blank line, in one call.
+        """
+        lines = ["[" + self.name + "]\n"]
+        for p in self.params:
+            lines.append(p.name + " = " + p.value_str() + "\n")
+        lines.append("\n")
+        file.write("".join(lines))
     
     def as_dict(self):
         dic = {}
@@ -112,6 +134,31 @@ class Section:
 
 
 class Parameter:
+    __slots__ = ("name", "value")
+
     def __init__(self):
         self.name = ""
         self.value = []
+
+    def value_str(self):
+        if isinstance(self.value, str):
+            return "\"" + self.value + "\""
+        if isinstance(self.value, (list, tuple)):
+            return ",".join('{:f}'.format(v) for v in self.value)
+        return '{:f}'.format(self.value)
+
+
+def level_section(filename, position=None, direction_at=None, direction_up=None):
+    """
+    Returns a level instance section. Trackparts following the first one
+    of a sequence have no position and rotation.
+    """
+    section = Section()
+    section.name = filename
+    if position is not None:
+        section.add("Position", position)
+    if direction_at is not None:
+        section.add("DirectionAT", direction_at)
+        section.add("DirectionUp", direction_up)
+    section.add("Filename", filename)
+    return section
@@ -22,9 +22,12 @@ of Mad Tracks's file formats, but some classes names or attributes can be wrong.
 Especially since some values appeared in only one data file and required guess work.
 """
 
+import io
+import mmap
 import struct
+from array import array
 from math import ceil, sqrt
-from .common import *
+from .core import *
 
 import numpy as np
 
@@ -34,18 +37,169 @@ MAT_FLAG_DIFFUSE =       8
 MAT_FLAG_BRIGHTNESS =    64
 MAT_FLAG_ENVMAP =        128
 
+# Type string ending a dummy, for each dummy type
+DUMMY_TYPE_STR = {
+    DUMMY_TYPE_WORLD: b"world",
+    DUMMY_TYPE_NUM: b"Dummy#",
+    DUMMY_TYPE_OUT: b"DUMMY_OUT",
+    DUMMY_TYPE_ROOF: b"DUMMY ROOF",
+    DUMMY_TYPE_BONUS: b"DUMMY BONUS",
+}
+
+# Unknown data written for structures which weren't read from a file
+ATOMIC_VISIBILITY = struct.pack(">4I", 0x00000036, 0x03002040, 0xffffef40, 0x305c4841)  # taken from Amorce_15.ldo
+MAT_UNKNOWN1 = struct.pack("<f", 10.)  # value found in car models
+MAT_UNKNOWN2 = struct.pack("<f", 0.4)  # taken from FrBis_Verre.ldo
+MESH_VA_CNT = 4
+MESH_VA = (0x00, 0x01, 0x07, 0x08)  # usual vertex attributes
+
+# Tri vertex ids are 16-bit signed integers
+MESH_MAX_VERTICES = 32767
+
+# Precompiled structs used by the buffer parser
+_INT16 = struct.Struct("<h")
+_UINT8_PAIR = struct.Struct("<2B")
+_INT32 = struct.Struct("<i")
+_INT32_PAIR = struct.Struct("<2i")
+_FLOAT = struct.Struct("<f")
+_VECTOR = struct.Struct("<3f")
+
+# Smallest sizes of the repeated structures, used to bound their counts
+_ATOMIC_MIN_SIZE = 5
+_MATERIAL_MIN_SIZE = 6
+_MESH_MIN_SIZE = 45
+_DUMMY_MIN_SIZE = 10
+
+# Strings are stored after their length on one byte
+STRING_MAX_LEN = 255
+
+
+class LDOFormatError(Exception):
+    """
+    Raised by the validating buffer parser when a structure doesn't fit in the buffer.
+    *path* locates the structure field (e.g. "atomic[0]/mesh[2]/vertices"),
+    *expected* is the number of bytes it needs at *offset* and *available*
+    the number of bytes left in the buffer.
+    """
+    def __init__(self, offset, path, expected, available, reason=None):
+        self.offset = offset
+        self.path = path
+        self.expected = expected
+        self.available = available
+        self.reason = reason
+        if reason:
+            message = "{} at offset {}: {}".format(path, offset, reason)
+        else:
+            message = "{} at offset {}: expected {} bytes, {} available".format(path, offset, expected, available)
+        super().__init__(message)
+
+
+def check_bounds(buf, offset, size, path):
+    """
+    Raises a LDOFormatError if *size* bytes can't be read at *offset* in the buffer.
+    """
+    if size < 0 or offset + size > len(buf):
+        raise LDOFormatError(offset, path, size, max(len(buf) - offset, 0))
+
+
+def vertex_stride(va_cnt, va):
+    """
+    Returns the size in bytes of a vertex described by the mesh header vertex attributes.
+    """
+    stride = 32  # position, normal, uv
+    if (va[2] == 0x0b):
+        stride += 4  # unknown data
+    if (va_cnt > 3):
+        stride += 8  # unknown data
+        if (va[3] == 0x0c):
+            stride += 4  # unknown data
+    return stride
+
+
+def load_buffer(file):
+    """
+    Loads a whole binary file in memory for the buffer parser.
+    The file is memory-mapped when possible, read otherwise.
+    Structures read from a mapped file reference it, release them before closing it.
+    """
+    try:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        # empty files and file-like objects can't be mapped
+        return file.read()
+
+
+def read_string(buf, offset, length, path=None):
+    """
+    Decodes a string of *length* bytes from a buffer.
+    *path* locates the string when validating the buffer, None otherwise.
+    """
+    if not path:
+        return str(buf[offset:offset + length], "utf-8")
+    try:
+        return str(buf[offset:offset + length], "utf-8")
+    except UnicodeDecodeError as e:
+        raise LDOFormatError(offset, path, length, len(buf) - offset, "invalid utf-8 string ({})".format(e.reason))
+
+
+def encode_string(string):
+    """
+    Encodes a string stored after its length on one byte.
+    Longer strings are reported and truncated so that the file stays readable.
+    """
+    data = string.encode("utf-8")
+    if len(data) > STRING_MAX_LEN:
+        set_error('writing a name', "\"{}\" is longer than {} bytes, it was truncated".format(string, STRING_MAX_LEN))
+        data = data[:STRING_MAX_LEN].decode("utf-8", "ignore").encode("utf-8")
+    return data
+
+
+def write_string(buf, offset, string):
+    """
+    Writes a string with its length and null termination, returns the offset after it.
+    """
+    data = encode_string(string)
+    buf[offset] = len(data)
+    buf[offset + 1:offset + 1 + len(data)] = data
+    buf[offset + 1 + len(data)] = 0  # null termination
+    return offset + len(data) + 2
+
+
+def vertex_dtype(stride):
+    """
+    Returns the NumPy structured dtype of a vertex, unknown data is kept as raw bytes.
+    """
+    names = ["position", "normal", "uv"]
+    formats = [("<f4", 3), ("<f4", 3), ("<f4", 2)]
+    offsets = [0, 12, 24]
+    if stride > 32:
+        names.append("extra")
+        formats.append(("u1", stride - 32))
+        offsets.append(32)
+    return np.dtype({"names": names, "formats": formats, "offsets": offsets, "itemsize": stride})
+
 class LDO:
     """
     Handles .ldo files and contains all sub-structures
     """
     def __init__(self):
+        self.versions = (0x01, 0x03, 0x02, 0x03)  # object, atomic, mesh, material
         self.atomic_cnt = 0
+        self.header_only = False  # read without geometry, can't be written
         
         self.atomics = []
 
-    def read(self, file, debug=False):
+    def read(self, file, debug=False, geometry=True):
+        """
+        Reads the LDO from a file.
+        If geometry is False, only metadata is read: mesh vertices and tris are skipped,
+        leaving materials, dummies, mesh vertex counts and tri sequences.
+        Such a LDO is header-only and can't be written back.
+        """
+        self.header_only = not geometry
+
         # Header
-        file.seek(4, 1) # skip versions
+        self.versions = tuple(file.read(4))
         self.atomic_cnt = struct.unpack("<h", file.read(2))[0]
         
         # Use a function to keep the actual processing clear and maintain it easier.
@@ -56,20 +210,89 @@ class LDO:
         # Atomics
         for _ in range(self.atomic_cnt):
             atomic = Atomic()
-            atomic.read(file, debug)
+            atomic.read(file, debug, geometry)
             self.atomics.append(atomic)
 
-    def write(self, file, debug=False):
+    def read_buffer(self, buf, offset=0, debug=False, lazy=False, validate=False):
+        """
+        Reads the LDO from a bytes-like object, returns the offset after the last atomic.
+        Equivalent to *read* without any file access.
+        If lazy, only the structure of the atomics is scanned: mesh vertices and tris are
+        decoded from the buffer when first accessed.
+        If validate, every count and length is checked against the rest of the buffer
+        before it is used, and a LDOFormatError is raised on the first one that doesn't fit.
+        Unknown data and the raw bytes of each atomic are kept as memoryview slices
+        of the buffer, which must stay valid as long as the LDO is used.
+        """
+        buf = memoryview(buf)
+
         # Header
-        file.write(struct.pack("<4B", 0x01, 0x03, 0x02, 0x03))
-        file.write(struct.pack("<H", self.atomic_cnt))
-        
+        if validate:
+            check_bounds(buf, offset, 6, "header")
+        self.versions = tuple(buf[offset:offset + 4])
+        self.atomic_cnt = _INT16.unpack_from(buf, offset + 4)[0]
+        offset += 6
+        if validate:
+            check_bounds(buf, offset, self.atomic_cnt * _ATOMIC_MIN_SIZE, "atomics")
+
         if debug:
             self.dbg_print()
-        
+
         # Atomics
-        for i in range(self.atomic_cnt):
-            self.atomics[i].write(file, debug)
+        for ai in range(self.atomic_cnt):
+            atomic = Atomic()
+            path = "atomic[{}]".format(ai) if validate else None
+            offset = atomic.read_buffer(buf, offset, debug, lazy, path)
+            self.atomics.append(atomic)
+        return offset
+
+    def atomic_names(self):
+        return [atomic.name for atomic in self.atomics]
+
+    def find_atomic(self, name):
+        """
+        Returns the atomic with the given name (case insensitive) with its geometry decoded,
+        or None if there is no such atomic.
+        """
+        for atomic in self.atomics:
+            if atomic.name.lower() == name.lower():
+                atomic.load()
+                return atomic
+        return None
+
+    def buffer_size(self, raw=False):
+        return 6 + sum(atomic.buffer_size(raw) for atomic in self.atomics)
+
+    def write_buffer(self, buf, offset=0, debug=False, raw=False):
+        """
+        Serializes the LDO into a preallocated buffer, returns the offset after the last atomic.
+        If raw, the atomics read from a buffer and not marked as modified are copied as-is
+        instead of being encoded again.
+        """
+        if self.header_only:
+            raise ValueError("LDO read without its geometry can't be written")
+
+        # Header
+        buf[offset:offset + 4] = bytes(self.versions)
+        _INT16.pack_into(buf, offset + 4, self.atomic_cnt)
+        offset += 6
+
+        if debug:
+            self.dbg_print()
+
+        # Atomics
+        for atomic in self.atomics:
+            offset = atomic.write_buffer(buf, offset, debug, raw)
+        return offset
+
+    def write(self, file, debug=False, raw=False):
+        """
+        Serializes the LDO in memory, then writes it to the file at once.
+        See *write_buffer* for *raw*.
+        """
+        buf = bytearray(self.buffer_size(raw))
+        self.write_buffer(buf, 0, debug, raw)
+        file.write(buf)
 
     def __repr__(self):
         return "LDO"
@@ -85,10 +308,104 @@ class LDO:
         print("atomic_cnt: {}\n".format(self.atomic_cnt))
 
 
+class LDOPatch:
+    """
+    Edits materials and dummies of a .ldo file in place, without decoding or encoding its geometry.
+    The file structure is scanned lazily into *ldo*. An edited record is located by its
+    offset and only its bytes are rewritten, the rest of the file is shifted in bulk
+    if the record changes size. In that case *ldo* is scanned again, so records must
+    be looked up again from it after each update.
+    """
+    def __init__(self, buf):
+        self.buf = bytearray(buf)
+        self.ldo = None
+        self.scan()
+
+    def __repr__(self):
+        return "LDOPatch"
+
+    def scan(self):
+        self.ldo = LDO()
+        self.ldo.read_buffer(self.buf, lazy=True)
+
+    def update_material(self, material):
+        """
+        Rewrites the record of a material of *ldo* after it was edited.
+        """
+        self.splice(material.offset, material.size, material_to_bytes(material))
+
+    def update_dummy(self, dummy):
+        """
+        Rewrites the record of a dummy of *ldo* after it was edited.
+        """
+        self.splice(dummy.offset, dummy.size, dummy_to_bytes(dummy))
+
+    def rename_texture(self, old_name, new_name):
+        """
+        Renames a diffuse or envmap texture in all the materials using it (case insensitive).
+        Returns the number of materials patched.
+        """
+        patched = 0
+        for ai in range(len(self.ldo.atomics)):
+            for mi in range(len(self.ldo.atomics[ai].materials)):
+                material = self.ldo.atomics[ai].materials[mi]
+                edited = False
+                if (bool(material.flags & MAT_FLAG_DIFFUSE)) and material.diffuse_name.lower() == old_name.lower():
+                    material.diffuse_name = new_name
+                    material.diffuse_name_len = len(new_name.encode("utf-8"))
+                    edited = True
+                if (bool(material.flags & MAT_FLAG_ENVMAP)) and material.envmap_name.lower() == old_name.lower():
+                    material.envmap_name = new_name
+                    material.envmap_name_len = len(new_name.encode("utf-8"))
+                    edited = True
+                if edited:
+                    self.update_material(material)
+                    patched += 1
+        return patched
+
+    def splice(self, offset, size, data):
+        """
+        Replaces *size* bytes at *offset* in the file buffer with *data*.
+        """
+        if len(data) == size:
+            self.buf[offset:offset + size] = data
+            return
+        # the scanned structures hold views on the buffer, release them before resizing it
+        self.ldo = None
+        try:
+            self.buf[offset:offset + size] = data
+        except BufferError:
+            # views are still held elsewhere, build a new buffer instead
+            self.buf = self.buf[:offset] + data + self.buf[offset + size:]
+        self.scan()
+
+    def write(self, file):
+        file.write(self.buf)
+
+
+def material_to_bytes(material):
+    data = bytearray(material.buffer_size())
+    material.write_buffer(data, 0)
+    return data
+
+
+def dummy_to_bytes(dummy):
+    data = bytearray(dummy.buffer_size())
+    dummy.write_buffer(data, 0)
+    return data
+
+
 class Atomic:
     """
     Handles a LDO atomic
+    An atomic read from a buffer keeps its raw bytes. They are only written back as-is
+    when asked for, and only until mark_modified is called after editing the atomic.
     """
+    __slots__ = ("mesh_cnt", "material_cnt", "dummy_cnt", "is_empty",
+                 "meshes", "materials", "dummies", "name",
+                 "anim", "visibility", "dummy_unknown1", "dummy_unknown2",
+                 "offset", "size", "raw")
+
     def __init__(self):
         self.mesh_cnt = 0
         self.material_cnt = 0
@@ -100,10 +417,21 @@ class Atomic:
         self.dummies = []
         self.name = ""  # used for LDO with multiple atomics
 
+        # unknown data
+        self.anim = 0
+        self.visibility = ATOMIC_VISIBILITY
+        self.dummy_unknown1 = bytes(10)
+        self.dummy_unknown2 = bytes(8)
+
+        # location in the buffer the atomic was read from, and its bytes
+        self.offset = 0
+        self.size = 0
+        self.raw = None
+
     def __repr__(self):
         return "Atomic"
 
-    def read(self, file, debug=False):
+    def read(self, file, debug=False, geometry=True):
         # Atomic header
         self.mesh_cnt = struct.unpack("<h", file.read(2))[0]
         self.material_cnt = struct.unpack("<h", file.read(2))[0]
@@ -113,8 +441,8 @@ class Atomic:
             if debug:
                 self.dbg_print()
             return
-        file.seek(1, 1)  # skip ~anim
-        file.seek(16, 1)  # skip ~visibility
+        self.anim = file.read(1)[0]
+        self.visibility = file.read(16)
         
         if debug:
             self.dbg_print()
@@ -128,39 +456,149 @@ class Atomic:
         # Meshes
         for _ in range(self.mesh_cnt):
             mesh = Mesh()
-            mesh.read(file, debug)
+            mesh.read(file, debug, geometry)
             self.meshes.append(mesh)
         
         # Dummies
-        file.seek(10, 1)  # skip usual 10 bytes
+        self.dummy_unknown1 = file.read(10)
         name_len = file.read(1)[0]
         self.dummy_cnt = file.read(1)[0]
-        file.seek(8, 1)  # skip usual 8 bytes
+        self.dummy_unknown2 = file.read(8)
         self.name = struct.unpack("<%ds" % name_len, file.read(name_len))[0].decode("utf-8")
         for _ in range(self.dummy_cnt):
             dummy = Dummy()
             dummy.read(file, debug)
             self.dummies.append(dummy)
+
+    def read_buffer(self, buf, offset, debug=False, lazy=False, path=None):
+        """
+        *path* locates the atomic in the LDO when validating the buffer, None otherwise.
+        """
+        self.offset = offset
+        # Atomic header
+        if path:
+            check_bounds(buf, offset, 5, path + "/header")
+        self.mesh_cnt = _INT16.unpack_from(buf, offset)[0]
+        self.material_cnt = _INT16.unpack_from(buf, offset + 2)[0]
+        data = buf[offset + 4]
+        offset += 5
+        if (data == 0x01):
+            self.is_empty = True
+            if debug:
+                self.dbg_print()
+            self.size = offset - self.offset
+            self.raw = buf[self.offset:offset]
+            return offset
+        if path:
+            check_bounds(buf, offset, 17, path + "/header")
+            check_bounds(buf, offset + 17, self.material_cnt * _MATERIAL_MIN_SIZE + self.mesh_cnt * _MESH_MIN_SIZE, path + "/counts")
+        self.anim = buf[offset]
+        self.visibility = buf[offset + 1:offset + 17]
+        offset += 17
+
+        if debug:
+            self.dbg_print()
+
+        # Materials
+        for mi in range(self.material_cnt):
+            material = Material()
+            offset = material.read_buffer(buf, offset, debug, path and "{}/material[{}]".format(path, mi))
+            self.materials.append(material)
+
+        # Meshes
+        for mi in range(self.mesh_cnt):
+            mesh = Mesh()
+            offset = mesh.read_buffer(buf, offset, debug, lazy, path and "{}/mesh[{}]".format(path, mi))
+            self.meshes.append(mesh)
+
+        # Dummies
+        if path:
+            check_bounds(buf, offset, 20, path + "/dummies")
+        self.dummy_unknown1 = buf[offset:offset + 10]
+        name_len, self.dummy_cnt = _UINT8_PAIR.unpack_from(buf, offset + 10)
+        self.dummy_unknown2 = buf[offset + 12:offset + 20]
+        offset += 20
+        if path:
+            check_bounds(buf, offset, name_len + self.dummy_cnt * _DUMMY_MIN_SIZE, path + "/name")
+        self.name = read_string(buf, offset, name_len, path and path + "/name")
+        offset += name_len
+        for di in range(self.dummy_cnt):
+            dummy = Dummy()
+            offset = dummy.read_buffer(buf, offset, debug, path and "{}/dummy[{}]".format(path, di))
+            self.dummies.append(dummy)
+        self.size = offset - self.offset
+        self.raw = buf[self.offset:offset]
+        return offset
+
+    def mark_modified(self):
+        """
+        Drops the raw bytes of the atomic so that it gets encoded again when written.
+        """
+        self.raw = None
+
+    def load(self):
+        """
+        Decodes the geometry of all the meshes of a lazily read atomic.
+        """
+        for mesh in self.meshes:
+            mesh.load()
             
 
-    def write(self, file, debug=False):
+    def buffer_size(self, raw=False):
+        if raw and self.raw is not None:
+            return len(self.raw)
+        if self.is_empty:
+            return 5
+        size = 5 + 1 + 16
+        size += sum(material.buffer_size() for material in self.materials)
+        size += sum(mesh.buffer_size() for mesh in self.meshes)
+        size += 20 + len(encode_string(self.name))
+        size += sum(dummy.buffer_size() for dummy in self.dummies)
+        return size
+
+    def write_buffer(self, buf, offset, debug=False, raw=False):
+        if raw and self.raw is not None:
+            # unmodified atomic, copy it in one go
+            buf[offset:offset + len(self.raw)] = self.raw
+            if debug:
+                self.dbg_print()
+            return offset + len(self.raw)
+
         # Atomic header
-        file.write(struct.pack("<H", self.mesh_cnt))
-        file.write(struct.pack("<H", self.material_cnt))
-        file.write(struct.pack("<B", self.is_empty))
+        _INT16.pack_into(buf, offset, self.mesh_cnt)
+        _INT16.pack_into(buf, offset + 2, self.material_cnt)
+        buf[offset + 4] = self.is_empty
+        offset += 5
         if self.is_empty:
             if debug:
                 self.dbg_print()
-            return
-        file.write(struct.pack("<B", 0x00))  # ~anim
-        file.write(struct.pack(">4I", 0x00000036, 0x03002040, 0xffffef40, 0x305c4841))  # ~visibility taken from Amorce_15.ldo
-        
+            return offset
+        buf[offset] = self.anim
+        buf[offset + 1:offset + 17] = self.visibility
+        offset += 17
+
         if debug:
             self.dbg_print()
-            
+
         # Materials
-        for i in range(self.material_cnt):
-            self.materials[i].write(file, debug)
+        for material in self.materials:
+            offset = material.write_buffer(buf, offset, debug)
+
+        # Meshes
+        for mesh in self.meshes:
+            offset = mesh.write_buffer(buf, offset, debug)
+
+        # Dummies
+        name = encode_string(self.name)
+        buf[offset:offset + 10] = self.dummy_unknown1
+        _UINT8_PAIR.pack_into(buf, offset + 10, len(name), self.dummy_cnt)
+        buf[offset + 12:offset + 20] = self.dummy_unknown2
+        offset += 20
+        buf[offset:offset + len(name)] = name
+        offset += len(name)
+        for dummy in self.dummies:
+            offset = dummy.write_buffer(buf, offset, debug)
+        return offset
 
     def as_dict(self):
         dic = { "mesh_cnt": self.mesh_cnt,
@@ -183,6 +621,11 @@ class Material:
     """
     Handles a LDO material
     """
+    __slots__ = ("name_len", "name", "flags", "shader_tech", "RGBA",
+                 "diffuse_name_len", "diffuse_name", "brightness",
+                 "envmap_name_len", "envmap_name", "unknown1", "unknown2",
+                 "offset", "size")
+
     def __init__(self):
         self.name_len = 0
         self.name = ""
@@ -195,6 +638,14 @@ class Material:
         self.envmap_name_len = 0
         self.envmap_name = ""
 
+        # unknown data
+        self.unknown1 = MAT_UNKNOWN1
+        self.unknown2 = MAT_UNKNOWN2
+
+        # location in the buffer the material was read from
+        self.offset = 0
+        self.size = 0
+
     def __repr__(self):
         return "Material"
 
@@ -208,7 +659,7 @@ class Material:
         if (bool(self.flags & MAT_FLAG_RGBA)):
             self.RGBA += (file.read(1)[0], file.read(1)[0], file.read(1)[0], file.read(1)[0],)
         if (bool(self.flags & MAT_FLAG_UNKNOWN)):
-            file.seek(4, 1)  # skip unknown data
+            self.unknown1 = file.read(4)
         if (bool(self.flags & MAT_FLAG_DIFFUSE)):
             self.diffuse_name_len = file.read(1)[0]
             self.diffuse_name = struct.unpack("<%ds" % self.diffuse_name_len, file.read(self.diffuse_name_len))[0].decode("utf-8")
@@ -216,36 +667,104 @@ class Material:
         if (bool(self.flags & MAT_FLAG_BRIGHTNESS)):
             self.brightness = struct.unpack("<f", file.read(4))[0]
         if (bool(self.flags & MAT_FLAG_ENVMAP)):
-            file.seek(4, 1)  # skip unknown data
+            self.unknown2 = file.read(4)
             self.envmap_name_len = file.read(1)[0]
             self.envmap_name = struct.unpack("<%ds" % self.envmap_name_len, file.read(self.envmap_name_len))[0].decode("utf-8")
             file.seek(1, 1)  # skip null termination
 
         if debug:
             self.dbg_print()
+
+    def read_buffer(self, buf, offset, debug=False, path=None):
+        """
+        *path* locates the material in the LDO when validating the buffer, None otherwise.
+        """
+        self.offset = offset
+        # Material
+        if path:
+            check_bounds(buf, offset, 1, path + "/name")
+            check_bounds(buf, offset + 1, buf[offset] + 1 + 4, path + "/name")
+        self.name_len = buf[offset]
+        self.name = read_string(buf, offset + 1, self.name_len, path and path + "/name")
+        offset += 1 + self.name_len + 1  # skip null termination
+        self.flags = _INT16.unpack_from(buf, offset)[0]
+        self.shader_tech = _INT16.unpack_from(buf, offset + 2)[0]
+        offset += 4
+        if path:
+            size = 4 * (bool(self.flags & MAT_FLAG_RGBA) + bool(self.flags & MAT_FLAG_UNKNOWN))
+            size += 2 * bool(self.flags & MAT_FLAG_DIFFUSE) + 4 * bool(self.flags & MAT_FLAG_BRIGHTNESS)
+            size += 6 * bool(self.flags & MAT_FLAG_ENVMAP)
+            check_bounds(buf, offset, size, path + "/flags")
+        if (bool(self.flags & MAT_FLAG_RGBA)):
+            self.RGBA += tuple(buf[offset:offset + 4])
+            offset += 4
+        if (bool(self.flags & MAT_FLAG_UNKNOWN)):
+            self.unknown1 = buf[offset:offset + 4]
+            offset += 4
+        if (bool(self.flags & MAT_FLAG_DIFFUSE)):
+            if path:
+                check_bounds(buf, offset + 1, buf[offset] + 1, path + "/diffuse_name")
+            self.diffuse_name_len = buf[offset]
+            self.diffuse_name = read_string(buf, offset + 1, self.diffuse_name_len, path and path + "/diffuse_name")
+            offset += 1 + self.diffuse_name_len + 1  # skip null termination
+        if (bool(self.flags & MAT_FLAG_BRIGHTNESS)):
+            if path:
+                check_bounds(buf, offset, 4, path + "/brightness")
+            self.brightness = _FLOAT.unpack_from(buf, offset)[0]
+            offset += 4
+        if (bool(self.flags & MAT_FLAG_ENVMAP)):
+            if path:
+                check_bounds(buf, offset, 5, path + "/envmap_name")
+                check_bounds(buf, offset + 5, buf[offset + 4] + 1, path + "/envmap_name")
+            self.unknown2 = buf[offset:offset + 4]
+            offset += 4
+            self.envmap_name_len = buf[offset]
+            self.envmap_name = read_string(buf, offset + 1, self.envmap_name_len, path and path + "/envmap_name")
+            offset += 1 + self.envmap_name_len + 1  # skip null termination
+        self.size = offset - self.offset
+
+        if debug:
+            self.dbg_print()
+        return offset
             
-    def write(self, file, debug=False):
-        file.write(struct.pack("<B", self.name_len))
-        file.write(struct.pack("<%ds" % self.name_len, self.name.encode("utf-8")))
-        file.write(struct.pack("<B", 0))  # null termination
-        file.write(struct.pack("<H", self.flags))
-        file.write(struct.pack("<H", self.shader_tech))
+    def buffer_size(self):
+        size = 1 + len(encode_string(self.name)) + 1 + 4
         if (bool(self.flags & MAT_FLAG_RGBA)):
-            file.write(struct.pack("<4B", self.RGBA[0], self.RGBA[1], self.RGBA[2], self.RGBA[3]))
+            size += 4
+        if (bool(self.flags & MAT_FLAG_UNKNOWN)):
+            size += 4
         if (bool(self.flags & MAT_FLAG_DIFFUSE)):
-            file.write(struct.pack("<B", self.diffuse_name_len))
-            file.write(struct.pack("<%ds" % self.diffuse_name_len, self.diffuse_name.encode("utf-8")))
-            file.write(struct.pack("<B", 0))  # null termination
+            size += 1 + len(encode_string(self.diffuse_name)) + 1
         if (bool(self.flags & MAT_FLAG_BRIGHTNESS)):
-            file.write(struct.pack("<f", self.brightness))
+            size += 4
         if (bool(self.flags & MAT_FLAG_ENVMAP)):
-            file.write(struct.pack("<f", 0.4))  # <unknown2> taken from FrBis_Verre.ldo
-            file.write(struct.pack("<B", self.envmap_name_len))
-            file.write(struct.pack("<%ds" % self.envmap_name_len, self.envmap_name.encode("utf-8")))
-            file.write(struct.pack("<B", 0))  # null termination
-        
+            size += 4 + 1 + len(encode_string(self.envmap_name)) + 1
+        return size
+
+    def write_buffer(self, buf, offset, debug=False):
+        offset = write_string(buf, offset, self.name)
+        _INT16.pack_into(buf, offset, self.flags)
+        _INT16.pack_into(buf, offset + 2, self.shader_tech)
+        offset += 4
+        if (bool(self.flags & MAT_FLAG_RGBA)):
+            buf[offset:offset + 4] = bytes(self.RGBA[:4])
+            offset += 4
+        if (bool(self.flags & MAT_FLAG_UNKNOWN)):
+            buf[offset:offset + 4] = self.unknown1
+            offset += 4
+        if (bool(self.flags & MAT_FLAG_DIFFUSE)):
+            offset = write_string(buf, offset, self.diffuse_name)
+        if (bool(self.flags & MAT_FLAG_BRIGHTNESS)):
+            _FLOAT.pack_into(buf, offset, self.brightness)
+            offset += 4
+        if (bool(self.flags & MAT_FLAG_ENVMAP)):
+            buf[offset:offset + 4] = self.unknown2
+            offset += 4
+            offset = write_string(buf, offset, self.envmap_name)
+
         if debug:
             self.dbg_print()
+        return offset
     
     def as_dict(self):
         dic = { "name_len": self.name_len,
@@ -279,68 +798,312 @@ class Material:
 class Mesh:
     """
     Handles a LDO mesh
+    Vertices are decoded in bulk into contiguous float32 arrays,
+    Vertex objects are only built on demand through *vertices*.
+    A mesh read lazily from a buffer only decodes its vertices and tris
+    the first time they are accessed.
     """
     def __init__(self):
         self.vertex_cnt = 0
         self.tri_cnt = 0
-        self.va_cnt = 0
-        self.va = ()
+        self.va_cnt = MESH_VA_CNT
+        self.va = MESH_VA
         
-        self.vertices = []
+        self._positions = np.zeros((0, 3), dtype=np.float32)
+        self._normals = np.zeros((0, 3), dtype=np.float32)
+        self._uvs = np.zeros((0, 2), dtype=np.float32)
         self.tri_seq_cnt = 0
-        self.tri_seq_mat = []
-        self.tri_seq_len = []
-        self.tris = []
+        self.tri_seq_mat = np.zeros(0, dtype=np.int32)  # material id of each tri sequence
+        self.tri_seq_len = np.zeros(0, dtype=np.int32)  # tri count of each tri sequence
+        self._tri_indices = np.zeros((0, 3), dtype=np.int16)
+
+        # unknown data
+        self.unknown = bytes(28)
+        self._vertex_extra = None  # (vertex_cnt, stride - 32) bytes, if the stride has any
+
+        self._vertices = None
+        self._tris = None
+
+        # geometry location in the buffer of a lazily read mesh
+        self._buf = None
+        self._vertex_offset = 0
+        self._tri_seq_offsets = []
             
     def __repr__(self):
         return "Mesh"
+
+    @property
+    def vertices(self):
+        """
+        Vertex objects view of the vertex arrays, kept for compatibility.
+        """
+        if self._vertices is None:
+            vertices = []
+            for position, normal, uv in zip(self.positions.tolist(), self.normals.tolist(), self.uvs.tolist()):
+                vertex = Vertex()
+                vertex.position = Vector(data=position)
+                vertex.normal = Vector(data=normal)
+                vertex.uv = UV()
+                vertex.uv.u, vertex.uv.v = uv
+                vertices.append(vertex)
+            self._vertices = vertices
+        return self._vertices
+
+    @property
+    def tris(self):
+        """
+        Tri objects view of the tri index array, kept for compatibility.
+        """
+        if self._tris is None:
+            tris = []
+            material_ids = np.repeat(self.tri_seq_mat, self.tri_seq_len).tolist()
+            for material_id, vertices_id in zip(material_ids, self.tri_indices.tolist()):
+                tri = Tri(material_id)
+                tri.vertices_id = tuple(vertices_id)
+                tris.append(tri)
+            self._tris = tris
+        return self._tris
+
+    @property
+    def stride(self):
+        return vertex_stride(self.va_cnt, self.va)
+
+    @property
+    def is_loaded(self):
+        return self._buf is None
+
+    @property
+    def positions(self):
+        if self._buf is not None:
+            self.load()
+        return self._positions
+
+    @positions.setter
+    def positions(self, value):
+        self._positions = value
+
+    @property
+    def normals(self):
+        if self._buf is not None:
+            self.load()
+        return self._normals
+
+    @normals.setter
+    def normals(self, value):
+        self._normals = value
+
+    @property
+    def uvs(self):
+        if self._buf is not None:
+            self.load()
+        return self._uvs
+
+    @uvs.setter
+    def uvs(self, value):
+        self._uvs = value
+
+    @property
+    def vertex_extra(self):
+        if self._buf is not None:
+            self.load()
+        return self._vertex_extra
+
+    @vertex_extra.setter
+    def vertex_extra(self, value):
+        self._vertex_extra = value
+
+    @property
+    def tri_indices(self):
+        if self._buf is not None:
+            self.load()
+        return self._tri_indices
+
+    @tri_indices.setter
+    def tri_indices(self, value):
+        self._tri_indices = value
     
-    def read(self, file, debug=False):
+    def read(self, file, debug=False, geometry=True):
         # Mesh header
         self.vertex_cnt = struct.unpack("<i", file.read(4))[0]
         self.tri_cnt = struct.unpack("<i", file.read(4))[0]
-        file.seek(8, 1)  # skip unknown data
-        file.seek(16, 1)  # skip unknown data
-        file.seek(4, 1)  # skip unknown data
+        self.unknown = file.read(28)
         self.va_cnt = file.read(1)[0]
-        self.va += (file.read(1)[0], file.read(1)[0], file.read(1)[0], file.read(1)[0],)
-
-        # Vertices
-        for _ in range(self.vertex_cnt):
-            vertex = Vertex()
-            vertex.read(file, self.va_cnt, self.va)
-            self.vertices.append(vertex)
+        self.va = (file.read(1)[0], file.read(1)[0], file.read(1)[0], file.read(1)[0],)
+
+        # Vertices, decoded in one pass
+        stride = self.stride
+        if geometry:
+            data = np.frombuffer(file.read(self.vertex_cnt * stride), dtype=vertex_dtype(stride), count=self.vertex_cnt)
+            self.positions = np.ascontiguousarray(data["position"])
+            self.normals = np.ascontiguousarray(data["normal"])
+            self.uvs = np.ascontiguousarray(data["uv"])
+            if stride > 32:
+                self.vertex_extra = np.ascontiguousarray(data["extra"])
+        else:
+            file.seek(self.vertex_cnt * stride, 1)  # skip vertices
+        self._vertices = None
         
         # Tris header
         self.tri_seq_cnt = struct.unpack("<i", file.read(4))[0]
-        # Tri sequences
-        for _ in range(self.tri_seq_cnt):
-            self.tri_seq_mat.append(struct.unpack("<i", file.read(4))[0])
-            self.tri_seq_len.append(struct.unpack("<i", file.read(4))[0])
-            for _ in range(self.tri_seq_len[-1]):
-                tri = Tri(self.tri_seq_mat[-1])
-                tri.read(file)
-                self.tris.append(tri)
+        # Tri sequences, decoded one sequence at a time into a single index array
+        self.tri_seq_mat = np.zeros(self.tri_seq_cnt, dtype=np.int32)
+        self.tri_seq_len = np.zeros(self.tri_seq_cnt, dtype=np.int32)
+        indices = []
+        for si in range(self.tri_seq_cnt):
+            material_id, sequence_len = struct.unpack("<2i", file.read(8))
+            self.tri_seq_mat[si] = material_id
+            self.tri_seq_len[si] = sequence_len
+            if geometry:
+                indices.append(np.frombuffer(file.read(sequence_len * 6), dtype="<i2").reshape(-1, 3))
+            else:
+                file.seek(sequence_len * 6, 1)  # skip tris
+        if indices:
+            self.tri_indices = np.concatenate(indices).astype(np.int16)
+        else:
+            self.tri_indices = np.zeros((0, 3), dtype=np.int16)
+        self._tris = None
         
         if debug:
             self.dbg_print()
+
+    def read_buffer(self, buf, offset, debug=False, lazy=False, path=None):
+        """
+        *path* locates the mesh in the LDO when validating the buffer, None otherwise.
+        """
+        # Mesh header
+        if path:
+            check_bounds(buf, offset, 41, path + "/header")
+        self.vertex_cnt, self.tri_cnt = _INT32_PAIR.unpack_from(buf, offset)
+        self.unknown = buf[offset + 8:offset + 36]
+        offset += 36
+        self.va_cnt = buf[offset]
+        self.va = tuple(buf[offset + 1:offset + 5])
+        offset += 5
+
+        # Vertices, only located here
+        if path:
+            check_bounds(buf, offset, self.vertex_cnt * self.stride + 4, path + "/vertices")
+        self._buf = buf
+        self._vertex_offset = offset
+        offset += self.vertex_cnt * self.stride
+
+        # Tris header
+        self.tri_seq_cnt = _INT32.unpack_from(buf, offset)[0]
+        offset += 4
+        if path:
+            check_bounds(buf, offset, self.tri_seq_cnt * 8, path + "/tri_sequences")
+        # Tri sequences, only their headers are read here
+        self.tri_seq_mat = np.zeros(self.tri_seq_cnt, dtype=np.int32)
+        self.tri_seq_len = np.zeros(self.tri_seq_cnt, dtype=np.int32)
+        self._tri_seq_offsets = []
+        for si in range(self.tri_seq_cnt):
+            if path:
+                check_bounds(buf, offset, 8, "{}/tri_sequence[{}]".format(path, si))
+            material_id, sequence_len = _INT32_PAIR.unpack_from(buf, offset)
+            offset += 8
+            if path:
+                check_bounds(buf, offset, sequence_len * 6, "{}/tri_sequence[{}]".format(path, si))
+            self.tri_seq_mat[si] = material_id
+            self.tri_seq_len[si] = sequence_len
+            self._tri_seq_offsets.append(offset)
+            offset += sequence_len * 6
+
+        if not lazy:
+            self.load()
+
+        if debug:
+            self.dbg_print()
+        return offset
+
+    def load(self):
+        """
+        Decodes the vertices and tris of a mesh read lazily from a buffer.
+        The buffer is released afterwards.
+        """
+        buf = self._buf
+        if buf is None:
+            return
+
+        # Vertices, decoded in one pass
+        data = np.frombuffer(buf, dtype=vertex_dtype(self.stride), count=self.vertex_cnt, offset=self._vertex_offset)
+        self._positions = np.ascontiguousarray(data["position"])
+        self._normals = np.ascontiguousarray(data["normal"])
+        self._uvs = np.ascontiguousarray(data["uv"])
+        if self.stride > 32:
+            self._vertex_extra = np.ascontiguousarray(data["extra"])
+        self._vertices = None
+
+        # Tri sequences, concatenated into a single index array
+        indices = []
+        for tri_seq_offset, sequence_len in zip(self._tri_seq_offsets, self.tri_seq_len.tolist()):
+            indices.append(np.frombuffer(buf, dtype="<i2", count=sequence_len * 3, offset=tri_seq_offset).reshape(-1, 3))
+        if indices:
+            self._tri_indices = np.concatenate(indices).astype(np.int16)
+        else:
+            self._tri_indices = np.zeros((0, 3), dtype=np.int16)
+        self._tris = None
+
+        self._buf = None
     
+    def buffer_size(self):
+        size = 8 + 28 + 5 + self.vertex_cnt * self.stride + 4
+        size += 8 * self.tri_seq_cnt + 6 * int(np.sum(self.tri_seq_len))
+        return size
+
+    def write_buffer(self, buf, offset, debug=False):
+        # Mesh header
+        _INT32_PAIR.pack_into(buf, offset, self.vertex_cnt, self.tri_cnt)
+        buf[offset + 8:offset + 36] = self.unknown
+        buf[offset + 36] = self.va_cnt
+        buf[offset + 37:offset + 41] = bytes(self.va)
+        offset += 41
+
+        # Vertices, encoded in one pass
+        stride = self.stride
+        data = np.zeros(self.vertex_cnt, dtype=vertex_dtype(stride))
+        data["position"] = self.positions
+        data["normal"] = self.normals
+        data["uv"] = self.uvs
+        if stride > 32 and self.vertex_extra is not None:
+            data["extra"] = self.vertex_extra
+        buf[offset:offset + self.vertex_cnt * stride] = data.tobytes()
+        offset += self.vertex_cnt * stride
+
+        # Tris header
+        _INT32.pack_into(buf, offset, self.tri_seq_cnt)
+        offset += 4
+        # Tri sequences
+        tri_indices = self.tri_indices.astype("<i2")
+        tri_start = 0
+        for material_id, sequence_len in zip(self.tri_seq_mat.tolist(), self.tri_seq_len.tolist()):
+            _INT32_PAIR.pack_into(buf, offset, material_id, sequence_len)
+            offset += 8
+            buf[offset:offset + sequence_len * 6] = tri_indices[tri_start:tri_start + sequence_len].tobytes()
+            offset += sequence_len * 6
+            tri_start += sequence_len
+
+        if debug:
+            self.dbg_print()
+        return offset
+
     def as_dict(self):
         dic = { "vertex_cnt": self.vertex_cnt,
                 "tri_cnt": self.tri_cnt,
                 "va_cnt": self.va_cnt,
                 "va": self.va,
-                "vertices": self.vertices,
+                "positions": self.positions,
+                "normals": self.normals,
+                "uvs": self.uvs,
                 "tri_seq_cnt": self.tri_seq_cnt,
                 "tri_seq_mat": self.tri_seq_mat,
                 "tri_seq_len": self.tri_seq_len,
-                "tris": self.tris
+                "tri_indices": self.tri_indices
         }
         return dic
     
     def dbg_print(self):
         print("------------------- MESH DEBUG INFO --------------------")
-        print("vertex_cnt: {}  tri_cnt: {}  tri_seq_mat: {}  tri_seq_len: {}".format(self.vertex_cnt, self.tri_cnt, self.tri_seq_mat, self.tri_seq_len))
+        print("vertex_cnt: {}  tri_cnt: {}  tri_seq_mat: {}  tri_seq_len: {}".format(self.vertex_cnt, self.tri_cnt, self.tri_seq_mat.tolist(), self.tri_seq_len.tolist()))
         print("va_cnt: {}  va: {}".format(self.va_cnt, self.va))
         print()
 
@@ -349,11 +1112,22 @@ class Dummy:
     """
     Handles a LDO dummy
     """
+    __slots__ = ("flags", "position", "rotmat", "index", "unknown", "type_str", "offset", "size")
+
     def __init__(self):
         self.flags = 0
         
         self.position = None
         self.rotmat = []
+
+        # unknown data
+        self.index = 0
+        self.unknown = bytes(4)
+        self.type_str = b""
+
+        # location in the buffer the dummy was read from
+        self.offset = 0
+        self.size = 0
             
     def __repr__(self):
         return "Dummy"
@@ -369,25 +1143,93 @@ class Dummy:
             self.rotmat.append(Vector(file))
             self.rotmat.append(Vector(file))
 
-        file.seek(4, 1)  # skip dummy index
-        file.seek(4, 1)  # skip usual 4 bytes
+        self.index = struct.unpack("<i", file.read(4))[0]
+        self.unknown = file.read(4)
 
-        # retrieve dummy type
+        # dummy type string, its length depends on the dummy type
         dummy_type = self.flags & DUMMY_MASK_TYPE
-
-        if (dummy_type == DUMMY_TYPE_WORLD):
-            file.seek(5, 1)  # skip "world"
-        elif (dummy_type == DUMMY_TYPE_NUM):
-            file.seek(6, 1)  # skip "Dummy#"
-        elif (dummy_type == DUMMY_TYPE_OUT):
-            file.seek(9, 1)  # skip "DUMMY_OUT"
-        elif (dummy_type == DUMMY_TYPE_ROOF):
-            file.seek(10, 1)  # skip "DUMMY ROOF"
-        elif (dummy_type == DUMMY_TYPE_BONUS):
-            file.seek(11, 1)  # skip "DUMMY BONUS"
+        self.type_str = file.read(len(DUMMY_TYPE_STR.get(dummy_type, b"")))
         
         if debug:
             self.dbg_print()
+
+    def read_buffer(self, buf, offset, debug=False, path=None):
+        """
+        *path* locates the dummy in the LDO when validating the buffer, None otherwise.
+        """
+        self.offset = offset
+        if path:
+            check_bounds(buf, offset, 2, path + "/flags")
+        self.flags = _INT16.unpack_from(buf, offset)[0]
+        offset += 2
+        if path:
+            size = 12 * bool(self.flags & DUMMY_FLAG_POS) + 48 * bool(self.flags & DUMMY_FLAG_POSROT)
+            size += 8 + len(DUMMY_TYPE_STR.get(self.flags & DUMMY_MASK_TYPE, b""))
+            check_bounds(buf, offset, size, path + "/data")
+
+        if (bool(self.flags & DUMMY_FLAG_POS)):
+            self.position = Vector()
+            offset = self.position.read_buffer(buf, offset)
+        if (bool(self.flags & DUMMY_FLAG_POSROT)):
+            self.position = Vector()
+            offset = self.position.read_buffer(buf, offset)
+            for _ in range(3):
+                row = Vector()
+                offset = row.read_buffer(buf, offset)
+                self.rotmat.append(row)
+
+        self.index = _INT32.unpack_from(buf, offset)[0]
+        self.unknown = buf[offset + 4:offset + 8]
+        offset += 8
+
+        # dummy type string, its length depends on the dummy type
+        type_str_len = len(DUMMY_TYPE_STR.get(self.flags & DUMMY_MASK_TYPE, b""))
+        self.type_str = buf[offset:offset + type_str_len]
+        offset += type_str_len
+        self.size = offset - self.offset
+
+        if debug:
+            self.dbg_print()
+        return offset
+
+    def buffer_size(self):
+        size = 2 + 8 + len(self.get_type_str())
+        if (bool(self.flags & DUMMY_FLAG_POS)):
+            size += 12
+        if (bool(self.flags & DUMMY_FLAG_POSROT)):
+            size += 48
+        return size
+
+    def get_type_str(self):
+        """
+        Returns the type string read from the file, or the one matching the dummy type.
+        """
+        if self.type_str:
+            return self.type_str
+        return DUMMY_TYPE_STR.get(self.flags & DUMMY_MASK_TYPE, b"")
+
+    def write_buffer(self, buf, offset, debug=False):
+        _INT16.pack_into(buf, offset, self.flags)
+        offset += 2
+
+        if (bool(self.flags & DUMMY_FLAG_POS)):
+            offset = self.position.write_buffer(buf, offset)
+        if (bool(self.flags & DUMMY_FLAG_POSROT)):
+            offset = self.position.write_buffer(buf, offset)
+            for row in self.rotmat:
+                offset = row.write_buffer(buf, offset)
+
+        _INT32.pack_into(buf, offset, self.index)
+        buf[offset + 4:offset + 8] = self.unknown
+        offset += 8
+
+        type_str = self.get_type_str()
+        buf[offset:offset + len(type_str)] = type_str
+        offset += len(type_str)
+
+        if debug:
+            self.dbg_print()
+        return offset
     
     def as_dict(self):
         dic = { "flags": self.flags,
@@ -410,6 +1252,8 @@ class Vertex:
     """
     Handles a LDO vertex
     """
+    __slots__ = ("position", "normal", "uv")
+
     def __init__(self):
         self.position = None
         self.normal = None
@@ -418,19 +1262,6 @@ class Vertex:
     def __repr__(self):
         return "Vertex"
 
-    def read(self, file, va_cnt, va):
-        # Vertex
-        self.position = Vector(file)
-        self.normal = Vector(file)
-        self.uv = UV()
-        self.uv.read4(file)
-        if (va[2] == 0x0b):
-            file.seek(4, 1)  # skip unknown data
-        if (va_cnt > 3):
-            file.seek(8, 1)  # skip unknown data
-            if (va[3] == 0x0c):
-                file.seek(4, 1)  # skip unknown data
-
     def as_dict(self):
         dic = {"position": self.position.as_dict(),
                "normal": self.normal.as_dict(),
@@ -443,6 +1274,8 @@ class Tri:
     """
     Handles a LDO tri
     """
+    __slots__ = ("vertices_id", "material_id")
+
     def __init__(self, material_id):
         self.vertices_id = []
         self.material_id = material_id
@@ -461,8 +1294,13 @@ class Tri:
 
 class LDL:
     """
-    Handles .ldl files to be read in conjunction with a level .ini file
+    Handles .ldl files to be read in conjunction with a level .ini file.
+    Instances can be read in order with read_instance, or at random
+    with fetch once read_index has located all of them.
     """
+    __slots__ = ("bit_depth", "instance_cnt", "file", "mesh_cnt", "vertex_cnt", "current_name", "current_uvs",
+                 "offsets", "names", "vertex_cnts", "name_index")
+
     def __init__(self, file):
         self.bit_depth = 0
         self.instance_cnt = 0
@@ -473,6 +1311,12 @@ class LDL:
         self.current_name = None
         self.current_uvs = []
 
+        # instance index, filled by read_index
+        self.offsets = []
+        self.names = []
+        self.vertex_cnts = []
+        self.name_index = {}
+
     def read_header(self):
         self.bit_depth = self.file.read(1)[0]
         if self.bit_depth not in [16, 32]:
@@ -489,28 +1333,86 @@ class LDL:
             if self.instance_cnt == -2:
                 set_error('reading LDL instance', "No more instances to read")
             return
+        self.read_record(debug)
+
+    def read_index(self):
+        """
+        Locates all the instances in one pass over the file, skipping the UV blocks.
+        Must be called right after read_header.
+        """
+        uv_size = 4 if self.bit_depth == 16 else 8
+        self.offsets = []
+        self.names = []
+        self.vertex_cnts = []
+        self.name_index = {}
+        for ordinal in range(self.instance_cnt):
+            self.offsets.append(self.file.tell())
+            mesh_cnt = struct.unpack("<i", self.file.read(4))[0]
+            name_len = self.file.read(1)[0]
+            name = self.file.read(name_len + 1)[:name_len].decode("utf-8")
+            vertex_cnts = []
+            for _ in range(mesh_cnt):
+                vertex_cnt = struct.unpack("<i", self.file.read(4))[0]
+                self.file.seek(vertex_cnt * uv_size, 1)
+                vertex_cnts.append(vertex_cnt)
+            self.names.append(name)
+            self.vertex_cnts.append(vertex_cnts)
+            self.name_index.setdefault(name.lower(), []).append(ordinal)
+
+    def find(self, name):
+        """
+        Returns the ordinals of the instances of a LDO, in file order.
+        """
+        return self.name_index.get(name.lower(), [])
+
+    def fetch(self, ordinal, debug=False):
+        """
+        Reads the instance at *ordinal* as the current instance.
+        """
+        self.file.seek(self.offsets[ordinal])
+        self.read_record(debug)
+
+    def read_record(self, debug=False):
+        """
+        Reads the instance at the current file position as the current instance.
+        """
         self.mesh_cnt = struct.unpack("<i", self.file.read(4))[0]
         name_len = self.file.read(1)[0]
         self.current_name = struct.unpack("<%ds" % name_len, self.file.read(name_len))[0].decode("utf-8")
         self.file.seek(1, 1)  # skip null termination
         self.vertex_cnt = []
         self.current_uvs = []
+        # each mesh UV block is decoded at once into a (vertex_cnt, 2) array
+        dtype = np.dtype('<f2') if self.bit_depth == 16 else np.dtype('<f4')
         for _ in range(self.mesh_cnt):
-            uvs = []
             vertex_cnt = struct.unpack("<i", self.file.read(4))[0]
-            for _ in range(vertex_cnt):
-                uv = UV()
-                if self.bit_depth == 16:
-                    uv.read2(self.file)
-                if self.bit_depth == 32:
-                    uv.read4(self.file)
-                uvs.append(uv)
+            uvs = np.frombuffer(self.file.read(vertex_cnt * 2 * dtype.itemsize), dtype=dtype).reshape(-1, 2)
             self.vertex_cnt.append(vertex_cnt)
             self.current_uvs.append(uvs)
 
         if debug:
             self.dbg_print()
 
+    def write(self, instances):
+        """
+        Writes a whole LDL file in one pass at the bit depth of the LDL.
+        *instances* is a list of (ldo_name, uvs) in level order, where uvs is
+        a list of (vertex_cnt, 2) UV arrays in the LDL mesh order.
+        """
+        dtype = np.dtype('<f2') if self.bit_depth == 16 else np.dtype('<f4')
+        buf = bytearray()
+        buf += bytes((self.bit_depth, 0, 0, 0))
+        buf += _INT32.pack(len(instances))
+        for name, uvs in instances:
+            name = encode_string(name)
+            buf += _INT32.pack(len(uvs))
+            buf += bytes((len(name),)) + name + b"\0"
+            for mesh_uvs in uvs:
+                buf += _INT32.pack(len(mesh_uvs))
+                buf += np.ascontiguousarray(mesh_uvs, dtype=dtype).tobytes()
+        self.file.write(buf)
+        self.instance_cnt = len(instances)
+
     def __repr__(self):
         return "LDL"
     
@@ -520,10 +1422,64 @@ class LDL:
         print()
 
 
+def assign_lightmap_instances(lightmap, filenames):
+    """
+    Assigns LDL instances to the LDOs of a level, given in import order
+    (None for the level instances without a LDO).
+    Returns the LDL instance ordinal of each LDO (None if it isn't lightmapped)
+    and the number of LDL instances that were matched.
+    The instances of each LDO are consumed in file order, so they can then be
+    fetched in any order.
+    """
+    ordinals = []
+    consumed = 0
+    next_index = {}
+    for filename in filenames:
+        ordinal = None
+        if lightmap and filename:
+            name = filename.lower()
+            candidates = lightmap.find(name)
+            index = next_index.get(name, 0)
+            if index < len(candidates):
+                vertex_cnts = lightmap.vertex_cnts[candidates[index]]
+                if vertex_cnts and vertex_cnts[0]:
+                    ordinal = candidates[index]
+                # instances with no data to import are skipped
+                next_index[name] = index + 1
+                consumed += 1
+        ordinals.append(ordinal)
+    return ordinals, consumed
+
+
+def lightmap_mesh_indices(ldo):
+    """
+    Returns the index in a LDL instance of the UVs of every mesh of a LDO, as one list per atomic.
+    The LDL stores the meshes of all the atomics as a single list, in reverse order.
+    """
+    mesh_cnt = sum(len(atomic.meshes) for atomic in ldo.atomics)
+    indices = []
+    for atomic in ldo.atomics:
+        indices.append([mesh_cnt - 1 - mi for mi in range(len(atomic.meshes))])
+        mesh_cnt -= len(atomic.meshes)
+    return indices
+
+
+def to_lightmap_order(ldo, mesh_items):
+    """
+    Reorders per-mesh items of a LDO, listed by atomic then mesh, into the LDL mesh order.
+    """
+    ordered = [None] * len(mesh_items)
+    for index, item in zip((index for atomic_indices in lightmap_mesh_indices(ldo) for index in atomic_indices), mesh_items):
+        ordered[index] = item
+    return ordered
+
+
 class UV:
     """
     Handles a LDO uv
     """
+    __slots__ = ("u", "v")
+
     def __init__(self):
         self.u = 0.0
         self.v = 0.0
@@ -531,18 +1487,6 @@ class UV:
     def __repr__(self):
         return str(self.as_dict())
 
-    def read2(self, file):
-        self.u = np.frombuffer(file.read(2), dtype='<f2')[0]
-        self.v = np.frombuffer(file.read(2), dtype='<f2')[0]
-
-    def read4(self, file):
-        self.u = struct.unpack("<f", file.read(4))[0]
-        self.v = struct.unpack("<f", file.read(4))[0]
-        
-        #if self.u < 0. or self.u > 1. or self.v < 0. or self.v > 1.:
-            # do something about it?
-            #print("Warning: UV coordinates out of bounds: ({};{})".format(self.u, self.v))
-
     def as_dict(self):
         dic = {"u": self.u,
                "v": self.v
@@ -556,20 +1500,32 @@ class UV:
 
 class Vector:
     """
-    A very simple vector class
+    A very simple vector class, its coordinates are stored in a compact array
     """
+    __slots__ = ("data",)
+
     def __init__(self, file=None, data=None):
-        if data:
-            self.data = [data[0], data[1], data[2]]
+        if data is not None:
+            self.data = array("d", (data[0], data[1], data[2]))
         else:
-            self.data = [0, 0, 0]
+            self.data = array("d", (0, 0, 0))
 
         if file:
             self.read(file)
 
     def read(self, file):
         # Reads the coordinates
-        self.data = [c for c in struct.unpack("<3f", file.read(12))]
+        self.data = array("d", struct.unpack("<3f", file.read(12)))
+
+    def read_buffer(self, buf, offset):
+        # Reads the coordinates, returns the offset after them
+        self.data = array("d", _VECTOR.unpack_from(buf, offset))
+        return offset + 12
+
+    def write_buffer(self, buf, offset):
+        # Writes all coordinates, returns the offset after them
+        _VECTOR.pack_into(buf, offset, *self.data)
+        return offset + 12
 
     def write(self, file):
         # Writes all coordinates
@@ -21,6 +21,8 @@ import bpy
 import time
 
 from . import descriptor_in
+from . import img_in
+from . import ldo_in
 from . import trackpart
 
 from .common import *
@@ -53,6 +55,8 @@ class ImportMad(bpy.types.Operator):
         context.window.cursor_set("WAIT")
 
         dprint("Importing {}".format(self.filepath))
+        img_in.clear_registry()
+        ldo_in.clear_registry()
 
         if frmt == FORMAT_INI:
             # differentiate between .ini files based on filepath
@@ -66,7 +70,6 @@ class ImportMad(bpy.types.Operator):
             return {'CANCELLED'}
         
         elif frmt == FORMAT_LDO:
-            from . import ldo_in
             ldo_in.import_file(self.filepath, scene)
 
             # Disable debug info if user then imports a level for instance.
@@ -244,6 +247,11 @@ class ExportMad(bpy.types.Operator):
         if frmt == FORMAT_LDO:
             box = layout.box()
             box.prop(props, "ldo_debug_info")
+
+        if frmt in (FORMAT_INI, FORMAT_LEVEL_INI):
+            box = layout.box()
+            box.prop(props, "level_export_lightmap")
+            box.prop(props, "lightmap_bit_depth")
     
     def invoke(self, context, event):
         context.window_manager.fileselect_add(self)
@@ -261,6 +269,8 @@ class ButtonNewTrackpartSequence(bpy.types.Operator):
 
     def execute(self, context):
         scene = context.scene
+        img_in.clear_registry()
+        ldo_in.clear_registry()
         trackpart.add_user(scene, trackpart.from_dropdown(scene))
 
         # Gets any encountered errors
@@ -66,6 +66,18 @@ class MadSceneProperties(bpy.types.PropertyGroup):
         default = False,
         description = "Enable lightmap instances debug info"
     )
+    level_export_lightmap = BoolProperty(
+        name = "Export Lightmap",
+        default = False,
+        description = "Export the \"LightMap\" UV layers of the level instances to a .ldl file next to the level .ini file"
+    )
+    lightmap_bit_depth = EnumProperty(
+        name = "Lightmap Bit Depth",
+        description = "Precision of the exported lightmap UVs",
+        items = (("16", "16 bits", "Half precision UVs"),
+                 ("32", "32 bits", "Single precision UVs")),
+        default = "16"
+    )
 
     # Trackpart editor
     # PROPERTIES CAN TAKE A "update" PARAMETERS WHICH IS THE FUNCTION CALLED WHEN THE VALUE CHANGES
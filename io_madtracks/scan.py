@@ -0,0 +1,180 @@
+# Copyright (C) 2024-2026  Lucas Pottier
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#-----------------------------------------------------------------------------
+# Mad Tracks Blender Add-on, based on Re-Volt Blender Add-on.
+#-----------------------------------------------------------------------------
+
+"""
+Name:    scan
+Purpose: Validates a whole Mad Tracks data directory
+
+Description:
+Parses every LDO, descriptor, level, world and LDL file of an extracted
+data.zip tree with the madstructs and madini readers, spread over
+several processes. Reports the parse status of each file, whether the
+end of file was reached, the LDO format versions and the parse time.
+
+Usage:
+    python -m io_madtracks.scan [--jobs N] [--errors-only] data_dir
+
+"""
+
+import argparse
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+
+from . import madstructs
+from . import madini
+
+from .core import *
+
+# directories to scan and the extensions of the files they contain
+SCAN_PATHS = [
+    (LDO_PATH, (".ldo",)),
+    (DESCRIPTOR_PATH, (".ini",)),
+    (LEVEL_PATH, (".ini", ".dam")),
+    (WORLD_PATH, (".ini",)),
+    (LDL_PATH, (".ldl",)),
+]
+
+
+def list_files(data_dir):
+    """
+    Lists the files to scan in a data directory, largest first to balance the workers.
+    """
+    filepaths = []
+    for path, extensions in SCAN_PATHS:
+        try:
+            directory = filepath_insensitive(os.path.join(data_dir, path))
+        except OSError:
+            continue
+        if not os.path.isdir(directory):
+            continue
+        for root, dirs, files in os.walk(directory):
+            for name in files:
+                if name.lower().endswith(extensions):
+                    filepaths.append(os.path.join(root, name))
+    filepaths.sort(key=os.path.getsize, reverse=True)
+    return filepaths
+
+
+def scan_ldo(filepath, result):
+    with open(filepath, 'rb') as file:
+        buf = madstructs.load_buffer(file)
+        ldo = madstructs.LDO()
+        try:
+            offset = ldo.read_buffer(buf, validate=True)
+            result["eof"] = offset == len(buf)
+            result["versions"] = list(ldo.versions)
+            result["items"] = ldo.atomic_cnt
+        finally:
+            # release the structures referencing the mapped file before closing it
+            ldo = None
+            if hasattr(buf, "close"):
+                try:
+                    buf.close()
+                except BufferError:
+                    # still referenced by a traceback, unmapped once collected
+                    pass
+
+
+def scan_ldl(filepath, result):
+    with open(filepath, 'rb') as file:
+        lightmap = madstructs.LDL(file)
+        if lightmap.read_header():
+            lightmap.read_index()
+            result["eof"] = file.tell() == os.fstat(file.fileno()).st_size
+            result["versions"] = [lightmap.bit_depth]
+            result["items"] = lightmap.instance_cnt
+
+
+def scan_ini(filepath, result):
+    with open(filepath, 'r', encoding="ISO-8859-1") as file:
+        ini = madini.INI(file)
+    result["items"] = len(ini.sections)
+
+
+def scan_file(filepath):
+    """
+    Parses one file and returns its result dictionary.
+    """
+    result = {
+        "file": filepath,
+        "size": os.path.getsize(filepath),
+        "status": "ok",
+        "error": None,
+        "eof": True,
+        "versions": None,
+        "items": 0,
+        "time": 0.0,
+    }
+    ext = filepath.lower().rsplit(".", 1)[1]
+    start = time.perf_counter()
+    try:
+        if ext == "ldo":
+            scan_ldo(filepath, result)
+        elif ext == "ldl":
+            scan_ldl(filepath, result)
+        else:
+            scan_ini(filepath, result)
+    except madstructs.LDOFormatError as e:
+        result["status"] = "error"
+        result["error"] = str(e)
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = "{}: {}".format(type(e).__name__, e)
+    result["time"] = time.perf_counter() - start
+
+    # errors reported by the readers themselves
+    errors = get_errors()
+    if result["status"] == "ok" and errors != "Successfully completed.":
+        result["status"] = "error"
+        result["error"] = " ".join(errors.split())
+    if result["status"] == "ok" and not result["eof"]:
+        result["status"] = "eof"
+    return result
+
+
+def scan(filepaths, jobs=None):
+    """
+    Scans files over *jobs* processes (all the cores by default). Returns the results sorted by file.
+    """
+    chunksize = max(1, len(filepaths) // ((jobs or os.cpu_count() or 1) * 8))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        results = list(executor.map(scan_file, filepaths, chunksize=chunksize))
+    results.sort(key=lambda result: result["file"])
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="io_madtracks.scan", description="Validate a Mad Tracks data directory")
+    parser.add_argument("data_dir", help="extracted data.zip directory")
+    parser.add_argument("--jobs", type=int, default=None, help="number of worker processes, all the cores by default")
+    parser.add_argument("--errors-only", action="store_true", help="only list the files that failed")
+    args = parser.parse_args(argv)
+
+    filepaths = list_files(args.data_dir)
+    start = time.perf_counter()
+    results = scan(filepaths, args.jobs)
+    elapsed = time.perf_counter() - start
+
+    print("{:<60} {:>10} {:<6} {:>8} {:<12} {}".format("file", "bytes", "status", "ms", "versions", "error"))
+    for result in results:
+        if args.errors_only and result["status"] == "ok":
+            continue
+        versions = ",".join(str(version) for version in result["versions"]) if result["versions"] else "-"
+        print("{:<60} {:>10} {:<6} {:>8.2f} {:<12} {}".format(
+            os.path.relpath(result["file"], args.data_dir), result["size"], result["status"],
+            result["time"] * 1000, versions, result["error"] or ""))
+
+    failed = sum(1 for result in results if result["status"] != "ok")
+    print("Scanned {} files in {:.3f} seconds, {} failed".format(len(results), elapsed, failed))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,292 @@
+# Copyright (C) 2024-2026  Lucas Pottier
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#-----------------------------------------------------------------------------
+# Mad Tracks Blender Add-on, based on Re-Volt Blender Add-on.
+#-----------------------------------------------------------------------------
+
+"""
+Name:    synth
+Purpose: Generates synthetic Mad Tracks data for benchmarks
+
+Description:
+Writes a small data directory with the same layout as an extracted data.zip:
+LDO files with random geometry, materials and dummies, descriptors, a level
+.ini/.dam pair with LDO instances and trackpart sequences, its world file and
+the matching LDL lightmap. The output only depends on the seed and the options.
+Textures are written as small placeholder DDS images so that imports find them.
+
+Usage:
+    python -m io_madtracks.synth [--seed S] [options] data_dir
+
+"""
+
+import argparse
+import os
+import random
+import struct
+
+import numpy as np
+
+from . import madstructs
+from . import madini
+
+from .core import *
+from .madstructs import MAT_FLAG_RGBA, MAT_FLAG_UNKNOWN, MAT_FLAG_DIFFUSE, MAT_FLAG_BRIGHTNESS, MAT_FLAG_ENVMAP
+
+# vertex attributes layouts, as (va_cnt, va), giving vertex strides of 32, 40 and 48 bytes
+VA_LAYOUTS = [
+    (3, (0x00, 0x01, 0x07, 0x08)),
+    (4, (0x00, 0x01, 0x07, 0x08)),
+    (4, (0x00, 0x01, 0x0b, 0x0c)),
+]
+
+# world the synthetic level takes place in, and its file
+SYNTH_WORLD = WORLD_DEV_LABO
+SYNTH_WORLD_FILENAME = world_filenames[SYNTH_WORLD]
+
+SYNTH_LEVEL = "synth"
+SYNTH_WORLD_MESH = "synth_world"
+SYNTH_TRACKPART = "synth_track"
+SYNTH_PROP = "synth_prop"
+
+# diffuse and envmap textures the materials pick from
+SYNTH_TEXTURE_CNT = 16
+SYNTH_ENVMAP_CNT = 4
+
+
+def synth_material(rnd, index):
+    material = madstructs.Material()
+    material.name = "synth_mat{}".format(index)
+    material.name_len = len(material.name)
+    material.flags = rnd.choice([
+        MAT_FLAG_DIFFUSE,
+        MAT_FLAG_DIFFUSE | MAT_FLAG_BRIGHTNESS,
+        MAT_FLAG_RGBA,
+        MAT_FLAG_RGBA | MAT_FLAG_DIFFUSE,
+        MAT_FLAG_RGBA | MAT_FLAG_UNKNOWN | MAT_FLAG_DIFFUSE | MAT_FLAG_BRIGHTNESS | MAT_FLAG_ENVMAP,
+    ])
+    if (bool(material.flags & MAT_FLAG_RGBA)):
+        material.RGBA = tuple(rnd.randrange(256) for _ in range(4))
+    if (bool(material.flags & MAT_FLAG_DIFFUSE)):
+        material.diffuse_name = "synth_tex{}".format(rnd.randrange(SYNTH_TEXTURE_CNT))
+        material.diffuse_name_len = len(material.diffuse_name)
+    if (bool(material.flags & MAT_FLAG_BRIGHTNESS)):
+        material.brightness = rnd.uniform(-1, 1)
+    if (bool(material.flags & MAT_FLAG_ENVMAP)):
+        material.envmap_name = "synth_env{}".format(rnd.randrange(SYNTH_ENVMAP_CNT))
+        material.envmap_name_len = len(material.envmap_name)
+    return material
+
+
+def synth_mesh(rnd, rs, vertex_cnt, material_cnt, va_layouts):
+    mesh = madstructs.Mesh()
+    mesh.va_cnt, mesh.va = rnd.choice(va_layouts)
+    mesh.vertex_cnt = vertex_cnt
+
+    # vertices
+    mesh.positions = rs.uniform(-50, 50, (vertex_cnt, 3)).astype(np.float32)
+    normals = rs.normal(size=(vertex_cnt, 3))
+    normals /= np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-6)
+    mesh.normals = normals.astype(np.float32)
+    mesh.uvs = rs.uniform(0, 1, (vertex_cnt, 2)).astype(np.float32)
+    if mesh.stride > 32:
+        mesh.vertex_extra = rs.randint(0, 256, (vertex_cnt, mesh.stride - 32)).astype(np.uint8)
+
+    # tris with 3 distinct vertices, in one sequence per material
+    tri_cnt = vertex_cnt * 2
+    first = rs.randint(0, vertex_cnt, tri_cnt)
+    step1 = rs.randint(1, vertex_cnt, tri_cnt)
+    step2 = rs.randint(1, vertex_cnt - 1, tri_cnt)
+    step2 += step2 >= step1
+    mesh.tri_indices = np.stack((first, (first + step1) % vertex_cnt, (first + step2) % vertex_cnt), axis=1).astype(np.int16)
+    mesh.tri_cnt = tri_cnt
+    bounds = np.sort(rs.randint(0, tri_cnt + 1, material_cnt - 1))
+    mesh.tri_seq_len = np.diff(np.concatenate(([0], bounds, [tri_cnt]))).astype(np.int32)
+    mesh.tri_seq_mat = np.arange(material_cnt, dtype=np.int32)
+    mesh.tri_seq_cnt = material_cnt
+    return mesh
+
+
+def synth_dummy(rnd):
+    dummy = madstructs.Dummy()
+    dummy.flags = rnd.choice([DUMMY_FLAG_POS, DUMMY_FLAG_POSROT])
+    dummy.flags |= rnd.choice([0, DUMMY_TYPE_WORLD, DUMMY_TYPE_NUM, DUMMY_TYPE_OUT, DUMMY_TYPE_ROOF, DUMMY_TYPE_BONUS])
+    dummy.position = madstructs.Vector(data=[rnd.uniform(-50, 50) for _ in range(3)])
+    if (bool(dummy.flags & DUMMY_FLAG_POSROT)):
+        dummy.rotmat = [madstructs.Vector(data=row) for row in ((1, 0, 0), (0, 1, 0), (0, 0, 1))]
+    dummy.index = rnd.randrange(16)
+    return dummy
+
+
+def synth_ldo(rnd, rs, atomic_cnt=1, mesh_cnt=3, material_cnt=4, vertex_cnt=500, va_layouts=VA_LAYOUTS):
+    """
+    Returns a random LDO. The counts are maximums, each atomic and mesh draws its own.
+    """
+    ldo = madstructs.LDO()
+    ldo.atomic_cnt = atomic_cnt
+    for ai in range(atomic_cnt):
+        atomic = madstructs.Atomic()
+        atomic.name = "synth_atomic{}".format(ai)
+        atomic.material_cnt = rnd.randint(1, material_cnt)
+        atomic.materials = [synth_material(rnd, mi) for mi in range(atomic.material_cnt)]
+        atomic.mesh_cnt = rnd.randint(1, mesh_cnt)
+        for _ in range(atomic.mesh_cnt):
+            mesh_vertex_cnt = rnd.randint(max(3, vertex_cnt // 2), max(3, min(vertex_cnt, madstructs.MESH_MAX_VERTICES)))
+            atomic.meshes.append(synth_mesh(rnd, rs, mesh_vertex_cnt, atomic.material_cnt, va_layouts))
+        atomic.dummy_cnt = rnd.randint(0, 2)
+        atomic.dummies = [synth_dummy(rnd) for _ in range(atomic.dummy_cnt)]
+        ldo.atomics.append(atomic)
+    return ldo
+
+
+def synth_lightmap(rs, ldo):
+    """
+    Returns random lightmap UVs for a LDO, with its meshes in the LDL order.
+    """
+    uvs = [rs.uniform(0, 1, (mesh.vertex_cnt, 2)) for atomic in ldo.atomics for mesh in atomic.meshes]
+    return madstructs.to_lightmap_order(ldo, uvs)
+
+
+def write_ldo(data_dir, name, ldo):
+    with open(os.path.join(data_dir, LDO_PATH, name + ".ldo"), 'wb') as file:
+        ldo.write(file)
+
+
+def write_dds(filepath, color, size=4):
+    """
+    Writes a plain uncompressed 32-bit DDS image of one color.
+    """
+    header = struct.pack("<4s7I44x9I16x", b"DDS ", 124, 0x100f, size, size, size * 4, 0, 0,
+                         32, 0x41, 0, 32, 0x00ff0000, 0x0000ff00, 0x000000ff, 0xff000000, 0x1000)
+    with open(filepath, 'wb') as file:
+        file.write(header + bytes(color) * (size * size))
+
+
+def write_text(filepath, text):
+    with open(filepath, 'w', encoding="ISO-8859-1") as file:
+        file.write(text)
+
+
+def instance_section(filename, position=None, angle=None):
+    """
+    Returns a level .ini section, placed if *position* is given.
+    """
+    if position is None:
+        return madini.level_section(filename)
+    return madini.level_section(filename, position, [np.cos(angle), 0., np.sin(angle)], [0., 1., 0.])
+
+
+def generate(data_dir, seed=0, ldo_cnt=8, atomic_cnt=1, mesh_cnt=3, material_cnt=4, vertex_cnt=500,
+             va_layouts=VA_LAYOUTS, instance_cnt=50, trackpart_cnt=2, chain_len=5, bit_depth=16):
+    """
+    Writes a synthetic data directory. Returns the paths of the level .ini and .ldl files.
+    """
+    rnd = random.Random(seed)
+    rs = np.random.RandomState(rnd.randrange(2 ** 32))
+    for path in (LDO_PATH, TEXTURE_PATH, HUD_PATH, DESCRIPTOR_PATH, LEVEL_PATH, WORLD_PATH, LDL_PATH):
+        os.makedirs(os.path.join(data_dir, path), exist_ok=True)
+
+    # placeholder textures, BGRA, and the lightmap image
+    for i in range(SYNTH_TEXTURE_CNT):
+        write_dds(os.path.join(data_dir, TEXTURE_PATH, "synth_tex{}.dds".format(i)), (16 * i, 128, 255 - 16 * i, 255))
+    for i in range(SYNTH_ENVMAP_CNT):
+        write_dds(os.path.join(data_dir, TEXTURE_PATH, "synth_env{}.dds".format(i)), (255, 64 * i, 64 * i, 255))
+    write_dds(os.path.join(data_dir, LDL_PATH, SYNTH_LEVEL + "_lgt0000.dds"), (200, 200, 200, 255))
+
+    def new_ldo():
+        return synth_ldo(rnd, rs, atomic_cnt, mesh_cnt, material_cnt, vertex_cnt, va_layouts)
+
+    # LDOs
+    ldos = {}
+    for name in [SYNTH_WORLD_MESH, SYNTH_TRACKPART, SYNTH_PROP] + ["synth_ldo{}".format(i) for i in range(ldo_cnt)]:
+        ldos[name] = new_ldo()
+        write_ldo(data_dir, name, ldos[name])
+
+    # descriptors
+    write_text(os.path.join(data_dir, DESCRIPTOR_PATH, SYNTH_TRACKPART + ".ini"),
+               "[Object]\nFilename = \"geometry/{}.ldo\"\nObjectType = \"trackpart\"\n".format(SYNTH_TRACKPART))
+    write_text(os.path.join(data_dir, DESCRIPTOR_PATH, SYNTH_PROP + ".ini"),
+               "[Object]\nFilename = \"geometry/{}.ldo\"\n".format(SYNTH_PROP))
+
+    # world
+    write_text(os.path.join(data_dir, WORLD_PATH, SYNTH_WORLD_FILENAME),
+               "[Base]\nSkyColor = 120,160,220\nMesh = \"geometry/{}.ldo\"\n".format(SYNTH_WORLD_MESH))
+
+    # level, its LDL instances follow the level order, world mesh first
+    sections = []
+    lightmap = [("geometry/{}.ldo".format(SYNTH_WORLD_MESH), synth_lightmap(rs, ldos[SYNTH_WORLD_MESH]))]
+    for _ in range(instance_cnt):
+        position = [rnd.uniform(-500, 500), 0, rnd.uniform(-500, 500)]
+        if rnd.random() < 0.2:
+            filename = SYNTH_PROP + ".ini"
+            ldo_name = SYNTH_PROP
+        else:
+            ldo_name = "synth_ldo{}".format(rnd.randrange(ldo_cnt)) if ldo_cnt else SYNTH_PROP
+            filename = "geometry/{}.ldo".format(ldo_name)
+        sections.append(instance_section(filename, position, rnd.uniform(0, 2 * np.pi)))
+        lightmap.append(("geometry/{}.ldo".format(ldo_name), synth_lightmap(rs, ldos[ldo_name])))
+    for _ in range(trackpart_cnt):
+        # trackpart sequences only place their first trackpart
+        position = [rnd.uniform(-500, 500), 0, rnd.uniform(-500, 500)]
+        for ti in range(chain_len):
+            if ti == 0:
+                sections.append(instance_section(SYNTH_TRACKPART + ".ini", position, rnd.uniform(0, 2 * np.pi)))
+            else:
+                sections.append(instance_section(SYNTH_TRACKPART + ".ini"))
+            lightmap.append(("geometry/{}.ldo".format(SYNTH_TRACKPART), synth_lightmap(rs, ldos[SYNTH_TRACKPART])))
+
+    level_filepath = os.path.join(data_dir, LEVEL_PATH, SYNTH_LEVEL + ".ini")
+    level = madini.INI()
+    level.sections = sections
+    with open(level_filepath, 'w', encoding="ISO-8859-1") as file:
+        level.write(file)
+    write_text(os.path.join(data_dir, LEVEL_PATH, SYNTH_LEVEL + ".dam"), "[Base]\nWorld = {}\n".format(SYNTH_WORLD))
+
+    ldl_filepath = os.path.join(data_dir, LDL_PATH, SYNTH_LEVEL + ".ldl")
+    with open(ldl_filepath, 'wb') as file:
+        ldl = madstructs.LDL(file)
+        ldl.bit_depth = bit_depth
+        ldl.write(lightmap)
+
+    return level_filepath, ldl_filepath
+
+
+def parse_va_layouts(text):
+    """
+    Parses "va_cnt:va0,va1,va2,va3;..." into VA_LAYOUTS entries.
+    """
+    layouts = []
+    for layout in text.split(";"):
+        va_cnt, va = layout.split(":")
+        layouts.append((int(va_cnt), tuple(int(v, 0) for v in va.split(","))))
+    return layouts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="io_madtracks.synth", description="Generate a synthetic Mad Tracks data directory")
+    parser.add_argument("data_dir", help="output directory")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ldos", type=int, default=8, help="number of level LDOs")
+    parser.add_argument("--atomics", type=int, default=1, help="atomics per LDO")
+    parser.add_argument("--meshes", type=int, default=3, help="maximum meshes per atomic")
+    parser.add_argument("--materials", type=int, default=4, help="maximum materials per atomic")
+    parser.add_argument("--vertices", type=int, default=500, help="maximum vertices per mesh")
+    parser.add_argument("--va", type=parse_va_layouts, default=VA_LAYOUTS,
+                        help="vertex attributes layouts to pick from, e.g. \"4:0,1,7,8;4:0,1,11,12\"")
+    parser.add_argument("--instances", type=int, default=50, help="number of placed level instances")
+    parser.add_argument("--trackparts", type=int, default=2, help="number of trackpart sequences")
+    parser.add_argument("--chain-length", type=int, default=5, help="trackparts per sequence")
+    parser.add_argument("--bit-depth", type=int, choices=(16, 32), default=16, help="lightmap UV precision")
+    args = parser.parse_args(argv)
+
+    level_filepath, ldl_filepath = generate(
+        args.data_dir, args.seed, args.ldos, args.atomics, args.meshes, args.materials, args.vertices,
+        args.va, args.instances, args.trackparts, args.chain_length, args.bit_depth)
+    print("Generated {} and {}".format(level_filepath, ldl_filepath))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
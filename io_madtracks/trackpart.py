@@ -114,7 +114,8 @@ def add_user(scene, descriptor):
         set_error('adding trackpart', "Please select one object at most")
         return
     # don't reuse already imported since it could be a custom modified version
-    descriptor_in.import_file(filepath, scene)
+    if not descriptor_in.import_file(filepath, scene):
+        return
     obj = bpy.context.active_object
     # call method shared with level importer
     add(scene, obj, prev)
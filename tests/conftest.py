@@ -0,0 +1,76 @@
+# Copyright (C) 2024-2026  Lucas Pottier
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#-----------------------------------------------------------------------------
+# Mad Tracks Blender Add-on, based on Re-Volt Blender Add-on.
+#-----------------------------------------------------------------------------
+
+"""
+Name:    conftest
+Purpose: Shared fixtures of the format library tests
+
+Description:
+The tests run outside of Blender on a small synthetic data directory
+written once per session by the synth module. The tests of the importers
+and exporters run the add-on on the fake bpy modules of fakebpy.
+
+"""
+
+import glob
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from io_madtracks import core
+from io_madtracks import synth
+
+
+@pytest.fixture(scope="session")
+def data_dir(tmp_path_factory):
+    """
+    Synthetic data directory with several atomics per LDO.
+    """
+    data_dir = str(tmp_path_factory.mktemp("synth"))
+    synth.generate(data_dir, seed=3, ldo_cnt=3, atomic_cnt=2, mesh_cnt=3, vertex_cnt=120, instance_cnt=12)
+    return data_dir
+
+
+@pytest.fixture(scope="session")
+def ldo_filepaths(data_dir):
+    return sorted(glob.glob(os.path.join(data_dir, core.LDO_PATH, "*.ldo")))
+
+
+@pytest.fixture(autouse=True)
+def clear_errors():
+    core.get_errors()
+    yield
+    core.get_errors()
+
+
+@pytest.fixture(scope="session")
+def addon():
+    """
+    The add-on loaded on the fake bpy modules.
+    """
+    import fakebpy
+    return fakebpy.load_addon()
+
+
+@pytest.fixture
+def scene(addon, data_dir):
+    """
+    Scene of an empty blend file, set up to read the synthetic data directory.
+    """
+    import fakebpy
+    from io_madtracks import img_in
+    from io_madtracks import ldo_in
+    fakebpy.reset()
+    img_in.clear_registry()
+    ldo_in.clear_registry()
+    scene = sys.modules["bpy"].context.scene
+    scene.madtracks.settings_madtracks_dir = os.path.join(data_dir, "")
+    return scene
@@ -0,0 +1,1278 @@
+# Copyright (C) 2024-2026  Lucas Pottier
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#-----------------------------------------------------------------------------
+# Mad Tracks Blender Add-on, based on Re-Volt Blender Add-on.
+#-----------------------------------------------------------------------------
+
+"""
+Name:    fakebpy
+Purpose: Stands in for Blender to run the importers and exporters headlessly
+
+Description:
+Provides lightweight bpy and mathutils modules implementing the subset
+of the Blender 2.79 API the add-on uses: data-blocks (objects, meshes,
+materials, textures, images, groups, lamps, worlds), the scene and context,
+the operators called by the importers, and mesh data with foreach_get/foreach_set.
+Data-block creations and operator calls are counted, so a whole level import
+and export can be run under cProfile outside of Blender.
+Nothing is drawn or evaluated beyond what the add-on reads back: vertex normals
+are area weighted and item attributes are returned as copies.
+
+Usage:
+    python tests/fakebpy.py [--lightmap] [--export FILE] [--profile FILE]
+                            [--sort KEY] [--top N] data_dir file
+
+"""
+
+import argparse
+import cProfile
+import importlib
+import math
+import os
+import pstats
+import re
+import sys
+import types
+
+from collections import Counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from io_madtracks.core import *
+
+# state of the installed fake, reset by reset()
+_data = None
+_context = None
+_ops_calls = Counter()
+
+
+"""
+mathutils
+"""
+
+class Vector:
+    __slots__ = ("_data",)
+
+    def __init__(self, seq=(0.0, 0.0, 0.0)):
+        self._data = [float(value) for value in seq]
+
+    def __repr__(self):
+        return "Vector({})".format(tuple(self._data))
+
+    def __len__(self):
+        return len(self._data)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self._data[index])
+        return self._data[index]
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            values = [float(v) for v in value]
+            if len(values) != len(self._data[index]):
+                raise ValueError("Vector[a:b] = []: size mismatch in slice assignment")
+            self._data[index] = values
+        else:
+            self._data[index] = float(value)
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __eq__(self, other):
+        try:
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+    __hash__ = None
+
+    def __neg__(self):
+        return Vector(-v for v in self._data)
+
+    def __add__(self, other):
+        return Vector(a + b for a, b in zip(self._data, other))
+
+    def __sub__(self, other):
+        return Vector(a - b for a, b in zip(self._data, other))
+
+    def __mul__(self, other):
+        if isinstance(other, (int, float)):
+            return Vector(v * other for v in self._data)
+        # dot product, like mathutils in Blender 2.79
+        return sum(a * b for a, b in zip(self._data, other))
+
+    def __rmul__(self, other):
+        return self.__mul__(other)
+
+    def __truediv__(self, other):
+        return Vector(v / other for v in self._data)
+
+    x = property(lambda self: self._data[0], lambda self, value: self.__setitem__(0, value))
+    y = property(lambda self: self._data[1], lambda self, value: self.__setitem__(1, value))
+    z = property(lambda self: self._data[2], lambda self, value: self.__setitem__(2, value))
+
+    @property
+    def length(self):
+        return math.sqrt(sum(v * v for v in self._data))
+
+    def dot(self, other):
+        return sum(a * b for a, b in zip(self._data, other))
+
+    def cross(self, other):
+        return Vector(np.cross(self._data, list(other)))
+
+    def normalized(self):
+        length = self.length
+        return Vector(v / length for v in self._data) if length else self.copy()
+
+    def copy(self):
+        return Vector(self._data)
+
+    def to_tuple(self):
+        return tuple(self._data)
+
+
+def _euler_to_array(angles):
+    """ Rotation matrix of XYZ euler angles, Rz * Ry * Rx """
+    x, y, z = angles
+    cx, sx = math.cos(x), math.sin(x)
+    cy, sy = math.cos(y), math.sin(y)
+    cz, sz = math.cos(z), math.sin(z)
+    return np.array((
+        (cy * cz, sx * sy * cz - cx * sz, cx * sy * cz + sx * sz),
+        (cy * sz, sx * sy * sz + cx * cz, cx * sy * sz - sx * cz),
+        (-sy, sx * cy, cx * cy),
+    ))
+
+
+def _array_to_euler(mat):
+    """ XYZ euler angles of a rotation matrix, picking the smallest solution like Blender """
+    mat = np.asarray(mat, dtype=np.float64)[:3, :3]
+    norms = np.linalg.norm(mat, axis=0)
+    mat = mat / np.where(norms == 0, 1, norms)
+    cy = math.hypot(mat[0][0], mat[1][0])
+    if cy > 16 * np.finfo(np.float32).eps:
+        euler1 = (math.atan2(mat[2][1], mat[2][2]), math.atan2(-mat[2][0], cy), math.atan2(mat[1][0], mat[0][0]))
+        euler2 = (math.atan2(-mat[2][1], -mat[2][2]), math.atan2(-mat[2][0], -cy), math.atan2(-mat[1][0], -mat[0][0]))
+        if sum(abs(a) for a in euler1) > sum(abs(a) for a in euler2):
+            return euler2
+        return euler1
+    return (math.atan2(-mat[1][2], mat[1][1]), math.atan2(-mat[2][0], cy), 0.0)
+
+
+class Matrix:
+    __slots__ = ("_rows",)
+
+    def __init__(self, rows=None):
+        if rows is None:
+            rows = np.identity(4)
+        self._rows = [Vector(row) for row in rows]
+
+    def __repr__(self):
+        return "Matrix({})".format(tuple(row.to_tuple() for row in self._rows))
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, index):
+        return self._rows[index]
+
+    def __setitem__(self, index, value):
+        self._rows[index] = Vector(value)
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def _array(self):
+        return np.array([list(row) for row in self._rows], dtype=np.float64)
+
+    @classmethod
+    def Identity(cls, size):
+        return cls(np.identity(size))
+
+    @classmethod
+    def Translation(cls, vector):
+        mat = np.identity(4)
+        mat[:3, 3] = list(vector)[:3]
+        return cls(mat)
+
+    def __mul__(self, other):
+        # matrix multiplication, like mathutils in Blender 2.79
+        if isinstance(other, Matrix):
+            return Matrix(self._array().dot(other._array()))
+        vec = np.array(list(other), dtype=np.float64)
+        mat = self._array()
+        if len(vec) == 3 and len(mat) == 4:
+            return Vector((mat[:3, :3].dot(vec) + mat[:3, 3]))
+        return Vector(mat.dot(vec))
+
+    def copy(self):
+        return Matrix(self._rows)
+
+    def transposed(self):
+        return Matrix(self._array().T)
+
+    def inverted(self):
+        return Matrix(np.linalg.inv(self._array()))
+
+    def to_3x3(self):
+        return Matrix(self._array()[:3, :3])
+
+    def to_4x4(self):
+        mat = np.identity(4)
+        arr = self._array()
+        mat[:len(arr), :len(arr)] = arr
+        return Matrix(mat)
+
+    def to_translation(self):
+        return Vector(self._array()[:3, 3])
+
+    def to_euler(self, order='XYZ'):
+        return Euler(_array_to_euler(self._array()), order)
+
+
+class Euler:
+    __slots__ = ("_data", "order")
+
+    def __init__(self, angles=(0.0, 0.0, 0.0), order='XYZ'):
+        self._data = [float(angle) for angle in angles]
+        self.order = order
+
+    def __repr__(self):
+        return "Euler({}, '{}')".format(tuple(self._data), self.order)
+
+    def __len__(self):
+        return 3
+
+    def __getitem__(self, index):
+        return self._data[index]
+
+    def __setitem__(self, index, value):
+        self._data[index] = float(value)
+
+    def __iter__(self):
+        return iter(self._data)
+
+    x = property(lambda self: self._data[0], lambda self, value: self.__setitem__(0, value))
+    y = property(lambda self: self._data[1], lambda self, value: self.__setitem__(1, value))
+    z = property(lambda self: self._data[2], lambda self, value: self.__setitem__(2, value))
+
+    def copy(self):
+        return Euler(self._data, self.order)
+
+    def to_matrix(self):
+        return Matrix(_euler_to_array(self._data))
+
+    def rotate_axis(self, axis, angle):
+        """ Rotates around a local axis """
+        angles = [0.0, 0.0, 0.0]
+        angles["XYZ".index(axis)] = angle
+        mat = _euler_to_array(self._data).dot(_euler_to_array(angles))
+        self._data = list(_array_to_euler(mat))
+
+
+"""
+bpy.props
+"""
+
+class _Property:
+    __slots__ = ("default", "options")
+
+    def __init__(self, default, options):
+        self.default = default
+        self.options = options
+
+
+def _property_type(default):
+    def make(**options):
+        return _Property(options.get("default", default), options)
+    return make
+
+
+def FloatVectorProperty(**options):
+    return _Property(tuple(options.get("default", (0.0,) * options.get("size", 3))), options)
+
+
+def EnumProperty(**options):
+    default = options.get("default")
+    items = options.get("items")
+    if default is None and items and not callable(items):
+        default = items[0][0]
+    return _Property(default, options)
+
+
+class PointerProperty:
+    """
+    Pointer to a property group, created with its defaults on first access.
+    """
+    def __init__(self, type, **options):
+        self.type = type
+        self.key = "_pointer_{}".format(id(self))
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = instance.__dict__.get(self.key)
+        if value is None:
+            value = self.type()
+            instance.__dict__[self.key] = value
+        return value
+
+
+class PropertyGroup:
+    def __init__(self):
+        for cls in reversed(type(self).__mro__):
+            for name, value in vars(cls).items():
+                if isinstance(value, _Property):
+                    setattr(self, name, value.default)
+
+    def copy(self):
+        group = type(self).__new__(type(self))
+        group.__dict__.update(self.__dict__)
+        return group
+
+
+"""
+Mesh data, stored as NumPy arrays
+"""
+
+VERTEX_FIELDS = {"co": (np.float32, 3), "normal": (np.float32, 3), "select": (np.bool_, 1), "hide": (np.bool_, 1)}
+EDGE_FIELDS = {"vertices": (np.int32, 2), "use_edge_sharp": (np.bool_, 1)}
+LOOP_FIELDS = {"vertex_index": (np.int32, 1), "edge_index": (np.int32, 1), "normal": (np.float32, 3)}
+POLYGON_FIELDS = {"loop_start": (np.int32, 1), "loop_total": (np.int32, 1), "material_index": (np.int16, 1),
+                  "use_smooth": (np.bool_, 1), "select": (np.bool_, 1), "hide": (np.bool_, 1)}
+UV_FIELDS = {"uv": (np.float32, 2)}
+TEXPOLY_FIELDS = {"image": (object, 1)}
+
+
+class ArrayCollection:
+    """
+    Collection of mesh elements whose attributes are stored in one array each.
+    Collections in *dependents* are resized along with it, like custom data layers.
+    """
+    def __init__(self, fields, size=0):
+        self.fields = fields
+        self.arrays = {}
+        self.size = 0
+        self.dependents = []
+        for name, (dtype, width) in fields.items():
+            self.arrays[name] = self._empty(dtype, width, 0)
+        self.resize(size)
+
+    @staticmethod
+    def _empty(dtype, width, size):
+        shape = (size,) if width == 1 else (size, width)
+        if dtype is object:
+            return np.full(shape, None, dtype=object)
+        return np.zeros(shape, dtype=dtype)
+
+    def resize(self, size):
+        for name, (dtype, width) in self.fields.items():
+            array = self._empty(dtype, width, size)
+            keep = min(size, self.size)
+            array[:keep] = self.arrays[name][:keep]
+            self.arrays[name] = array
+        self.size = size
+        for dependent in self.dependents:
+            dependent.resize(size)
+
+    def __len__(self):
+        return self.size
+
+    def __bool__(self):
+        return self.size > 0
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("bpy_prop_collection[index]: index {} out of range, size {}".format(index, self.size))
+        return ArrayItem(self, index)
+
+    def __iter__(self):
+        for index in range(self.size):
+            yield ArrayItem(self, index)
+
+    def add(self, count):
+        self.resize(self.size + count)
+
+    def foreach_get(self, attr, seq):
+        array = self.arrays[attr].ravel()
+        if len(seq) != len(array):
+            raise RuntimeError("internal error setting the array")
+        seq[:] = array if isinstance(seq, np.ndarray) else array.tolist()
+
+    def foreach_set(self, attr, seq):
+        array = self.arrays[attr]
+        values = np.asarray(seq, dtype=array.dtype).ravel()
+        if len(values) != array.size:
+            raise RuntimeError("internal error setting the array")
+        self.arrays[attr] = values.reshape(array.shape).copy()
+
+
+class ArrayItem:
+    """
+    One element of an ArrayCollection. Vector attributes are returned as copies.
+    """
+    __slots__ = ("collection", "index")
+
+    def __init__(self, collection, index):
+        object.__setattr__(self, "collection", collection)
+        object.__setattr__(self, "index", index)
+
+    def __getattr__(self, name):
+        collection = object.__getattribute__(self, "collection")
+        index = object.__getattribute__(self, "index")
+        derived = getattr(collection, "item_" + name, None)
+        if derived is not None:
+            return derived(index)
+        if name not in collection.arrays:
+            raise AttributeError(name)
+        value = collection.arrays[name][index]
+        if isinstance(value, np.ndarray):
+            return Vector(value)
+        return value.item() if isinstance(value, np.generic) else value
+
+    def __setattr__(self, name, value):
+        if name not in self.collection.arrays:
+            raise AttributeError(name)
+        self.collection.arrays[name][self.index] = value
+
+
+class MeshPolygons(ArrayCollection):
+    def __init__(self, mesh):
+        ArrayCollection.__init__(self, POLYGON_FIELDS)
+        self.mesh = mesh
+
+    def item_vertices(self, index):
+        start = self.arrays["loop_start"][index]
+        total = self.arrays["loop_total"][index]
+        return self.mesh.loops.arrays["vertex_index"][start:start + total].tolist()
+
+
+class NamedCollection:
+    """
+    Collection of items looked up by index or name, like bpy_prop_collection.
+    """
+    def __init__(self):
+        self.items = []
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    def __iter__(self):
+        return iter(list(self.items))
+
+    def __contains__(self, name):
+        return self.find(name) >= 0
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            index = self.find(key)
+            if index < 0:
+                raise KeyError("bpy_prop_collection[key]: key \"{}\" not found".format(key))
+            return self.items[index]
+        return self.items[key]
+
+    def find(self, name):
+        for index, item in enumerate(self.items):
+            if item.name == name:
+                return index
+        return -1
+
+    def get(self, name, default=None):
+        index = self.find(name)
+        return self.items[index] if index >= 0 else default
+
+    def keys(self):
+        return [item.name for item in self.items]
+
+    def values(self):
+        return list(self.items)
+
+    def unique_name(self, name, item=None):
+        names = {other.name for other in self.items if other is not item}
+        if name not in names:
+            return name
+        base = re.sub(r"\.\d{3}$", "", name)
+        number = 1
+        while "{}.{:03d}".format(base, number) in names:
+            number += 1
+        return "{}.{:03d}".format(base, number)
+
+
+class MeshUVLoopLayer:
+    def __init__(self, name, size):
+        self.name = name
+        self.data = ArrayCollection(UV_FIELDS, size)
+
+
+class MeshTexturePolyLayer:
+    def __init__(self, name, size):
+        self.name = name
+        self.data = ArrayCollection(TEXPOLY_FIELDS, size)
+        self.active = False
+
+
+class UVLoopLayers(NamedCollection):
+    @property
+    def active(self):
+        return self.items[0] if self.items else None
+
+
+class UVTextures(NamedCollection):
+    """
+    UV textures of a mesh, each one comes with its UV loop layer.
+    """
+    def __init__(self, mesh):
+        NamedCollection.__init__(self)
+        self.mesh = mesh
+
+    @property
+    def active(self):
+        return self.items[0] if self.items else None
+
+    def new(self, name="UVMap"):
+        name = self.unique_name(name)
+        layer = MeshTexturePolyLayer(name, len(self.mesh.polygons))
+        self.mesh.polygons.dependents.append(layer.data)
+        self.items.append(layer)
+        uv_layer = MeshUVLoopLayer(name, len(self.mesh.loops))
+        self.mesh.loops.dependents.append(uv_layer.data)
+        self.mesh.uv_layers.items.append(uv_layer)
+        return layer
+
+
+"""
+Data-blocks
+"""
+
+class ID:
+    def __init__(self, name):
+        self.collection = None
+        self._name = name
+        self.use_fake_user = False
+
+    def __repr__(self):
+        return "bpy.data.{}[\"{}\"]".format(self.collection.key if self.collection else "?", self._name)
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, name):
+        if self.collection is not None:
+            name = self.collection.unique_name(name, self)
+        self._name = name
+
+
+class Scene(ID):
+    def __init__(self, name):
+        ID.__init__(self, name)
+        self.objects = SceneObjects()
+        self.cursor_location = Vector()
+
+
+class SceneObjects:
+    def __init__(self):
+        self.items = []
+        self.active = None
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(list(self.items))
+
+    def __contains__(self, obj):
+        return obj in self.items
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            for obj in self.items:
+                if obj.name == key:
+                    return obj
+            raise KeyError(key)
+        return self.items[key]
+
+    def link(self, obj):
+        if obj in self.items:
+            raise RuntimeError("Object '{}' already in scene".format(obj.name))
+        self.items.append(obj)
+
+    def unlink(self, obj):
+        self.items.remove(obj)
+        if self.active is obj:
+            self.active = None
+
+
+class World(ID):
+    def __init__(self, name):
+        ID.__init__(self, name)
+        self.horizon_color = (0.05, 0.05, 0.05)
+
+
+class Object(ID):
+    def __init__(self, name, data=None):
+        ID.__init__(self, name)
+        self.data = data
+        self._location = Vector()
+        self._rotation_euler = Euler()
+        self._scale = Vector((1.0, 1.0, 1.0))
+        self.dimensions = Vector((2.0, 2.0, 2.0))
+        self.parent = None
+        self.select = False
+        self.hide = False
+        self.draw_type = 'TEXTURED'
+        self.empty_draw_type = 'PLAIN_AXES'
+
+    @property
+    def type(self):
+        if isinstance(self.data, Mesh):
+            return 'MESH'
+        if isinstance(self.data, Lamp):
+            return 'LAMP'
+        return 'EMPTY'
+
+    location = property(lambda self: self._location,
+                        lambda self, value: setattr(self, "_location", Vector(value)))
+    scale = property(lambda self: self._scale,
+                     lambda self, value: setattr(self, "_scale", Vector(value)))
+
+    @property
+    def rotation_euler(self):
+        return self._rotation_euler
+
+    @rotation_euler.setter
+    def rotation_euler(self, value):
+        self._rotation_euler = Euler(value, getattr(value, "order", 'XYZ'))
+
+    @property
+    def matrix_basis(self):
+        mat = np.identity(4)
+        mat[:3, :3] = _euler_to_array(self._rotation_euler).dot(np.diag(list(self._scale)))
+        mat[:3, 3] = list(self._location)
+        return Matrix(mat)
+
+    @property
+    def matrix_world(self):
+        if self.parent is not None:
+            return self.parent.matrix_world * self.matrix_basis
+        return self.matrix_basis
+
+    @property
+    def users_group(self):
+        return tuple(group for group in _data.groups if self in group.objects)
+
+    def copy(self):
+        obj = Object(self._name, self.data)
+        for name, value in self.__dict__.items():
+            if name.startswith("_pointer_"):
+                value = value.copy()
+            elif isinstance(value, (Vector, Euler)):
+                value = value.copy()
+            if name not in ("collection", "_name"):
+                obj.__dict__[name] = value
+        _data.objects.link_new(obj)
+        return obj
+
+
+class MaterialList(list):
+    pass
+
+
+class Mesh(ID):
+    def __init__(self, name):
+        ID.__init__(self, name)
+        self.vertices = ArrayCollection(VERTEX_FIELDS)
+        self.edges = ArrayCollection(EDGE_FIELDS)
+        self.loops = ArrayCollection(LOOP_FIELDS)
+        self.polygons = MeshPolygons(self)
+        self.uv_layers = UVLoopLayers()
+        self.uv_textures = UVTextures(self)
+        self.materials = MaterialList()
+        self.use_auto_smooth = False
+        self.auto_smooth_angle = math.radians(30)
+        self.has_custom_normals = False
+
+    def tris(self):
+        """ Loop indices of the triangle fan of every polygon """
+        loop_start = self.polygons.arrays["loop_start"].astype(np.int64)
+        tri_cnts = np.maximum(self.polygons.arrays["loop_total"].astype(np.int64) - 2, 0)
+        poly = np.repeat(np.arange(len(self.polygons)), tri_cnts)
+        corner = np.arange(len(poly)) - np.repeat(np.cumsum(tri_cnts) - tri_cnts, tri_cnts) + 1
+        first = loop_start[poly]
+        return np.stack((first, first + corner, first + corner + 1), axis=1), poly
+
+    def calc_normals(self):
+        """ Area weighted vertex normals from the polygons """
+        tri_loops, _ = self.tris()
+        co = self.vertices.arrays["co"].astype(np.float64)
+        tris = self.loops.arrays["vertex_index"][tri_loops]
+        face_normals = np.cross(co[tris[:, 1]] - co[tris[:, 0]], co[tris[:, 2]] - co[tris[:, 0]])
+        normals = np.zeros_like(co)
+        for corner in range(3):
+            np.add.at(normals, tris[:, corner], face_normals)
+        lengths = np.linalg.norm(normals, axis=1)
+        normals[lengths > 0] /= lengths[lengths > 0, None]
+        self.vertices.arrays["normal"] = normals.astype(np.float32)
+
+    def calc_edges(self):
+        loop_start = self.polygons.arrays["loop_start"]
+        loop_total = self.polygons.arrays["loop_total"]
+        vertex_index = self.loops.arrays["vertex_index"]
+        # each loop goes to the next loop of its polygon
+        poly = np.repeat(np.arange(len(self.polygons)), loop_total)
+        next_loop = np.arange(len(self.loops)) + 1
+        last = loop_start + loop_total - 1
+        next_loop[last] = loop_start
+        pairs = np.sort(np.stack((vertex_index[np.arange(len(poly))], vertex_index[next_loop[:len(poly)]]), axis=1), axis=1)
+        edges, inverse = np.unique(pairs, axis=0, return_inverse=True) if len(pairs) else (pairs, pairs[:, 0])
+        self.edges.resize(len(edges))
+        self.edges.arrays["vertices"] = edges.astype(np.int32).reshape(-1, 2)
+        self.loops.arrays["edge_index"][:len(poly)] = np.asarray(inverse).ravel()
+
+    def update(self, calc_edges=False, calc_tessface=False):
+        if calc_edges or (len(self.polygons) and not len(self.edges)):
+            self.calc_edges()
+        self.calc_normals()
+
+    def validate(self, verbose=False, clean_customdata=True):
+        """ Returns True if invalid geometry was found, it isn't fixed """
+        vertex_index = self.loops.arrays["vertex_index"]
+        if len(vertex_index) and (vertex_index.min() < 0 or vertex_index.max() >= len(self.vertices)):
+            return True
+        return bool((self.polygons.arrays["loop_total"] < 3).any())
+
+    def calc_normals_split(self):
+        tri_loops, _ = self.tris()
+        if not self.has_custom_normals:
+            self.loops.arrays["normal"] = self.vertices.arrays["normal"][self.loops.arrays["vertex_index"]]
+
+    def free_normals_split(self):
+        pass
+
+    def normals_split_custom_set_from_vertices(self, normals):
+        normals = np.asarray(normals, dtype=np.float32).reshape(-1, 3)
+        if len(normals) != len(self.vertices):
+            raise RuntimeError("number of custom normals is not number of vertices")
+        self.loops.arrays["normal"] = normals[self.loops.arrays["vertex_index"]]
+        self.has_custom_normals = True
+
+    def normals_split_custom_set(self, normals):
+        normals = np.asarray(normals, dtype=np.float32).reshape(-1, 3)
+        if len(normals) != len(self.loops):
+            raise RuntimeError("number of custom normals is not number of loops")
+        self.loops.arrays["normal"] = normals
+        self.has_custom_normals = True
+
+    def transform(self, matrix):
+        mat = matrix._array() if isinstance(matrix, Matrix) else np.asarray(matrix)
+        co = self.vertices.arrays["co"].astype(np.float64)
+        self.vertices.arrays["co"] = (co.dot(mat[:3, :3].T) + mat[:3, 3]).astype(np.float32)
+        self.calc_normals()
+        if self.has_custom_normals:
+            # custom normals are stored relative to the geometry and follow it
+            normals = self.loops.arrays["normal"].astype(np.float64).dot(np.linalg.inv(mat[:3, :3]))
+            lengths = np.linalg.norm(normals, axis=1)
+            normals[lengths > 0] /= lengths[lengths > 0, None]
+            self.loops.arrays["normal"] = normals.astype(np.float32)
+
+
+class TextureSlot:
+    def __init__(self):
+        self.texture = None
+        self.blend_type = 'MIX'
+        self.diffuse_color_factor = 1.0
+        self.uv_layer = ""
+        self.scale = Vector((1.0, 1.0, 1.0))
+        self.texture_coords = 'UV'
+        self.use_map_color_diffuse = True
+
+
+class TextureSlots:
+    def __init__(self):
+        self.slots = []
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __getitem__(self, index):
+        return self.slots[index]
+
+    def __iter__(self):
+        return iter(self.slots)
+
+    def add(self):
+        slot = TextureSlot()
+        self.slots.append(slot)
+        return slot
+
+
+class Material(ID):
+    def __init__(self, name):
+        ID.__init__(self, name)
+        self.diffuse_color = (0.8, 0.8, 0.8)
+        self.diffuse_intensity = 0.8
+        self.specular_intensity = 0.5
+        self.use_transparency = False
+        self.alpha = 1.0
+        self.texture_slots = TextureSlots()
+
+
+class Texture(ID):
+    def __init__(self, name, type='IMAGE'):
+        ID.__init__(self, name)
+        self.type = type
+        self.image = None
+
+
+class Image(ID):
+    def __init__(self, name, filepath=""):
+        ID.__init__(self, name)
+        self.filepath = filepath
+        self.size = (0, 0)
+
+
+class Lamp(ID):
+    def __init__(self, name, type='POINT'):
+        ID.__init__(self, name)
+        self.type = type
+        self.energy = 1.0
+
+
+class GroupObjects(SceneObjects):
+    pass
+
+
+class Group(ID):
+    def __init__(self, name):
+        ID.__init__(self, name)
+        self.objects = GroupObjects()
+
+
+class IDCollection(NamedCollection):
+    """
+    bpy.data collection of one type of data-block, counting their creations.
+    """
+    def __init__(self, key, cls):
+        NamedCollection.__init__(self)
+        self.key = key
+        self.cls = cls
+
+    def link_new(self, item):
+        item.collection = None
+        item._name = self.unique_name(item._name)
+        item.collection = self
+        self.items.append(item)
+        _data.created[self.key] += 1
+        return item
+
+    def new(self, name, *args, **kwargs):
+        return self.link_new(self.cls(name, *args, **kwargs))
+
+    def remove(self, item, do_unlink=True):
+        self.items.remove(item)
+        item.collection = None
+
+
+class ObjectCollection(IDCollection):
+    def remove(self, item, do_unlink=True):
+        IDCollection.remove(self, item)
+        for scene in _data.scenes:
+            if item in scene.objects:
+                scene.objects.unlink(item)
+        for group in _data.groups:
+            if item in group.objects:
+                group.objects.unlink(item)
+
+
+class ImageCollection(IDCollection):
+    def load(self, filepath, check_existing=False):
+        if check_existing:
+            for image in self.items:
+                if image.filepath == filepath:
+                    return image
+        if not os.path.isfile(filepath):
+            raise RuntimeError("Error: Cannot read file '{}': No such file or directory".format(filepath))
+        return self.new(os.path.basename(filepath), filepath)
+
+
+class BlendData:
+    def __init__(self):
+        self.created = Counter()
+        self.objects = ObjectCollection("objects", Object)
+        self.meshes = IDCollection("meshes", Mesh)
+        self.materials = IDCollection("materials", Material)
+        self.textures = IDCollection("textures", Texture)
+        self.images = ImageCollection("images", Image)
+        self.groups = IDCollection("groups", Group)
+        self.lamps = IDCollection("lamps", Lamp)
+        self.worlds = IDCollection("worlds", World)
+        self.scenes = IDCollection("scenes", Scene)
+
+
+"""
+Context
+"""
+
+class Context:
+    def __init__(self, scene):
+        self.scene = scene
+        self.edit_object = None
+        self.space_data = types.SimpleNamespace(show_backface_culling=False)
+        self.user_preferences = types.SimpleNamespace(edit=types.SimpleNamespace(use_global_undo=True))
+        self.window_manager = types.SimpleNamespace(windows=[])
+        self.screen = types.SimpleNamespace(areas=[])
+
+    @property
+    def active_object(self):
+        return self.scene.objects.active
+
+    @property
+    def object(self):
+        return self.scene.objects.active
+
+    @property
+    def selected_objects(self):
+        return [obj for obj in self.scene.objects if obj.select]
+
+    @property
+    def mode(self):
+        return 'EDIT_MESH' if self.edit_object else 'OBJECT'
+
+
+"""
+Operators
+"""
+
+class Operator:
+    """
+    Callable operator, counted on each call.
+    """
+    def __init__(self, idname, function):
+        self.idname = idname
+        self.function = function
+
+    def __call__(self, *args, **kwargs):
+        _ops_calls[self.idname] += 1
+        if args and isinstance(args[0], str):
+            args = args[1:]  # execution context
+        self.function(**kwargs)
+        return {'FINISHED'}
+
+    def poll(self):
+        return True
+
+
+def add_object(obj, location=None):
+    """ Links a new object to the scene at the 3D cursor, as the only selected and active object """
+    scene = _context.scene
+    _data.objects.link_new(obj)
+    scene.objects.link(obj)
+    for other in scene.objects:
+        other.select = False
+    obj.select = True
+    scene.objects.active = obj
+    obj.location = location if location is not None else scene.cursor_location
+    return obj
+
+
+def primitive_mesh(name, vertices, faces):
+    mesh = _data.meshes.new(name)
+    mesh.vertices.add(len(vertices))
+    mesh.vertices.foreach_set("co", np.asarray(vertices, dtype=np.float32).ravel())
+    loop_total = [len(face) for face in faces]
+    mesh.loops.add(sum(loop_total))
+    mesh.loops.foreach_set("vertex_index", [index for face in faces for index in face])
+    mesh.polygons.add(len(faces))
+    mesh.polygons.foreach_set("loop_total", loop_total)
+    mesh.polygons.foreach_set("loop_start", np.cumsum([0] + loop_total[:-1]))
+    mesh.update(calc_edges=True)
+    return mesh
+
+
+def op_empty_add(type='PLAIN_AXES', location=None, **kwargs):
+    obj = Object("Empty")
+    obj.empty_draw_type = type
+    add_object(obj, location)
+
+
+def op_lamp_add(type='POINT', location=None, **kwargs):
+    name = type.capitalize()
+    obj = Object(name, _data.lamps.new(name, type))
+    add_object(obj, location)
+
+
+def op_select_all(action='TOGGLE', **kwargs):
+    objects = _context.scene.objects
+    if action == 'TOGGLE':
+        action = 'DESELECT' if any(obj.select for obj in objects) else 'SELECT'
+    for obj in objects:
+        if action == 'INVERT':
+            obj.select = not obj.select
+        else:
+            obj.select = action == 'SELECT'
+
+
+def op_group_link(group, **kwargs):
+    obj = _context.active_object
+    objects = _data.groups[group].objects
+    if obj is not None and obj not in objects:
+        objects.link(obj)
+
+
+def op_editmode_toggle(**kwargs):
+    _context.edit_object = None if _context.edit_object else _context.active_object
+
+
+def op_mode_set(mode='OBJECT', **kwargs):
+    _context.edit_object = _context.active_object if mode == 'EDIT' else None
+
+
+def op_transform_apply(location=False, rotation=False, scale=False, **kwargs):
+    for obj in _context.selected_objects:
+        mat = np.identity(4)
+        if rotation:
+            mat[:3, :3] = _euler_to_array(obj.rotation_euler)
+            obj.rotation_euler = (0, 0, 0)
+        if scale:
+            mat[:3, :3] = mat[:3, :3].dot(np.diag(list(obj.scale)))
+            obj.scale = (1, 1, 1)
+        if location:
+            mat[:3, 3] = list(obj.location)
+            obj.location = (0, 0, 0)
+        if isinstance(obj.data, Mesh):
+            obj.data.transform(mat)
+
+
+def op_primitive_cube_add(radius=1.0, location=None, enter_editmode=False, **kwargs):
+    vertices = np.array(((1, 1, -1), (1, -1, -1), (-1, -1, -1), (-1, 1, -1),
+                         (1, 1, 1), (1, -1, 1), (-1, -1, 1), (-1, 1, 1))) * radius
+    faces = ((0, 1, 2, 3), (4, 7, 6, 5), (0, 4, 5, 1), (1, 5, 6, 2), (2, 6, 7, 3), (4, 0, 3, 7))
+    obj = add_object(Object("Cube", primitive_mesh("Cube", vertices, faces)), location)
+    _context.edit_object = obj if enter_editmode else None
+
+
+def op_primitive_cylinder_add(vertices=32, radius=1.0, depth=2.0, location=None, enter_editmode=False, **kwargs):
+    angles = np.arange(vertices) * 2 * math.pi / vertices
+    ring = np.column_stack((-np.sin(angles) * radius, np.cos(angles) * radius, np.zeros(vertices)))
+    co = np.concatenate((ring + (0, 0, depth / 2), ring - (0, 0, depth / 2)))
+    faces = [tuple(range(vertices)), tuple(range(2 * vertices - 1, vertices - 1, -1))]
+    for i in range(vertices):
+        j = (i + 1) % vertices
+        faces.append((i, i + vertices, j + vertices, j))
+    obj = add_object(Object("Cylinder", primitive_mesh("Cylinder", co, faces)), location)
+    _context.edit_object = obj if enter_editmode else None
+
+
+def op_flip_normals(**kwargs):
+    mesh = _context.edit_object.data
+    vertex_index = mesh.loops.arrays["vertex_index"]
+    for start, total in zip(mesh.polygons.arrays["loop_start"].tolist(), mesh.polygons.arrays["loop_total"].tolist()):
+        vertex_index[start:start + total] = vertex_index[start:start + total][::-1].copy()
+    mesh.update(calc_edges=True)
+
+
+def op_uv_texture_add(**kwargs):
+    obj = _context.edit_object or _context.active_object
+    obj.data.uv_textures.new("UVMap")
+
+
+def op_image_open(filepath, **kwargs):
+    _data.images.load(filepath)
+
+
+OPERATORS = {
+    "object": {
+        "empty_add": op_empty_add,
+        "lamp_add": op_lamp_add,
+        "select_all": op_select_all,
+        "group_link": op_group_link,
+        "editmode_toggle": op_editmode_toggle,
+        "mode_set": op_mode_set,
+        "transform_apply": op_transform_apply,
+    },
+    "mesh": {
+        "primitive_cube_add": op_primitive_cube_add,
+        "primitive_cylinder_add": op_primitive_cylinder_add,
+        "flip_normals": op_flip_normals,
+        "uv_texture_add": op_uv_texture_add,
+    },
+    "image": {
+        "open": op_image_open,
+    },
+}
+
+
+"""
+Installation
+"""
+
+class Menu:
+    def __init__(self):
+        self.functions = []
+
+    def append(self, function):
+        self.functions.append(function)
+
+    def prepend(self, function):
+        self.functions.insert(0, function)
+
+    def remove(self, function):
+        self.functions.remove(function)
+
+
+def _module(name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    module.FAKE = True
+    sys.modules[name] = module
+    return module
+
+
+def reset():
+    """
+    Starts over with an empty blend file: one scene and one world.
+    """
+    global _data, _context
+    _data = BlendData()
+    scene = _data.scenes.new("Scene")
+    _data.worlds.new("World")
+    _context = Context(scene)
+    _ops_calls.clear()
+    _data.created.clear()
+    if "bpy" in sys.modules and getattr(sys.modules["bpy"], "FAKE", False):
+        sys.modules["bpy"].data = _data
+        sys.modules["bpy"].context = _context
+
+
+def counters():
+    """
+    Returns copies of the data-block creation and operator call counters.
+    """
+    return Counter(_data.created), Counter(_ops_calls)
+
+
+def install():
+    """
+    Installs the fake bpy and mathutils modules in sys.modules and resets their data.
+    Returns the bpy module.
+    """
+    bpy = sys.modules.get("bpy")
+    if bpy is not None and not getattr(bpy, "FAKE", False):
+        raise RuntimeError("the Blender bpy module is already loaded")
+
+    mathutils = _module("mathutils", Vector=Vector, Matrix=Matrix, Euler=Euler)
+
+    props = _module("bpy.props",
+                    BoolProperty=_property_type(False),
+                    IntProperty=_property_type(0),
+                    FloatProperty=_property_type(0.0),
+                    StringProperty=_property_type(""),
+                    EnumProperty=EnumProperty,
+                    FloatVectorProperty=FloatVectorProperty,
+                    PointerProperty=PointerProperty,
+                    CollectionProperty=_property_type(()))
+    bpy_types = _module("bpy.types",
+                        Operator=type("Operator", (), {}),
+                        Panel=type("Panel", (), {}),
+                        Menu=type("Menu", (), {}),
+                        Header=type("Header", (), {}),
+                        PropertyGroup=PropertyGroup,
+                        Scene=Scene, Object=Object, Mesh=Mesh, Material=Material,
+                        Texture=Texture, Image=Image, Group=Group, Lamp=Lamp, World=World,
+                        INFO_MT_file_import=Menu(), INFO_MT_file_export=Menu())
+    utils = _module("bpy.utils",
+                    register_module=lambda module, verbose=False: None,
+                    unregister_module=lambda module, verbose=False: None,
+                    register_class=lambda cls: None,
+                    unregister_class=lambda cls: None)
+    ops = _module("bpy.ops")
+    for category, operators in OPERATORS.items():
+        setattr(ops, category, types.SimpleNamespace(**{
+            name: Operator("{}.{}".format(category, name), function) for name, function in operators.items()}))
+    # operators defined by the add-on are not run
+    ops.madtracks = types.SimpleNamespace(dialog=Operator("madtracks.dialog", lambda **kwargs: None))
+    app = _module("bpy.app", version=(2, 79, 0), binary_path="", background=True)
+
+    bpy = _module("bpy", props=props, types=bpy_types, utils=utils, ops=ops, app=app)
+    bpy.mathutils = mathutils
+    reset()
+    return bpy
+
+
+def load_addon():
+    """
+    Installs the fake modules, then loads and registers the whole add-on.
+    """
+    install()
+    addon = importlib.reload(importlib.import_module("io_madtracks"))
+    addon.register()
+    return addon
+
+
+def print_counters(label, created, ops_calls):
+    print("{}: {}".format(label, ", ".join("{} {}".format(count, key) for key, count in sorted(created.items())) or "no data-blocks"))
+    for idname, count in sorted(ops_calls.items()):
+        print("    bpy.ops.{}: {} calls".format(idname, count))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="fakebpy",
+                                     description="Import (and export) a level or LDO outside of Blender under cProfile")
+    parser.add_argument("data_dir", help="extracted data.zip directory")
+    parser.add_argument("file", help="level .ini or .ldo file to import")
+    parser.add_argument("--lightmap", action="store_true", help="import the level lightmap")
+    parser.add_argument("--export", default=None, help="export the imported level to this .ini file")
+    parser.add_argument("--profile", default=None, help="save the profile stats to this file")
+    parser.add_argument("--sort", default="cumulative", help="profile sort key, cumulative by default")
+    parser.add_argument("--top", type=int, default=25, help="number of profile entries to print")
+    args = parser.parse_args(argv)
+
+    load_addon()
+    from io_madtracks import img_in
+    from io_madtracks import ldo_in
+    from io_madtracks import level_in
+    from io_madtracks import level_out
+
+    scene = _context.scene
+    props = scene.madtracks
+    props.settings_madtracks_dir = os.path.join(args.data_dir, "")
+    props.level_import_lightmap = args.lightmap
+    props.level_export_lightmap = args.lightmap
+
+    profiler = cProfile.Profile()
+    img_in.clear_registry()
+    ldo_in.clear_registry()
+    if args.file.lower().endswith(".ldo"):
+        profiler.runcall(ldo_in.import_file, args.file, scene)
+    else:
+        profiler.runcall(level_in.import_file, args.file, scene)
+    print_counters("Import", *counters())
+    if args.export:
+        created, ops_calls = counters()
+        profiler.runcall(level_out.export_file, args.export, scene)
+        after_created, after_ops_calls = counters()
+        print_counters("Export", after_created - created, after_ops_calls - ops_calls)
+
+    errors = get_errors()
+    if errors != "Successfully completed.":
+        print(errors)
+    if args.profile:
+        profiler.dump_stats(args.profile)
+    pstats.Stats(profiler).sort_stats(args.sort).print_stats(args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
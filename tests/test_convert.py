@@ -0,0 +1,94 @@
+# Copyright (C) 2024-2026  Lucas Pottier
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#-----------------------------------------------------------------------------
+# Mad Tracks Blender Add-on, based on Re-Volt Blender Add-on.
+#-----------------------------------------------------------------------------
+
+"""
+Name:    test_convert
+Purpose: Tests the glTF and OBJ converter
+
+"""
+
+import io
+import json
+import os
+import struct
+
+import numpy as np
+
+from io_madtracks import convert
+from io_madtracks import core
+from io_madtracks import madini
+from io_madtracks import madstructs
+
+
+def read_glb(filepath):
+    with open(filepath, 'rb') as file:
+        data = file.read()
+    magic, version, length = struct.unpack_from("<3I", data, 0)
+    assert (magic, version, length) == (convert.GLB_MAGIC, 2, len(data))
+    json_len, chunk_type = struct.unpack_from("<2I", data, 12)
+    assert chunk_type == convert.GLB_CHUNK_JSON
+    gltf = json.loads(data[20:20 + json_len].decode("utf-8"))
+    bin_len, chunk_type = struct.unpack_from("<2I", data, 20 + json_len)
+    assert chunk_type == convert.GLB_CHUNK_BIN
+    assert bin_len == gltf["buffers"][0]["byteLength"] == len(data) - 28 - json_len
+    return gltf
+
+
+def test_level_to_glb(data_dir, tmp_path):
+    level = os.path.join(data_dir, core.LEVEL_PATH, "synth.ini")
+    out = str(tmp_path / "synth.glb")
+    assert convert.convert_file(level, out)
+    assert core.get_errors() == "Successfully completed."
+    gltf = read_glb(out)
+
+    with open(os.path.join(data_dir, core.LDL_PATH, "synth.ldl"), 'rb') as file:
+        lightmap = madstructs.LDL(file)
+        assert lightmap.read_header()
+        lightmap.read_index()
+        instances, consumed = convert.level_instances(level, data_dir, lightmap)
+    assert consumed == lightmap.instance_cnt
+    assert len(gltf["nodes"]) == len(instances)
+    # lightmapped instances get their own mesh with a second UV set, the others share the LDO mesh
+    lightmapped = [node for node, instance in zip(gltf["nodes"], instances) if instance[3] is not None]
+    assert lightmapped
+    for node in lightmapped:
+        for primitive in gltf["meshes"][node["mesh"]]["primitives"]:
+            assert "TEXCOORD_1" in primitive["attributes"]
+    assert len(gltf["meshes"]) <= len(lightmapped) + len(set(instance[1] for instance in instances))
+
+
+def test_ldo_to_obj(ldo_filepaths, tmp_path):
+    out = str(tmp_path / "ldo.obj")
+    assert convert.convert_file(ldo_filepaths[0], out, data_dir=str(tmp_path))
+    with open(out, 'r') as file:
+        lines = file.read().splitlines()
+    ldo = convert.read_ldo(ldo_filepaths[0])
+    meshes = [mesh for _, _, _, mesh in convert.ldo_meshes(ldo)]
+    assert sum(line.startswith("v ") for line in lines) == sum(mesh.vertex_cnt for mesh in meshes)
+    face_cnt = sum(len(indices) for mesh in meshes for _, indices in convert.mesh_primitives(mesh))
+    assert sum(line.startswith("f ") for line in lines) == face_cnt
+    assert os.path.exists(str(tmp_path / "ldo.mtl"))
+
+
+def parse_section(section):
+    out = io.StringIO()
+    section.write(out)
+    return madini.INI(io.StringIO(out.getvalue())).sections[0]
+
+
+def test_instance_transform():
+    section = parse_section(madini.level_section("geometry/a.ldo", [1., 2., 3.], [0., 0., 1.], [0., 1., 0.]))
+    transform = convert.instance_transform(section)
+    assert np.allclose(transform[:3, 3], np.array([1., 2., 3.]) * convert.TO_GLTF_AXES)
+    rotation = transform[:3, :3]
+    assert np.allclose(rotation.dot(rotation.T), np.identity(3))
+    assert np.isclose(np.linalg.det(rotation), 1)
+    assert np.allclose(transform[3], [0, 0, 0, 1])
+
+    # trackparts following the first one of a sequence are placed by the game
+    assert convert.instance_transform(parse_section(madini.level_section("m_gris_droit.ini"))) is None
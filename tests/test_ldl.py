@@ -0,0 +1,141 @@
+# Copyright (C) 2024-2026  Lucas Pottier
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#-----------------------------------------------------------------------------
+# Mad Tracks Blender Add-on, based on Re-Volt Blender Add-on.
+#-----------------------------------------------------------------------------
+
+"""
+Name:    test_ldl
+Purpose: Tests the LDL lightmap writer, index and random access
+
+"""
+
+import io
+import os
+
+import numpy as np
+import pytest
+
+from io_madtracks import core
+from io_madtracks import madstructs
+
+
+def instances(bit_depth):
+    """
+    Returns LDL instances with distinct UVs, exactly representable at the bit depth.
+    """
+    rs = np.random.RandomState(bit_depth)
+    result = []
+    for i, vertex_cnts in enumerate([[3, 5], [7], [2, 4, 6], [0], [5, 1]]):
+        uvs = [np.round(rs.uniform(0, 1, (vertex_cnt, 2)) * 256) / 256 for vertex_cnt in vertex_cnts]
+        name = "geometry/ldo{}.ldo".format(i % 3)
+        result.append((name, uvs))
+    return result
+
+
+def open_ldl(data):
+    lightmap = madstructs.LDL(io.BytesIO(data))
+    assert lightmap.read_header()
+    lightmap.read_index()
+    return lightmap
+
+
+@pytest.mark.parametrize("bit_depth", [16, 32])
+def test_index_and_fetch(bit_depth):
+    written = instances(bit_depth)
+    out = io.BytesIO()
+    writer = madstructs.LDL(out)
+    writer.bit_depth = bit_depth
+    writer.write(written)
+
+    lightmap = open_ldl(out.getvalue())
+    assert lightmap.instance_cnt == len(written)
+    assert lightmap.names == [name for name, _ in written]
+    assert lightmap.vertex_cnts == [[len(mesh_uvs) for mesh_uvs in uvs] for _, uvs in written]
+    assert lightmap.find("GEOMETRY/LDO1.LDO") == [1, 4]
+
+    # random access in any order gives the instances back
+    for ordinal in [4, 0, 2, 2, 1, 3]:
+        lightmap.fetch(ordinal)
+        name, uvs = written[ordinal]
+        assert lightmap.current_name == name
+        assert len(lightmap.current_uvs) == len(uvs)
+        for read_uvs, mesh_uvs in zip(lightmap.current_uvs, uvs):
+            assert np.array_equal(np.asarray(read_uvs, dtype=np.float64), mesh_uvs)
+
+
+def test_sequential_read_matches_fetch():
+    out = io.BytesIO()
+    writer = madstructs.LDL(out)
+    writer.bit_depth = 16
+    writer.write(instances(16))
+
+    sequential = madstructs.LDL(io.BytesIO(out.getvalue()))
+    sequential.read_header()
+    indexed = open_ldl(out.getvalue())
+    for ordinal in range(indexed.instance_cnt):
+        sequential.read_instance()
+        indexed.fetch(ordinal)
+        assert sequential.current_name == indexed.current_name
+        for a, b in zip(sequential.current_uvs, indexed.current_uvs):
+            assert np.array_equal(a, b)
+
+
+def test_unsupported_bit_depth():
+    lightmap = madstructs.LDL(io.BytesIO(bytes((8, 0, 0, 0)) + (0).to_bytes(4, "little")))
+    assert not lightmap.read_header()
+    assert "reading LDL header" in core.get_errors()
+
+
+def test_assign_lightmap_instances():
+    out = io.BytesIO()
+    writer = madstructs.LDL(out)
+    writer.bit_depth = 16
+    writer.write(instances(16))
+    lightmap = open_ldl(out.getvalue())
+
+    # instance 3 has no UVs and is skipped, level instances without a LDO have no instance
+    filenames = ["geometry/ldo0.ldo", None, "geometry/ldo1.ldo", "geometry/LDO2.ldo", "geometry/ldo0.ldo", "geometry/ldo1.ldo"]
+    ordinals, consumed = madstructs.assign_lightmap_instances(lightmap, filenames)
+    assert ordinals == [0, None, 1, 2, None, 4]
+    assert consumed == 5
+
+    # instances are matched by name, each LDO consuming its own instances in file order
+    filenames = ["geometry/ldo1.ldo", "geometry/ldo1.ldo", "geometry/ldo0.ldo", "geometry/other.ldo", "geometry/ldo1.ldo"]
+    ordinals, consumed = madstructs.assign_lightmap_instances(lightmap, filenames)
+    assert ordinals == [1, 4, 0, None, None]
+    assert consumed == 3
+
+
+def test_synth_lightmap_matches_ldo_meshes(data_dir):
+    """
+    The LDL mesh order of synth matches the one the importers read, for LDOs with several atomics.
+    """
+    with open(os.path.join(data_dir, core.LDL_PATH, "synth.ldl"), 'rb') as file:
+        lightmap = madstructs.LDL(file)
+        assert lightmap.read_header()
+        lightmap.read_index()
+        for ordinal, name in enumerate(lightmap.names):
+            ldo = madstructs.LDO()
+            with open(os.path.join(data_dir, core.LDO_PATH, name.split("/", 1)[1]), 'rb') as ldo_file:
+                ldo.read(ldo_file, geometry=False)
+            assert len(ldo.atomics) > 1
+            vertex_cnts = lightmap.vertex_cnts[ordinal]
+            for atomic, indices in zip(ldo.atomics, madstructs.lightmap_mesh_indices(ldo)):
+                for mesh, index in zip(atomic.meshes, indices):
+                    assert vertex_cnts[index] == mesh.vertex_cnt
+
+
+def test_lightmap_order_is_inverse_of_indices():
+    ldo = madstructs.LDO()
+    for mesh_cnt in (2, 0, 3):
+        atomic = madstructs.Atomic()
+        atomic.meshes = [madstructs.Mesh() for _ in range(mesh_cnt)]
+        ldo.atomics.append(atomic)
+    items = ["a0", "a1", "c0", "c1", "c2"]
+    ordered = madstructs.to_lightmap_order(ldo, items)
+    assert ordered == ["c2", "c1", "c0", "a1", "a0"]
+    flat = [index for indices in madstructs.lightmap_mesh_indices(ldo) for index in indices]
+    assert [ordered[index] for index in flat] == items
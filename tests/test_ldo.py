@@ -0,0 +1,229 @@
+# Copyright (C) 2024-2026  Lucas Pottier
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#-----------------------------------------------------------------------------
+# Mad Tracks Blender Add-on, based on Re-Volt Blender Add-on.
+#-----------------------------------------------------------------------------
+
+"""
+Name:    test_ldo
+Purpose: Tests the LDO reader, writer and patcher
+
+"""
+
+import io
+import random
+
+import numpy as np
+import pytest
+
+from io_madtracks import core
+from io_madtracks import madstructs
+
+
+def read_file(filepath):
+    with open(filepath, 'rb') as file:
+        return file.read()
+
+
+def parse(buf, **kwargs):
+    ldo = madstructs.LDO()
+    ldo.read_buffer(buf, **kwargs)
+    return ldo
+
+
+def to_bytes(ldo, raw=False):
+    out = io.BytesIO()
+    ldo.write(out, raw=raw)
+    return out.getvalue()
+
+
+def test_roundtrip_encodes_identical_bytes(ldo_filepaths):
+    for filepath in ldo_filepaths:
+        buf = read_file(filepath)
+        ldo = parse(buf)
+        for atomic in ldo.atomics:
+            atomic.mark_modified()
+        assert to_bytes(ldo) == buf, filepath
+
+
+def test_roundtrip_stream_reader(ldo_filepaths):
+    for filepath in ldo_filepaths:
+        ldo = madstructs.LDO()
+        with open(filepath, 'rb') as file:
+            ldo.read(file)
+        assert to_bytes(ldo) == read_file(filepath), filepath
+
+
+def test_raw_passthrough(ldo_filepaths):
+    buf = read_file(ldo_filepaths[0])
+    assert to_bytes(parse(buf), raw=True) == buf
+
+
+def test_edit_without_mark_modified_is_written(ldo_filepaths):
+    ldo = parse(read_file(ldo_filepaths[0]))
+    mesh = ldo.atomics[0].meshes[0]
+    mesh.positions = mesh.positions + 1
+    edited = parse(to_bytes(ldo))
+    assert np.array_equal(edited.atomics[0].meshes[0].positions, mesh.positions)
+
+    # the raw copy is only used when asked for, and until the atomic is marked as modified
+    assert to_bytes(ldo, raw=True) == read_file(ldo_filepaths[0])
+    ldo.atomics[0].mark_modified()
+    assert to_bytes(ldo, raw=True) == to_bytes(ldo)
+
+
+def test_lazy_read_matches_full_read(ldo_filepaths):
+    buf = read_file(ldo_filepaths[0])
+    full = parse(buf)
+    lazy = parse(buf, lazy=True)
+    for atomic_full, atomic_lazy in zip(full.atomics, lazy.atomics):
+        for mesh_full, mesh_lazy in zip(atomic_full.meshes, atomic_lazy.meshes):
+            assert not mesh_lazy.is_loaded
+            assert np.array_equal(mesh_full.tri_indices, mesh_lazy.tri_indices)
+            assert np.array_equal(mesh_full.positions, mesh_lazy.positions)
+
+
+def test_header_only_write_raises(ldo_filepaths):
+    ldo = madstructs.LDO()
+    with open(ldo_filepaths[0], 'rb') as file:
+        ldo.read(file, geometry=False)
+    assert ldo.header_only
+    with pytest.raises(ValueError):
+        to_bytes(ldo)
+
+
+def test_truncated_input_raises(ldo_filepaths):
+    buf = read_file(ldo_filepaths[0])
+    for size in list(range(0, 64)) + list(range(64, len(buf), 61)):
+        with pytest.raises(madstructs.LDOFormatError):
+            parse(buf[:size], validate=True)
+
+
+def test_corrupt_counts_raise(ldo_filepaths):
+    buf = bytearray(read_file(ldo_filepaths[0]))
+    # atomic count far past the end of the file
+    corrupt = bytearray(buf)
+    corrupt[4:6] = (0x7fff).to_bytes(2, "little")
+    with pytest.raises(madstructs.LDOFormatError) as excinfo:
+        parse(bytes(corrupt), validate=True)
+    assert excinfo.value.path.startswith("atomic")
+
+    # vertex count of the first mesh past the end of the file
+    ldo = parse(bytes(buf))
+    atomic = ldo.atomics[0]
+    offset = atomic.offset + 22 + sum(material.size for material in atomic.materials)
+    corrupt = bytearray(buf)
+    corrupt[offset:offset + 4] = (0x7fffffff).to_bytes(4, "little")
+    with pytest.raises(madstructs.LDOFormatError) as excinfo:
+        parse(bytes(corrupt), validate=True)
+    assert excinfo.value.path == "atomic[0]/mesh[0]/vertices"
+
+
+def test_corrupt_name_raises(ldo_filepaths):
+    buf = read_file(ldo_filepaths[0])
+    material = parse(buf).atomics[0].materials[0]
+    corrupt = bytearray(buf)
+    corrupt[material.offset + 1] = 0xff  # not valid utf-8
+    with pytest.raises(madstructs.LDOFormatError):
+        parse(bytes(corrupt), validate=True)
+
+
+def test_random_corruption_only_raises_format_errors(ldo_filepaths):
+    buf = read_file(ldo_filepaths[0])
+    rnd = random.Random(0)
+    for _ in range(300):
+        corrupt = bytearray(buf)
+        for _ in range(rnd.randrange(1, 6)):
+            # favour the structure at the start of the file over the vertex data
+            corrupt[rnd.randrange(min(len(buf), 512))] = rnd.randrange(256)
+        try:
+            parse(bytes(corrupt), validate=True)
+        except madstructs.LDOFormatError:
+            pass
+
+
+def test_patch_renames_texture(ldo_filepaths):
+    buf = read_file(ldo_filepaths[0])
+    original = parse(buf)
+    old_name = next(material.diffuse_name for atomic in original.atomics for material in atomic.materials
+                    if material.flags & madstructs.MAT_FLAG_DIFFUSE)
+
+    patch = madstructs.LDOPatch(buf)
+    assert patch.rename_texture(old_name.upper(), "renamed_texture") > 0
+    out = io.BytesIO()
+    patch.write(out)
+    patched = parse(out.getvalue(), validate=True)
+
+    names = [material.diffuse_name for atomic in patched.atomics for material in atomic.materials]
+    assert "renamed_texture" in names
+    assert old_name not in names
+    for atomic_old, atomic_new in zip(original.atomics, patched.atomics):
+        for mesh_old, mesh_new in zip(atomic_old.meshes, atomic_new.meshes):
+            assert np.array_equal(mesh_old.positions, mesh_new.positions)
+            assert np.array_equal(mesh_old.tri_indices, mesh_new.tri_indices)
+
+
+def test_long_name_is_reported_and_truncated(ldo_filepaths):
+    ldo = parse(read_file(ldo_filepaths[0]))
+    ldo.atomics[0].mark_modified()
+    ldo.atomics[0].materials[0].name = "é" * 200
+    written = parse(to_bytes(ldo), validate=True)
+    assert len(written.atomics[0].materials[0].name.encode("utf-8")) <= madstructs.STRING_MAX_LEN
+    assert "writing a name" in core.get_errors()
+
+
+def assert_same_geometry(ldo_a, ldo_b):
+    for atomic_a, atomic_b in zip(ldo_a.atomics, ldo_b.atomics):
+        assert len(atomic_a.meshes) == len(atomic_b.meshes)
+        for mesh_a, mesh_b in zip(atomic_a.meshes, atomic_b.meshes):
+            assert np.array_equal(mesh_a.positions, mesh_b.positions)
+            assert np.array_equal(mesh_a.tri_indices, mesh_b.tri_indices)
+
+
+def test_patch_material_resized(ldo_filepaths):
+    buf = read_file(ldo_filepaths[0])
+    original = parse(buf)
+    patch = madstructs.LDOPatch(buf)
+    material = patch.ldo.atomics[0].materials[0]
+    material.name = material.name + "_renamed"
+    material.name_len = len(material.name.encode("utf-8"))
+    patch.update_material(material)
+    assert len(patch.buf) == len(buf) + len("_renamed")
+
+    patched = parse(bytes(patch.buf), validate=True)
+    assert patched.atomics[0].materials[0].name == original.atomics[0].materials[0].name + "_renamed"
+    assert_same_geometry(original, patched)
+    # the records after the edit were scanned again at their new offsets
+    assert patch.ldo.atomics[-1].offset == original.atomics[-1].offset + len("_renamed")
+
+
+def test_patch_dummy_resized(ldo_filepaths):
+    buf = read_file(ldo_filepaths[0])
+    original = parse(buf)
+    patch = madstructs.LDOPatch(buf)
+    ai, di = next((ai, di) for ai, atomic in enumerate(patch.ldo.atomics) for di, dummy in enumerate(atomic.dummies)
+                  if dummy.flags & core.DUMMY_FLAG_POS)
+    dummy = patch.ldo.atomics[ai].dummies[di]
+    # a position only dummy gets a rotation matrix, growing its record by 3 vectors
+    dummy.flags = (dummy.flags & ~core.DUMMY_FLAG_POS) | core.DUMMY_FLAG_POSROT
+    dummy.rotmat = [madstructs.Vector(data=axis) for axis in ((1, 0, 0), (0, 1, 0), (0, 0, 1))]
+    patch.update_dummy(dummy)
+    assert len(patch.buf) == len(buf) + 36
+
+    patched = parse(bytes(patch.buf), validate=True)
+    assert [list(vector.data) for vector in patched.atomics[ai].dummies[di].rotmat] == [[1, 0, 0], [0, 1, 0], [0, 0, 1]]
+    assert_same_geometry(original, patched)
+
+
+def test_patch_splice_same_size_in_place(ldo_filepaths):
+    buf = read_file(ldo_filepaths[0])
+    patch = madstructs.LDOPatch(buf)
+    ldo = patch.ldo
+    material = ldo.atomics[0].materials[0]
+    data = bytes(patch.buf[material.offset:material.offset + material.size])
+    patch.splice(material.offset, material.size, data)
+    # same size edits keep the scanned structures
+    assert patch.ldo is ldo
+    assert bytes(patch.buf) == buf
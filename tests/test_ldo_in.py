@@ -0,0 +1,110 @@
+# Copyright (C) 2024-2026  Lucas Pottier
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#-----------------------------------------------------------------------------
+# Mad Tracks Blender Add-on, based on Re-Volt Blender Add-on.
+#-----------------------------------------------------------------------------
+
+"""
+Name:    test_ldo_in
+Purpose: Tests the LDO importer
+
+"""
+
+import os
+
+import numpy as np
+
+from io_madtracks import core
+from io_madtracks import madstructs
+
+
+def read_ldo(filepath):
+    ldo = madstructs.LDO()
+    with open(filepath, 'rb') as file:
+        ldo.read_buffer(file.read())
+    return ldo
+
+
+def write_ldo(ldo, filepath):
+    for atomic in ldo.atomics:
+        atomic.mark_modified()
+    with open(filepath, 'wb') as file:
+        ldo.write(file)
+
+
+def test_valid_tris(addon):
+    from io_madtracks import ldo_in
+    tris = np.array([
+        [0, 1, 2],   # kept
+        [2, 1, 0],   # same vertices as the first one
+        [1, 2, 0],   # same vertices as the first one
+        [0, 0, 1],   # degenerate
+        [0, 1, 4],   # vertex past the end
+        [-1, 1, 2],  # negative vertex
+        [1, 2, 3],   # kept
+    ])
+    assert ldo_in.valid_tris(tris, 4).tolist() == [True, False, False, False, False, False, True]
+    assert ldo_in.valid_tris(np.zeros((0, 3), dtype=np.int32), 0).tolist() == []
+
+
+def test_invalid_tris_are_skipped_on_import(scene, ldo_filepaths, tmp_path):
+    from io_madtracks import ldo_in
+    ldo = read_ldo(ldo_filepaths[0])
+    atomic = ldo.atomics[0]
+    mesh = atomic.meshes[0]
+    # a degenerate tri and a copy of the first tri at the end of the last tri sequence
+    extra = np.array([[0, 0, 1], mesh.tri_indices[0][::-1]], dtype=mesh.tri_indices.dtype)
+    mesh.tri_indices = np.concatenate((mesh.tri_indices, extra))
+    mesh.tri_cnt += len(extra)
+    mesh.tri_seq_len = mesh.tri_seq_len.copy()
+    mesh.tri_seq_len[-1] += len(extra)
+    filepath = str(tmp_path / "invalid.ldo")
+    write_ldo(ldo, filepath)
+
+    scene.madtracks.instance_mode = False
+    assert ldo_in.import_file(filepath, scene)
+    obj = next(obj for obj in scene.objects if obj.type == 'MESH' and obj.data.name == atomic.name)
+    offsets = np.cumsum([0] + [m.vertex_cnt for m in atomic.meshes])
+    tris = np.concatenate([m.tri_indices.astype(np.int64) + offset for m, offset in zip(atomic.meshes, offsets)])
+    kept = ldo_in.valid_tris(tris, offsets[-1])
+    assert not kept[len(atomic.meshes[0].tri_indices) - 2:len(atomic.meshes[0].tri_indices)].any()
+    assert len(obj.data.polygons) == np.count_nonzero(kept)
+
+
+def test_materials_shared_across_imports(scene, ldo_filepaths):
+    import fakebpy
+    from io_madtracks import ldo_in
+    assert ldo_in.import_file(ldo_filepaths[0], scene)
+    created, _ = fakebpy.counters()
+    assert created["materials"] > 0
+    assert ldo_in.import_file(ldo_filepaths[0], scene)
+    created_again, _ = fakebpy.counters()
+    # the second import reuses the materials and textures of the first one
+    assert created_again["materials"] == created["materials"]
+    assert created_again["textures"] == created["textures"]
+    assert created_again["meshes"] > created["meshes"]
+
+
+def test_identical_materials_are_one_material(scene, ldo_filepaths):
+    from io_madtracks import ldo_in
+    props = scene.madtracks
+    atomic_mat = read_ldo(ldo_filepaths[0]).atomics[0].materials[0]
+    same = read_ldo(ldo_filepaths[0]).atomics[0].materials[0]
+    assert ldo_in.get_material(atomic_mat, props) is ldo_in.get_material(same, props)
+
+    other = read_ldo(ldo_filepaths[0]).atomics[0].materials[0]
+    other.flags |= madstructs.MAT_FLAG_BRIGHTNESS
+    other.brightness = atomic_mat.brightness + 0.5
+    assert ldo_in.get_material(other, props) is not ldo_in.get_material(atomic_mat, props)
+
+
+def test_textures_reused_from_blend_file(scene):
+    from io_madtracks import ldo_in
+    filepath = os.path.join(scene.madtracks.settings_madtracks_dir, core.TEXTURE_PATH, "synth_tex0.dds")
+    texture = ldo_in.get_texture("synth_tex0", filepath)
+    assert ldo_in.get_texture("synth_tex0", filepath) is texture
+    # a new session finds the texture in the blend file instead of loading the image again
+    ldo_in.clear_registry()
+    assert ldo_in.get_texture("synth_tex0", filepath) is texture
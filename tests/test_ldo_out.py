@@ -0,0 +1,61 @@
+# Copyright (C) 2024-2026  Lucas Pottier
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#-----------------------------------------------------------------------------
+# Mad Tracks Blender Add-on, based on Re-Volt Blender Add-on.
+#-----------------------------------------------------------------------------
+
+"""
+Name:    test_ldo_out
+Purpose: Tests the conversion of Blender meshes into atomic meshes
+
+"""
+
+import numpy as np
+
+import fakebpy
+
+from io_madtracks import madstructs
+
+
+CUBE_VERTICES = [(x, y, z) for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)]
+CUBE_FACES = [(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3)]
+
+
+def test_shared_vertices_are_merged(scene):
+    from io_madtracks import ldo_out
+    mesh = fakebpy.primitive_mesh("cube", CUBE_VERTICES, CUBE_FACES)
+    atomic_meshes = ldo_out.mesh_to_atomic_meshes(mesh)
+    assert len(atomic_meshes) == 1
+    atomic_mesh = atomic_meshes[0]
+    # no UV map and smooth normals: one vertex per Blender vertex
+    assert atomic_mesh.vertex_cnt == 8
+    assert atomic_mesh.tri_cnt == 12
+    assert atomic_mesh.tri_seq_len.tolist() == [12]
+
+
+def test_tris_to_atomic_mesh_dedup(addon):
+    from io_madtracks import ldo_out
+    loop_data = np.zeros((6, 8), dtype=np.float32)
+    loop_data[:, 0] = [0, 1, 2, 1, 2, 3]
+    tri_loops = np.array([[0, 1, 2], [3, 4, 5], [2, 1, 0]])
+    atomic_mesh = ldo_out.tris_to_atomic_mesh(loop_data, tri_loops, np.array([0, 1, 1]))
+    # vertices are kept in order of first use
+    assert atomic_mesh.positions[:, 0].tolist() == [0, 1, 2, 3]
+    assert atomic_mesh.tri_indices.tolist() == [[0, 1, 2], [1, 2, 3], [2, 1, 0]]
+    assert atomic_mesh.tri_seq_mat.tolist() == [0, 1]
+    assert atomic_mesh.tri_seq_len.tolist() == [1, 2]
+
+
+def test_large_mesh_is_split(scene):
+    from io_madtracks import ldo_out
+    tri_cnt = madstructs.MESH_MAX_VERTICES // 3 + 100
+    vertices = np.random.RandomState(0).uniform(-10, 10, (tri_cnt * 3, 3))
+    faces = np.arange(tri_cnt * 3).reshape(-1, 3).tolist()
+    mesh = fakebpy.primitive_mesh("large", vertices, faces)
+    atomic_meshes = ldo_out.mesh_to_atomic_meshes(mesh)
+    assert len(atomic_meshes) == 2
+    assert all(atomic_mesh.vertex_cnt <= madstructs.MESH_MAX_VERTICES for atomic_mesh in atomic_meshes)
+    assert sum(atomic_mesh.tri_cnt for atomic_mesh in atomic_meshes) == tri_cnt
+    assert sum(atomic_mesh.vertex_cnt for atomic_mesh in atomic_meshes) == tri_cnt * 3
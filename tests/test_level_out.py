@@ -0,0 +1,93 @@
+# Copyright (C) 2024-2026  Lucas Pottier
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#-----------------------------------------------------------------------------
+# Mad Tracks Blender Add-on, based on Re-Volt Blender Add-on.
+#-----------------------------------------------------------------------------
+
+"""
+Name:    test_level_out
+Purpose: Tests the lightmap written by the level exporter
+
+"""
+
+import os
+import shutil
+
+import numpy as np
+
+from io_madtracks import core
+from io_madtracks import madstructs
+
+
+def read_ldl(filepath):
+    with open(filepath, 'rb') as file:
+        lightmap = madstructs.LDL(file)
+        assert lightmap.read_header()
+        lightmap.read_index()
+        instances = []
+        for ordinal in range(lightmap.instance_cnt):
+            lightmap.fetch(ordinal)
+            instances.append((lightmap.current_name.lower(), [np.array(uvs) for uvs in lightmap.current_uvs]))
+        return instances
+
+
+def used_vertices(data_dir, name):
+    """
+    Returns the masks of the vertices used by the faces Blender keeps, in the LDL mesh order.
+    The other vertices have no loop to hold a lightmap UV.
+    """
+    from io_madtracks import ldo_in
+    ldo = madstructs.LDO()
+    with open(os.path.join(data_dir, core.LDO_PATH, name.split("/", 1)[1]), 'rb') as file:
+        ldo.read_buffer(file.read())
+    masks = []
+    for atomic in ldo.atomics:
+        for mesh in atomic.meshes:
+            tris = mesh.tri_indices.astype(np.int64)
+            used = np.zeros(mesh.vertex_cnt, dtype=bool)
+            used[tris[ldo_in.valid_tris(tris, mesh.vertex_cnt)].ravel()] = True
+            masks.append(used)
+    return madstructs.to_lightmap_order(ldo, masks)
+
+
+def import_export(scene, data_dir, out_dir, corrupt=None):
+    from io_madtracks import level_in
+    from io_madtracks import level_out
+    props = scene.madtracks
+    props.level_import_lightmap = True
+    props.level_export_lightmap = True
+    level_in.import_file(os.path.join(data_dir, core.LEVEL_PATH, "synth.ini"), scene)
+    assert core.get_errors() == "Successfully completed."
+    if corrupt:
+        # the LDO no longer matches the imported object, its header can't be read
+        filepath = os.path.join(data_dir, core.LDO_PATH, corrupt)
+        with open(filepath, 'rb') as file:
+            buf = file.read()
+        with open(filepath, 'wb') as file:
+            file.write(buf[:len(buf) // 2])
+    level_out.export_file(os.path.join(out_dir, "synth.ini"), scene)
+    return read_ldl(os.path.join(out_dir, "synth.ldl"))
+
+
+def test_lightmap_roundtrip(scene, data_dir, tmp_path):
+    exported = import_export(scene, data_dir, str(tmp_path))
+    original = read_ldl(os.path.join(data_dir, core.LDL_PATH, "synth.ldl"))
+    assert [name for name, _ in exported] == [name for name, _ in original]
+    for (name, exported_uvs), (_, original_uvs) in zip(exported, original):
+        assert len(exported_uvs) == len(original_uvs)
+        for a, b, used in zip(exported_uvs, original_uvs, used_vertices(data_dir, name)):
+            assert len(a) == len(b)
+            assert np.allclose(a[used], b[used], atol=1e-3)
+
+
+def test_unmatched_lightmap_is_skipped(scene, data_dir, tmp_path):
+    copy_dir = str(tmp_path / "data")
+    shutil.copytree(data_dir, copy_dir)
+    scene.madtracks.settings_madtracks_dir = os.path.join(copy_dir, "")
+    exported = import_export(scene, copy_dir, str(tmp_path), corrupt="synth_ldo0.ldo")
+    assert "its lightmap is skipped" in core.get_errors()
+    names = [name for name, _ in exported]
+    assert names
+    assert "geometry/synth_ldo0.ldo" not in names
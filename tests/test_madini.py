@@ -0,0 +1,51 @@
+# Copyright (C) 2024-2026  Lucas Pottier
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#-----------------------------------------------------------------------------
+# Mad Tracks Blender Add-on, based on Re-Volt Blender Add-on.
+#-----------------------------------------------------------------------------
+
+"""
+Name:    test_madini
+Purpose: Tests the .ini writer and the level sections
+
+"""
+
+import io
+
+from io_madtracks import madini
+
+
+def test_level_section_text():
+    out = io.StringIO()
+    madini.level_section("geometry/a.ldo", [1., 2., 3.], [1., 0., 0.], [0., 1., 0.]).write(out)
+    assert out.getvalue() == (
+        "[geometry/a.ldo]\n"
+        "Position = 1.000000,2.000000,3.000000\n"
+        "DirectionAT = 1.000000,0.000000,0.000000\n"
+        "DirectionUp = 0.000000,1.000000,0.000000\n"
+        "Filename = \"geometry/a.ldo\"\n"
+        "\n")
+
+
+def test_trackpart_sequence_section_has_no_transform():
+    section = madini.level_section("m_gris_droit.ini")
+    assert [parameter.name for parameter in section.params] == ["Filename"]
+
+
+def test_write_read_roundtrip():
+    level = madini.INI()
+    level.sections = [madini.level_section("geometry/a.ldo", [1.5, -2., 0.25], [0., 0., 1.], [0., 1., 0.]),
+                      madini.level_section("m_gris_droit.ini")]
+    out = io.StringIO()
+    level.write(out)
+    read = madini.INI(io.StringIO(out.getvalue()))
+    assert [section.name for section in read.sections] == ["geometry/a.ldo", "m_gris_droit.ini"]
+    assert read.sections[0].as_dict() == {
+        "position": [1.5, -2., 0.25],
+        "directionat": [0., 0., 1.],
+        "directionup": [0., 1., 0.],
+        "filename": "geometry/a.ldo",
+    }
+    assert read.sections[1].as_dict() == {"filename": "m_gris_droit.ini"}
@@ -0,0 +1,62 @@
+# Copyright (C) 2024-2026  Lucas Pottier
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#-----------------------------------------------------------------------------
+# Mad Tracks Blender Add-on, based on Re-Volt Blender Add-on.
+#-----------------------------------------------------------------------------
+
+"""
+Name:    test_stock
+Purpose: Tests the format library on the game data
+
+Description:
+The game data can't be shipped, these tests only run when the
+MADTRACKS_DATA_DIR environment variable points to an extracted data.zip
+directory:
+    MADTRACKS_DATA_DIR=/path/to/data python -m pytest tests
+
+"""
+
+import glob
+import io
+import os
+
+import pytest
+
+from io_madtracks import core
+from io_madtracks import madstructs
+
+DATA_DIR = os.environ.get("MADTRACKS_DATA_DIR")
+
+pytestmark = pytest.mark.skipif(not DATA_DIR, reason="MADTRACKS_DATA_DIR is not set")
+
+
+def stock_files(path, ext):
+    filepaths = sorted(glob.glob(os.path.join(DATA_DIR, path, "*" + ext)))
+    if not filepaths:
+        pytest.skip("no {} files in {}".format(ext, os.path.join(DATA_DIR, path)))
+    return filepaths
+
+
+def test_stock_ldo_roundtrip():
+    for filepath in stock_files(core.LDO_PATH, ".ldo"):
+        with open(filepath, 'rb') as file:
+            buf = file.read()
+        ldo = madstructs.LDO()
+        ldo.read_buffer(buf, validate=True)
+        for atomic in ldo.atomics:
+            atomic.mark_modified()
+        out = io.BytesIO()
+        ldo.write(out)
+        assert out.getvalue() == buf, filepath
+
+
+def test_stock_ldl_index_covers_file():
+    for filepath in stock_files(core.LDL_PATH, ".ldl"):
+        with open(filepath, 'rb') as file:
+            lightmap = madstructs.LDL(file)
+            assert lightmap.read_header(), filepath
+            lightmap.read_index()
+            assert file.tell() == os.path.getsize(filepath), filepath
+            assert len(lightmap.names) == lightmap.instance_cnt